@@ -0,0 +1,49 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
+
+from app.core.profiling import profiler
+from app.services.utils import require_admin
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+class ProfilerConfigIn(BaseModel):
+    enabled: Optional[bool] = None
+    sample_rate: Optional[float] = Field(default=None, ge=0, le=1)
+    routes: Optional[List[str]] = None
+    users: Optional[List[str]] = None
+    interval_ms: Optional[float] = Field(default=None, ge=1, le=1000)
+
+
+@router.get("/profiling/config")
+def get_profiler_config():
+    return profiler.config
+
+
+@router.put("/profiling/config")
+def update_profiler_config(payload: ProfilerConfigIn):
+    """
+    Change profiling at runtime (this worker only), e.g.
+    {"enabled": true, "routes": ["/api/v1/receipts/all"], "sample_rate": 0.01}
+    """
+    for key, value in payload.model_dump(exclude_none=True).items():
+        setattr(profiler.config, key, value)
+    return profiler.config
+
+
+@router.get("/profiling/profiles")
+def list_profiles():
+    """Most recent first. Names encode time, method, route, status and duration."""
+    return sorted(profiler.list_profiles(), reverse=True)
+
+
+@router.get("/profiling/profiles/{name}", response_class=FileResponse)
+def download_profile(name: str):
+    """Folded stacks; feed to flamegraph.pl, speedscope or inferno-flamegraph."""
+    path = profiler.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
@@ -7,7 +7,6 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import select
-from jose import jwt, JWTError, ExpiredSignatureError
 
 
 from app.db.session import get_db
@@ -118,6 +117,8 @@ def refresh_access_token(request: Request):
     """
     Issue a new access token if the refresh_token cookie is valid.
     """
+    from jose import jwt, JWTError, ExpiredSignatureError
+
     refresh_cookie = request.cookies.get("refresh_token")
     if not refresh_cookie:
         raise HTTPException(status_code=401, detail="Missing refresh token")
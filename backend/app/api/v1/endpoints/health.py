@@ -0,0 +1,33 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.warmup import is_warm, warm_state
+from app.services.receipts.cache_warmer import cache_warmer
+
+router = APIRouter(prefix="/health", tags=["health"])
+
+
+@router.get("/live")
+async def live():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready():
+    """
+    Ready once the app is serving; with WARMUP_ON_STARTUP it also waits for the
+    warm-up to finish (503 until then) so new workers don't take cold traffic.
+    Receipt cache warming progress is reported but doesn't hold readiness.
+    """
+    warm = is_warm()
+    ok = warm or not settings.WARMUP_ON_STARTUP
+    return JSONResponse(
+        {
+            "status": "ready" if ok else "warming",
+            "warm": warm,
+            "components": warm_state(),
+            "cache_warm": cache_warmer.state(),
+        },
+        status_code=status.HTTP_200_OK if ok else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
@@ -0,0 +1,19 @@
+import anyio.to_thread
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core.metrics import REGISTRY, THREADPOOL_QUEUE
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """
+    Prometheus text exposition of the in-process metrics (see app.core.metrics).
+    """
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    stats = limiter.statistics()
+    THREADPOOL_QUEUE.set(stats.tasks_waiting, state="waiting")
+    THREADPOOL_QUEUE.set(stats.borrowed_tokens, state="running")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
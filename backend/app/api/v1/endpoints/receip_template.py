@@ -18,13 +18,15 @@ from pathlib import Path
 from uuid import uuid4
 from typing import Any, Optional
 
+from app.core.profiling import ProfiledRoute
+from app.core.static_files import asset_index
 from app.db.session import get_db
 from app.models.receipt_template import ReceiptTemplate
 from app.schemas.receip_template import ReceiptTemplateForm, ReceiptTemplateOut
 from app.services.utils import verify_token, get_user_id
 from app.services.receipts.pdf_generator import generate_template_pdf
 
-router = APIRouter(prefix="/receip_template", tags=["receip_template"])
+router = APIRouter(prefix="/receip_template", tags=["receip_template"], route_class=ProfiledRoute)
 
 LOGO_DIR = Path("app/static/logo")
 ALLOWED_TYPES = {
@@ -87,6 +89,7 @@ async def create_or_update_template_via_form(
         fpath = LOGO_DIR / fname
         with open(fpath, "wb") as f:
             f.write(content)
+        asset_index.register(fpath)
 
         base = str(request.base_url).rstrip("/")
         final_logo_url = f"{base}/static/logo/{fname}"
@@ -1,86 +1,342 @@
 from __future__ import annotations
+import os
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Any
+from typing import Any, Literal, Optional, Tuple
+from zoneinfo import ZoneInfoNotFoundError
 from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from app.db.session import get_db
+from app.core.profiling import ProfiledRoute
+from app.db.session import get_db, get_read_db, get_user_read_db, note_write, read_session
 from app.models.receipt import Receipt
-from app.schemas.receipt import ReceiptCreate, ReceiptResponse
-from app.services.utils import verify_token, get_user_id
+from app.schemas.receipt import (
+    ReceiptCreate,
+    ReceiptListItem,
+    ReceiptResponse,
+    RevenueSeries,
+    StatementCreate,
+    StatementJobOut,
+    UserStats,
+)
+from app.services.utils import verify_token, verify_stream_token, get_user_id
+from app.services.receipts.analytics import invalidate_receipt, revenue_series
+from app.services.receipts.export import FORMATS as EXPORT_FORMATS, iter_export, parquet_available, receipt_chunks
+from app.services.receipts.idempotency import MAX_KEY_LENGTH, fingerprint, idempotency_store
+from app.services.receipts.ingest import get_committer
 from app.services.receipts.qr_code import generate_qr
-from app.services.receipts.pdf_generator import generate_receipt_pdf
+from app.services.receipts.signing import receipt_url, verify_receipt_token
+from app.services.receipts.snapshot import SNAPSHOT_VERSION, build_snapshot
+from app.services.receipts.statements import statement_jobs
+from app.services.receipts.pdf_generator import (
+    cached_receipt_html,
+    cached_receipt_pdf,
+    generate_receipt_escpos,
+    generate_receipt_html,
+    generate_receipt_pdf,
+    receipt_pdf_cached,
+)
 from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS, PDF_RENDERS_AVOIDED, timed
+from app.core.responses import RawJSONResponse, prefers_html
 
-from app.services.receipts.utils import get_user_stats, get_receipts
+from app.services.receipts.live import TooManySubscribers, format_sse, get_broker, next_event
+from app.services.receipts.utils import get_user_stats, get_receipts, publish_receipt_created
 
-router = APIRouter(prefix="/receipts", tags=["receipts"])
+router = APIRouter(prefix="/receipts", tags=["receipts"], route_class=ProfiledRoute)
 
+# Receipts never change after creation; a day bounds staleness after a template deploy.
+RECEIPT_CACHE_CONTROL = "public, max-age=86400"
+RECEIPT_VARY = {"Vary": "Accept, Accept-Encoding"}
 
-@router.get("/stats")
+
+@router.get("/stats", response_model=UserStats, response_class=RawJSONResponse)
 def get_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_user_read_db),
     current_user: Any = Depends(verify_token),
 ):
     
-    return get_user_stats(db, current_user)
+    return RawJSONResponse(get_user_stats(db, current_user))
 
 
-@router.get("/all")
-def get_stats(
-    db: Session = Depends(get_db),
+@router.get("/all", response_model=list[ReceiptListItem], response_class=RawJSONResponse)
+def get_all_receipts(
+    db: Session = Depends(get_user_read_db),
     current_user: Any = Depends(verify_token),
 ):
-    return get_receipts(db, current_user)
+    return RawJSONResponse(get_receipts(db, current_user))
 
 
-@router.get("/pdf/{receipt_id}")
-def get_pdf(receipt_id: UUID, db: Session = Depends(get_db)):
+@router.get("/analytics", response_model=RevenueSeries)
+def get_analytics(
+    interval: Literal["hour", "day", "week", "month"] = "day",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    tz: str = "UTC",
+    db: Session = Depends(get_user_read_db),
+    current_user: Any = Depends(verify_token),
+):
     """
-    Stream the generated PDF for a given receipt UUID.
+    Revenue and receipt count per hour/day/week/month between `start` and `end`
+    (default: a recent window ending now), bucketed in timezone `tz`.
     """
-    path = generate_receipt_pdf(db, str(receipt_id))
-    return FileResponse(path, media_type="application/pdf", filename=f"{receipt_id}.pdf")
+    user_id = get_user_id(db, current_user)
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    try:
+        return revenue_series(db, user_id, interval, tz, start=start, end=end)
+    except ZoneInfoNotFoundError:
+        raise HTTPException(status_code=422, detail=f"Unknown timezone '{tz}'")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 
+def _stats_snapshot(email: str) -> str:
+    db = read_session(email)
+    try:
+        return get_user_stats(db, email).decode()
+    finally:
+        db.close()
 
-@router.post("/", response_model=ReceiptResponse, status_code=status.HTTP_201_CREATED)
-def create_receipt(
-    receipt_data: ReceiptCreate,
+
+@router.get("/export")
+def export_receipts(
+    format: Literal["csv", "parquet"] = "csv",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: Session = Depends(get_user_read_db),
+    current_user: str = Depends(verify_token),
+):
+    """
+    Stream the caller's receipts with transaction_date in [start, end) as CSV
+    or Parquet (columns: receipt_id, transaction_date, total), read and encoded
+    in chunks so memory stays flat however large the range.
+    """
+    user_id = get_user_id(db, current_user)
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    if start and end and start >= end:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="start must be before end")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet export is not available")
+
+    media_type, ext = EXPORT_FORMATS[format]
+    span = "_".join(d.date().isoformat() for d in (start, end) if d) or "all"
+    return StreamingResponse(
+        iter_export(format, receipt_chunks(current_user, user_id, start, end)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="receipts_{span}.{ext}"'},
+    )
+
+
+def _statement_out(job) -> dict:
+    body = job.to_dict()
+    if job.status == "done":
+        body["pdf_url"] = f"/api/v1/receipts/statements/{job.id}/pdf"
+    return body
+
+
+@router.post("/statements", response_model=StatementJobOut, status_code=status.HTTP_202_ACCEPTED)
+def create_statement(
+    payload: StatementCreate,
     db: Session = Depends(get_db),
-    current_user: Any = Depends(verify_token),
+    current_user: str = Depends(verify_token),
 ):
     """
-    Create a receipt row, persist it, generate a QR that points to the PDF endpoint,
-    and return fields matching ReceiptResponse.
+    Start building the monthly statement PDF (all receipts of `month` in `tz`).
+    Poll GET /receipts/statements/{id} for progress; asking again for the same
+    month returns the existing job.
     """
-    # Resolve current user → DB id
     user_id = get_user_id(db, current_user)
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    try:
+        job = statement_jobs.submit(current_user, user_id, payload.month, payload.tz)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    return _statement_out(job)
+
+
+@router.get("/statements/{job_id}", response_model=StatementJobOut)
+def get_statement(job_id: str, current_user: str = Depends(verify_token)):
+    job = statement_jobs.get(job_id, current_user)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Statement job not found")
+    return _statement_out(job)
+
+
+@router.get("/statements/{job_id}/pdf")
+def get_statement_pdf(job_id: str, current_user: str = Depends(verify_token)):
+    job = statement_jobs.get(job_id, current_user)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Statement job not found")
+    if job.status == "expired":
+        raise HTTPException(status_code=status.HTTP_410_GONE, detail="Statement expired; request it again")
+    if job.status != "done":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Statement is {job.status}")
+    return FileResponse(job.path, media_type="application/pdf", filename=f"statement_{job.month}.pdf")
+
+
+@router.get("/stream", response_class=StreamingResponse)
+async def stream_stats(current_user: str = Depends(verify_stream_token)):
+    """
+    Server-Sent Events for the dashboard: a `snapshot` (same body as /stats),
+    then a `receipt` event with the new totals whenever a receipt is created,
+    and a `: ping` comment every LIVE_HEARTBEAT_SECONDS. A `resync` event means
+    updates were dropped; refetch /stats. Accepts `?token=` for EventSource.
+    """
+    broker = get_broker()
+    try:
+        sub = broker.subscribe(current_user)  # before the snapshot, so nothing falls in between
+    except TooManySubscribers:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail="Too many live connections")
+    try:
+        snapshot = await run_in_threadpool(_stats_snapshot, current_user)
+    except BaseException:
+        broker.unsubscribe(sub)
+        raise
+
+    async def events():
+        try:
+            yield format_sse(("snapshot", snapshot))
+            while True:
+                event = await next_event(sub)
+                yield ": ping\n\n" if event is None else format_sse(event)
+        finally:
+            broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _wants_html(request: Request, format: Optional[str]) -> bool:
+    return format == "html" or (format is None and prefers_html(request.headers.get("accept")))
+
+
+def _html_response(request: Request, html_path: str, gz_path: str) -> FileResponse:
+    headers = {**RECEIPT_VARY, "Cache-Control": RECEIPT_CACHE_CONTROL}
+    if "gzip" in request.headers.get("accept-encoding", "") and os.path.exists(gz_path):
+        return FileResponse(
+            gz_path, media_type="text/html; charset=utf-8",
+            headers={**headers, "Content-Encoding": "gzip"},
+        )
+    return FileResponse(html_path, media_type="text/html; charset=utf-8", headers=headers)
+
+
+def _pdf_response(path: str, receipt_id: str, cache_control: Optional[str] = None) -> FileResponse:
+    headers = {**RECEIPT_VARY, "Cache-Control": cache_control} if cache_control else RECEIPT_VARY
+    return FileResponse(path, media_type="application/pdf", filename=f"{receipt_id}.pdf", headers=headers)
 
-    # Generate UUID in Python to store in receipt_id (SQLAlchemy column uses UUID type)
-    rid = uuid4()
 
-    row = Receipt(
-        receipt_id=rid,
-        user_id=str(user_id),
-        transaction_date=receipt_data.transaction_date,
-        total=Decimal(receipt_data.total),  
+def _html_view(request: Request, receipt_id: str, profile: Optional[str], html: Tuple[str, str]) -> FileResponse:
+    """Serve the receipt page; counts as a PDF render avoided unless that PDF was cached anyway."""
+    if not receipt_pdf_cached(receipt_id, profile):
+        PDF_RENDERS_AVOIDED.inc()
+    return _html_response(request, *html)
+
+
+def _receipt_view(
+    request: Request,
+    receipt_id: str,
+    format: Optional[str],
+    profile: Optional[str],
+    db: Session,
+    pdf_cache_control: Optional[str] = None,
+) -> FileResponse:
+    if _wants_html(request, format):
+        return _html_view(request, receipt_id, profile, generate_receipt_html(db, receipt_id, pdf_url="?format=pdf"))
+    path = generate_receipt_pdf(db, receipt_id, profile=profile)
+    return _pdf_response(path, receipt_id, pdf_cache_control)
+
+
+@router.get("/r/{token}")
+def get_signed_receipt(
+    token: str,
+    request: Request,
+    format: Optional[Literal["pdf", "html"]] = None,
+    profile: Optional[Literal["mobile", "print", "archive"]] = None,
+):
+    """
+    The receipt URL behind new QR codes: same negotiation as /pdf/{id}, but the
+    id comes in an HMAC-signed token (services/receipts/signing.py). Unsigned
+    or forged tokens are a 404 before any query; cached artifacts are served
+    without opening a database session.
+    """
+    signed = verify_receipt_token(token)
+    if signed is None or signed.snapshot_version > SNAPSHOT_VERSION:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Receipt not found")
+    receipt_id = str(signed.receipt_id)
+
+    if _wants_html(request, format):
+        cached = cached_receipt_html(receipt_id)
+        if cached is not None:
+            return _html_view(request, receipt_id, profile, cached)
+    else:
+        path = cached_receipt_pdf(receipt_id, profile)
+        if path is not None:
+            return _pdf_response(path, receipt_id, RECEIPT_CACHE_CONTROL)
+
+    with read_session() as db:
+        return _receipt_view(request, receipt_id, format, profile, db, RECEIPT_CACHE_CONTROL)
+
+
+@router.get("/pdf/{receipt_id}")
+def get_pdf(
+    receipt_id: UUID,
+    request: Request,
+    format: Optional[Literal["pdf", "html"]] = None,
+    profile: Optional[Literal["mobile", "print", "archive"]] = None,
+    db: Session = Depends(get_read_db),
+):
+    """
+    The receipt URL behind the QR code. Browsers (Accept: text/html) get the
+    receipt page itself, gzip-precompressed, with a "Download PDF" link back to
+    this URL with `?format=pdf`; everyone else gets the PDF.
+    `profile` picks the PDF output profile (default PDF_PROFILE, "mobile").
+    Cached PDFs are always served; renders may be shed with 503 + Retry-After.
+    Kept for QR codes printed before signed URLs (/r/{token}).
+    """
+    return _receipt_view(request, str(receipt_id), format, profile, db)
+
+
+@router.get("/escpos/{receipt_id}")
+def get_escpos(
+    receipt_id: UUID,
+    paper: Literal["58", "80"] = "80",
+    db: Session = Depends(get_user_read_db),
+    current_user: str = Depends(verify_token),
+):
+    """
+    Raw ESC/POS bytes for the merchant's 58/80 mm thermal printer: text, raster
+    logo and a printer-drawn QR code. Send them to the printer as-is.
+    """
+    user_id = get_user_id(db, current_user)
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+    try:
+        data = generate_receipt_escpos(db, str(receipt_id), paper_mm=int(paper), owner=user_id)
+    except PermissionError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Receipt not found")
+    return Response(
+        data,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{receipt_id}.escpos"'},
     )
-    db.add(row)
-    db.commit()
-    db.refresh(row)
 
-    # Build a public URL for the PDF endpoint (avoid hard-coding LAN IPs)
-    # Add BASE_URL="http://localhost:8000" (or prod URL) to your .env and Settings
-    base = getattr(settings, "BASE_URL", "http://localhost:8000")
-    pdf_url = f"{base}/api/v1/receipts/pdf/{row.receipt_id}"
+
+def _receipt_body(row, snapshot: Optional[dict]) -> dict:
+    """ReceiptResponse fields for `row`: the QR points at its signed public URL."""
+    # Signed public URL (BASE_URL + /receipts/r/<token>), resolvable without a DB hit.
+    pdf_url = receipt_url(row.receipt_id, snapshot["v"] if snapshot else 0)
 
     # Generate a QR image (your function likely returns a file path or a data URL)
     pdf_endpoint = generate_qr(pdf_url)
@@ -91,3 +347,97 @@ def create_receipt(
         "total": row.total,  # Decimal will serialize fine
         "transaction_date": row.transaction_date,
     }
+
+
+@router.post("/", response_model=ReceiptResponse, status_code=status.HTTP_201_CREATED)
+def create_receipt(
+    receipt_data: ReceiptCreate,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: Any = Depends(verify_token),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Create a receipt row, persist it, generate a QR that points to the PDF endpoint,
+    and return fields matching ReceiptResponse. The row carries a render snapshot
+    of the merchant's header at this moment, so later template edits don't alter it.
+
+    With an Idempotency-Key header, retries of the same request return the
+    original response (marked `Idempotent-Replayed: true`) instead of creating
+    another receipt.
+    """
+    if idempotency_key is not None:
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+        store_key = (current_user, idempotency_key)
+        request_fp = fingerprint(receipt_data.model_dump(mode="json", exclude_unset=True))
+        stored = idempotency_store.get(store_key)
+        if stored is not None:
+            if stored.fingerprint != request_fp:
+                raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+            CACHE_REQUESTS.inc(cache="idempotency", result="hit")
+            response.headers["Idempotent-Replayed"] = "true"
+            return stored.body
+        CACHE_REQUESTS.inc(cache="idempotency", result="miss")
+
+    # Resolve current user → DB id
+    user_id = get_user_id(db, current_user)
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+    # Generate UUID in Python to store in receipt_id (SQLAlchemy column uses UUID type)
+    rid = uuid4()
+
+    values = {
+        "receipt_id": rid,
+        "user_id": str(user_id),
+        "transaction_date": receipt_data.transaction_date,
+        "total": Decimal(receipt_data.total),
+        "idempotency_key": idempotency_key,
+        "idempotency_fingerprint": request_fp if idempotency_key is not None else None,
+    }
+    with timed("db_lookup"):
+        values["render_snapshot"] = build_snapshot(db, user_id, values)
+    try:
+        if settings.INGEST_GROUP_COMMIT:
+            # Batched with concurrent requests; returns only after the batch is committed.
+            # Hand our pooled connection back first, the committer needs one.
+            db.close()
+            with timed("db_commit"):
+                row = get_committer().submit(values).result()
+        else:
+            row = Receipt(**values)
+            with timed("db_commit"):
+                db.add(row)
+                db.commit()
+                db.refresh(row)
+    except IntegrityError:
+        # Same key already committed (retry that reached another worker, or
+        # evicted from the store): replay the existing receipt, as the store would.
+        db.rollback()
+        if idempotency_key is None:
+            raise
+        row = db.execute(
+            select(Receipt).where(
+                Receipt.user_id == str(user_id), Receipt.idempotency_key == idempotency_key
+            )
+        ).scalar_one_or_none()
+        if row is None:
+            raise
+        # Rows created before the fingerprint column existed can't be compared; replay them.
+        if row.idempotency_fingerprint not in (None, request_fp):
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        body = _receipt_body(row, row.render_snapshot)
+        idempotency_store.put(store_key, request_fp, body)
+        response.headers["Idempotent-Replayed"] = "true"
+        return body
+
+    note_write(current_user)
+    invalidate_receipt(user_id, row.transaction_date)
+    publish_receipt_created(db, current_user, user_id, row)
+
+    # Group-commit rows come back without the snapshot column; it's the one we wrote.
+    body = _receipt_body(row, getattr(row, "render_snapshot", values["render_snapshot"]))
+    if idempotency_key is not None:
+        idempotency_store.put(store_key, request_fp, body)
+    return body
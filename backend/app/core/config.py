@@ -4,12 +4,104 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Read replicas (read-only routes round-robin over these; empty = primary only)
+    DATABASE_REPLICA_URLS: list[str] = []
+    # After a user writes, their reads stay on the primary this long (read-your-writes)
+    READ_STICKY_SECONDS: float = 5.0
+    # Retry a lookup on the primary when the replica hasn't got the row yet
+    REPLICA_MISS_FALLBACK: bool = True
     SECRET_KEY: str = "your-secret-key"
     HST_NUMBER: str = "123456789RT0001"
     REFRESH_TTL_MIN: int = 1440
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     ALGORITHM: str = "HS256"
     BASE_URL: str = "http://10.0.0.198:8000"
+    # Receipt URL signing keys (key id -> secret) and the id new URLs are signed with;
+    # empty = one key derived from SECRET_KEY (see services/receipts/signing.py)
+    RECEIPT_SIGNING_KEYS: dict[str, str] = {}
+    RECEIPT_SIGNING_KEY_ID: str | None = None
+    WKHTMLTOPDF_CMD: str | None = None
+    # Default PDF output profile (mobile / print / archive, see pdf_generator.PDF_PROFILES)
+    PDF_PROFILE: str = "mobile"
+
+    # Admission control for wkhtmltopdf renders (see services/receipts/admission.py)
+    RENDER_MAX_IN_FLIGHT: int = 4
+    RENDER_MAX_QUEUE: int = 16
+    RENDER_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    # Cross-worker lock per cached PDF: max wait for another worker's render of the same file
+    RENDER_LOCK_TIMEOUT_SECONDS: float = 30.0
+    # Per merchant (user_id): default caps, plus per-user_id overrides and fair-share weights
+    RENDER_TENANT_MAX_IN_FLIGHT: int = 2
+    RENDER_TENANT_MAX_QUEUE: int = 8
+    RENDER_TENANT_CAPS: dict[str, int] = {}
+    RENDER_TENANT_WEIGHTS: dict[str, float] = {}
+
+    # Group-commit ingestion for POST /receipts (see services/receipts/ingest.py)
+    INGEST_GROUP_COMMIT: bool = False
+    INGEST_MAX_BATCH: int = 64
+    INGEST_MAX_LATENCY_MS: float = 5.0
+
+    # Idempotency-Key replay store for POST /receipts (per worker; DB unique key backs it)
+    IDEMPOTENCY_TTL_SECONDS: int = 24 * 3600
+    IDEMPOTENCY_MAX_ENTRIES: int = 10_000
+
+    # Closed-bucket cache for /receipts/analytics (per worker)
+    ANALYTICS_CACHE_MAX_USERS: int = 1000
+    ANALYTICS_CACHE_TTL_SECONDS: int = 3600
+
+    # Rows per cursor fetch for GET /receipts/export
+    EXPORT_CHUNK_SIZE: int = 5000
+
+    # Monthly statement jobs (POST /receipts/statements, see services/receipts/statements.py)
+    STATEMENT_CHUNK_SIZE: int = 500
+    STATEMENT_PAGES_PER_RENDER: int = 8  # chunk pages per wkhtmltopdf run; parts are merged after
+    STATEMENT_RENDER_ATTEMPTS: int = 8  # per batch, when admission control sheds it under load
+    STATEMENT_MAX_CONCURRENT_JOBS: int = 1
+    STATEMENT_JOB_TTL_SECONDS: int = 3600
+    STATEMENT_JOB_STALE_SECONDS: int = 900  # no progress saved for this long: worker presumed dead (queued jobs too)
+
+    # Live dashboard stream (GET /receipts/stream, see services/receipts/live.py)
+    LIVE_BROKER: str = "app.services.receipts.live:InProcessBroker"
+    LIVE_HEARTBEAT_SECONDS: float = 15.0
+    LIVE_QUEUE_SIZE: int = 32
+    LIVE_MAX_CONNECTIONS_PER_USER: int = 10
+
+    # Cold start: optionally warm renderer/QR/crypto/DB in the background at startup
+    WARMUP_ON_STARTUP: bool = False
+    WARMUP_RETRY_ATTEMPTS: int = 5
+    WARMUP_RETRY_BACKOFF_SECONDS: float = 1.0  # doubles per retry, capped at 30s
+    # Pre-render recent receipts into the local cache after start (services/receipts/cache_warmer.py)
+    CACHE_WARM_ON_STARTUP: bool = False
+    CACHE_WARM_WINDOW_HOURS: float = 24.0
+    CACHE_WARM_MAX_RECEIPTS: int = 500
+    CACHE_WARM_RATE_PER_SECOND: float = 2.0
+
+    # Cold-receipt archive (services/receipts/archive.py). Gates the archive job *and* every
+    # archive read; create receipt_archive + receipt_archive_totals before turning it on,
+    # and keep it on once anything has been archived.
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_AFTER_DAYS: float = 90.0
+    ARCHIVE_BATCH_SIZE: int = 1000
+    ARCHIVE_INTERVAL_SECONDS: int = 6 * 3600
+
+    # Generated-artifact sweeper (temporary_files/ + orphaned logos)
+    SWEEPER_ENABLED: bool = True
+    SWEEPER_INTERVAL_SECONDS: int = 15 * 60
+    TEMP_FILES_MAX_BYTES: int = 512 * 1024 * 1024
+    TEMP_FILES_MAX_AGE_HOURS: int = 24 * 7
+    ORPHAN_LOGO_GRACE_HOURS: int = 24
+
+    # Admin-only endpoints (token subjects allowed to use /admin/*)
+    ADMIN_EMAILS: list[str] = []
+
+    # Sampling profiler for live requests (see app/core/profiling.py)
+    PROFILING_ENABLED: bool = False
+    PROFILE_SAMPLE_RATE: float = 0.0
+    PROFILE_ROUTES: list[str] = []
+    PROFILE_USERS: list[str] = []
+    PROFILE_INTERVAL_MS: float = 5.0
+    PROFILE_DIR: str = "var/profiles"
+    PROFILE_MAX_FILES: int = 200
 
     # replaces inner class Config in v1
     model_config = SettingsConfigDict(
@@ -18,4 +110,4 @@ class Settings(BaseSettings):
     )
 
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,256 @@
+# backend/app/core/metrics.py
+"""
+Minimal in-process metrics (Prometheus text exposition) + Server-Timing.
+
+    with timed("pdf_render"):
+        ...
+
+records the duration into `qr_stage_duration_seconds{stage="pdf_render"}` and,
+when called inside a request, adds `pdf_render;dur=<ms>` to that response's
+Server-Timing header (see ServerTimingMiddleware).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {v}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[idx] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, (counts, total) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets, counts):
+                cumulative += c
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            cumulative += counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total[0]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} already registered")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ---- metrics shared across the app ----
+REQUEST_DURATION = Histogram(
+    "qr_http_request_duration_seconds", "HTTP request latency by route.", ["method", "route", "status"]
+)
+STAGE_DURATION = Histogram(
+    "qr_stage_duration_seconds", "Latency of individual request stages (db, render, pdf, qr, io).", ["stage"]
+)
+CACHE_REQUESTS = Counter(
+    "qr_cache_requests_total", "Artifact cache lookups by cache and result (hit/miss/coalesced; warm = cache warmer fills).", ["cache", "result"]
+)
+RENDER_FAILURES = Counter(
+    "qr_render_failures_total", "Failed template/PDF renders by kind.", ["kind"]
+)
+RENDERS_IN_FLIGHT = Gauge(
+    "qr_renders_in_flight", "wkhtmltopdf renders currently running.", ["kind"]
+)
+PDF_BYTES = Histogram(
+    "qr_pdf_bytes", "Size of rendered PDFs by output profile.", ["kind", "profile"],
+    buckets=(8_000, 16_000, 32_000, 64_000, 128_000, 256_000, 512_000, 1_000_000, 2_000_000),
+)
+PDF_RENDERS_AVOIDED = Counter(
+    "qr_pdf_renders_avoided_total", "Receipt views answered with HTML while no PDF was cached (a render saved)."
+)
+RENDER_ADMISSION = Gauge(
+    "qr_render_admission", "Render admission controller: slots in use and requests waiting.", ["state"]
+)
+RENDERS_SHED = Counter(
+    "qr_renders_shed_total", "Renders rejected with 503 by admission control.", ["kind", "reason"]
+)
+DB_SESSIONS = Counter(
+    "qr_db_sessions_total", "Read sessions by routing target (primary/replica/fallback).", ["target"]
+)
+LIVE_SUBSCRIBERS = Gauge(
+    "qr_live_subscribers", "Open live dashboard (SSE) connections on this worker.", []
+)
+LIVE_EVENTS = Counter(
+    "qr_live_events_total", "Live dashboard events by outcome (queued / dropped for a slow consumer).", ["result"]
+)
+CACHE_WARM = Gauge(
+    "qr_cache_warm_receipts", "Startup cache warming progress (pending / rendered / cached / failed).", ["state"]
+)
+RECEIPTS_ARCHIVED = Counter(
+    "qr_receipts_archived_total", "Receipts moved from the hot table to the cold archive."
+)
+INGEST_BATCH_SIZE = Histogram(
+    "qr_ingest_batch_size", "Receipts written per group-commit transaction.", [],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256),
+)
+# Sync endpoints (every render path) run on anyio's worker pool; its waiters are the request queue.
+THREADPOOL_QUEUE = Gauge(
+    "qr_threadpool_queue_depth", "Sync handlers waiting for / holding a worker thread.", ["state"]
+)
+
+
+# ---- Server-Timing ----
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timings", default=None)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_DURATION.observe(elapsed, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def _server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    entries = [f"{stage};dur={elapsed * 1000:.1f}" for stage, elapsed in timings]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Collects timed() stages of a request into a Server-Timing header and records
+    the request latency by route template (e.g. /api/v1/receipts/pdf/{receipt_id}).
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings: List[Tuple[str, float]] = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", _server_timing_header(timings, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path_format", None) or "<unmatched>",
+                status=str(status["code"]),
+            )
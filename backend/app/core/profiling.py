@@ -0,0 +1,259 @@
+# backend/app/core/profiling.py
+"""
+Opt-in sampling profiler for live requests.
+
+When enabled (PROFILING_ENABLED or PUT /api/v1/admin/profiling/config), a
+request is profiled if it matches one of the configured route prefixes or
+user emails, or falls in the random sample_rate fraction. While it runs, a
+single sampler thread snapshots the stacks of the threads executing its
+endpoint every `interval_ms`. The result is written in the "folded stacks"
+format (`frame;frame;frame <count>`) that flamegraph.pl, speedscope and
+inferno read directly. Files go to a bounded ring buffer under PROFILE_DIR.
+
+Disabled cost: one attribute check in the middleware, one ContextVar read per
+endpoint call.
+"""
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter as CounterDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional, Set
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.config import settings
+
+FOLDED_SUFFIX = ".folded"
+_SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+@dataclass
+class ProfilerConfig:
+    enabled: bool = False
+    sample_rate: float = 0.0           # fraction of all requests, 0..1
+    routes: List[str] = field(default_factory=list)  # path prefixes, e.g. "/api/v1/receipts/all"
+    users: List[str] = field(default_factory=list)   # token subjects (emails)
+    interval_ms: float = 5.0
+
+
+@dataclass(eq=False)
+class Profile:
+    method: str
+    path: str
+    user: Optional[str]
+    started: float = field(default_factory=time.time)
+    threads: Set[int] = field(default_factory=set)
+    stacks: CounterDict = field(default_factory=CounterDict)
+    samples: int = 0
+
+
+_current: ContextVar[Optional[Profile]] = ContextVar("current_profile", default=None)
+
+
+def _fold(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class SamplingProfiler:
+    def __init__(self, config: ProfilerConfig, directory: str, max_files: int) -> None:
+        self.config = config
+        self.directory = directory
+        self.max_files = max_files
+        self._active: Set[Profile] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- selection ----
+    def should_profile(self, scope: Scope) -> Optional[Profile]:
+        path = scope["path"]
+        cfg = self.config
+        user = _token_subject(scope) if cfg.users else None
+        selected = (
+            any(path.startswith(prefix) for prefix in cfg.routes)
+            or (user is not None and user in cfg.users)
+            or (cfg.sample_rate > 0 and random.random() < cfg.sample_rate)
+        )
+        if not selected:
+            return None
+        return Profile(method=scope["method"], path=path, user=user)
+
+    # ---- sampling ----
+    def start(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+            self._wake.notify()
+
+    def stop(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.discard(profile)
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wake.wait()
+                active = list(self._active)
+            frames = sys._current_frames()
+            for profile in active:
+                for tid in list(profile.threads):
+                    frame = frames.get(tid)
+                    if frame is not None and tid != me:
+                        profile.stacks[_fold(frame)] += 1
+                        profile.samples += 1
+            del frames
+            time.sleep(self.config.interval_ms / 1000)
+
+    # ---- ring buffer ----
+    def save(self, profile: Profile, status: int) -> Optional[str]:
+        if not profile.stacks:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.fromtimestamp(profile.started, timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+        duration_ms = int((time.time() - profile.started) * 1000)
+        route = _SAFE_NAME_RE.sub("_", profile.path.strip("/")) or "root"
+        name = f"{stamp}_{profile.method}_{route[:80]}_{status}_{duration_ms}ms{FOLDED_SUFFIX}"
+        path = os.path.join(self.directory, name)
+
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        os.replace(tmp, path)
+        self._trim()
+        return path
+
+    def _trim(self) -> None:
+        files = sorted(self.list_profiles())
+        for name in files[: max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def list_profiles(self) -> List[str]:
+        try:
+            return [n for n in os.listdir(self.directory) if n.endswith(FOLDED_SUFFIX)]
+        except FileNotFoundError:
+            return []
+
+    def profile_path(self, name: str) -> Optional[str]:
+        if os.path.basename(name) != name or not name.endswith(FOLDED_SUFFIX):
+            return None
+        path = os.path.join(self.directory, name)
+        return path if os.path.isfile(path) else None
+
+
+def _token_subject(scope: Scope) -> Optional[str]:
+    from jose import JWTError, jwt
+
+    auth = Headers(scope=scope).get("authorization", "")
+    if not auth.lower().startswith("bearer "):
+        return None
+    try:
+        payload = jwt.decode(auth.split(" ", 1)[1].strip(), settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        return None
+    return payload.get("sub")
+
+
+profiler = SamplingProfiler(
+    ProfilerConfig(
+        enabled=settings.PROFILING_ENABLED,
+        sample_rate=settings.PROFILE_SAMPLE_RATE,
+        routes=list(settings.PROFILE_ROUTES),
+        users=list(settings.PROFILE_USERS),
+        interval_ms=settings.PROFILE_INTERVAL_MS,
+    ),
+    directory=settings.PROFILE_DIR,
+    max_files=settings.PROFILE_MAX_FILES,
+)
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not profiler.config.enabled or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profile = profiler.should_profile(scope)
+        if profile is None:
+            return await self.app(scope, receive, send)
+
+        status = {"code": 500}
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        token = _current.set(profile)
+        profiler.start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop(profile)
+            _current.reset(token)
+            await asyncio.to_thread(profiler.save, profile, status["code"])
+
+
+def _attach_thread(call):
+    """Register the thread running the endpoint with the request's profile, if any."""
+    if asyncio.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def async_wrapper(**kwargs):
+            profile = _current.get()
+            if profile is None:
+                return await call(**kwargs)
+            profile.threads.add(threading.get_ident())  # event loop thread
+            try:
+                return await call(**kwargs)
+            finally:
+                profile.threads.discard(threading.get_ident())
+        return async_wrapper
+
+    @functools.wraps(call)
+    def sync_wrapper(**kwargs):
+        profile = _current.get()
+        if profile is None:
+            return call(**kwargs)
+        tid = threading.get_ident()  # worker thread picked by run_in_threadpool
+        profile.threads.add(tid)
+        try:
+            return call(**kwargs)
+        finally:
+            profile.threads.discard(tid)
+    return sync_wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """APIRoute whose endpoint reports its thread to the active profile."""
+
+    def get_route_handler(self):
+        if not getattr(self.dependant.call, "_profiled", False):
+            self.dependant.call = _attach_thread(self.dependant.call)
+            self.dependant.call._profiled = True
+        return super().get_route_handler()
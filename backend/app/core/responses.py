@@ -0,0 +1,72 @@
+# backend/app/core/responses.py
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Dict
+
+from fastapi.responses import JSONResponse
+
+CENT = Decimal("0.01")
+
+
+def format_decimal(value: Decimal | float | int | None) -> str:
+    """
+    Money values are always emitted as JSON numbers with two decimals ("12.50"),
+    whatever the DB driver returned (Decimal, float or int for empty sums).
+    """
+    if value is None:
+        return "null"
+    if type(value) is Decimal:
+        text = str(value)
+        if text[-3:-2] == "." and "E" not in text:  # Numeric(10, 2) columns: already exact
+            return text
+    else:
+        value = Decimal(str(value))
+    return str(value.quantize(CENT))
+
+
+class RawJSONResponse(JSONResponse):
+    """
+    Body is already-encoded JSON bytes (see app.services.receipts.encoding).
+    Returning it from a route skips FastAPI's jsonable_encoder walk entirely.
+    """
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+def _accept_q(accept: str) -> Dict[str, float]:
+    prefs: Dict[str, float] = {}
+    for part in accept.split(","):
+        media, *params = [p.strip() for p in part.split(";")]
+        if not media:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        prefs[media.lower()] = max(q, prefs.get(media.lower(), 0.0))
+    return prefs
+
+
+def _quality(prefs: Dict[str, float], media: str) -> float:
+    kind = media.split("/", 1)[0]
+    for candidate in (media, f"{kind}/*", "*/*"):
+        if candidate in prefs:
+            return prefs[candidate]
+    return 0.0
+
+
+def prefers_html(accept: str | None, over: str = "application/pdf") -> bool:
+    """
+    True when the Accept header ranks text/html strictly above `over`.
+    Browsers ("text/html,...,*/*;q=0.8") get HTML; "*/*" clients and PDF
+    viewers keep getting `over`.
+    """
+    if not accept:
+        return False
+    prefs = _accept_q(accept)
+    return _quality(prefs, "text/html") > _quality(prefs, over)
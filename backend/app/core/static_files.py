@@ -0,0 +1,215 @@
+# backend/app/core/static_files.py
+from __future__ import annotations
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, PathLike, StaticFiles
+from starlette.types import Scope, Send
+
+try:  # brotli is optional; gzip variants are always produced
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+
+# Uploaded logos are named "user_<id>_<uuid4 hex>.<ext>" and never rewritten,
+# so any file carrying a 32-char hex token can be cached forever.
+HASHED_NAME_RE = re.compile(r"[_.-][0-9a-f]{32}\.[A-Za-z0-9]+$")
+COMPRESSIBLE_SUFFIXES = {".svg"}
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+
+
+@dataclass
+class StaticAsset:
+    path: str
+    etag: str
+    size: int
+    mtime: float
+    immutable: bool
+    variants: Dict[str, str] = field(default_factory=dict)  # encoding -> file path
+
+
+class StaticAssetIndex:
+    """
+    In-memory index of files under app/static:
+      - strong ETag from the file content (computed once per file revision)
+      - pre-compressed .br/.gz siblings for compressible types (SVG)
+    Filled at startup via scan() and kept fresh via register() on upload.
+    """
+
+    def __init__(self) -> None:
+        self._assets: Dict[str, StaticAsset] = {}
+        self._lock = threading.Lock()
+
+    def scan(self, directory: str | os.PathLike) -> int:
+        count = 0
+        for root, _dirs, files in os.walk(directory):
+            for name in files:
+                if _is_variant(name):
+                    continue
+                self.register(os.path.join(root, name))
+                count += 1
+        return count
+
+    def register(self, path: str | os.PathLike) -> StaticAsset:
+        path = os.path.realpath(path)
+        st = os.stat(path)
+        with open(path, "rb") as f:
+            content = f.read()
+
+        asset = StaticAsset(
+            path=path,
+            etag=f'"{hashlib.sha256(content).hexdigest()[:32]}"',
+            size=st.st_size,
+            mtime=st.st_mtime,
+            immutable=bool(HASHED_NAME_RE.search(os.path.basename(path))),
+        )
+        if Path(path).suffix.lower() in COMPRESSIBLE_SUFFIXES:
+            asset.variants = _write_variants(path, content)
+
+        with self._lock:
+            self._assets[path] = asset
+        return asset
+
+    def forget(self, path: str | os.PathLike) -> None:
+        path = os.path.realpath(path)
+        with self._lock:
+            asset = self._assets.pop(path, None)
+        if asset:
+            for variant in asset.variants.values():
+                try:
+                    os.remove(variant)
+                except FileNotFoundError:
+                    pass
+
+    def lookup(self, path: str | os.PathLike, stat_result: os.stat_result) -> StaticAsset:
+        """
+        Return the indexed entry, re-registering it if the file changed on disk
+        (or was written by another worker) since it was indexed.
+        """
+        path = os.path.realpath(path)
+        asset = self._assets.get(path)
+        if asset is None or asset.size != stat_result.st_size or asset.mtime != stat_result.st_mtime:
+            asset = self.register(path)
+        return asset
+
+
+def _is_variant(name: str) -> bool:
+    stem, ext = os.path.splitext(name)
+    return ext in VARIANT_SUFFIXES.values() and Path(stem).suffix.lower() in COMPRESSIBLE_SUFFIXES
+
+
+def _write_variants(path: str, content: bytes) -> Dict[str, str]:
+    variants: Dict[str, str] = {}
+    encoded: Dict[str, bytes] = {"gzip": gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(content, quality=11)
+
+    for encoding, data in encoded.items():
+        if len(data) >= len(content):
+            continue
+        out = path + VARIANT_SUFFIXES[encoding]
+        tmp = f"{out}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out)
+        variants[encoding] = out
+    return variants
+
+
+def _accepted_encodings(scope: Scope) -> set[str]:
+    header = Headers(scope=scope).get("accept-encoding", "")
+    accepted = set()
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if token:
+            accepted.add(token.strip().lower())
+    return accepted
+
+
+class SendfileFileResponse(FileResponse):
+    """
+    FileResponse that hands the open file to the server when it advertises the
+    ASGI "http.response.zerocopysend" extension (sendfile(2) under the hood).
+    Falls back to Starlette's pathsend / chunked reads otherwise.
+    """
+
+    async def _handle_simple(self, send: Send, send_header_only: bool, send_pathsend: bool) -> None:
+        if send_header_only or send_pathsend or not self._zerocopy:
+            return await super()._handle_simple(send, send_header_only, send_pathsend)
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        with open(self.path, "rb") as file:
+            await send({"type": "http.response.zerocopysend", "file": file, "more_body": False})
+
+    async def __call__(self, scope, receive, send) -> None:
+        self._zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        await super().__call__(scope, receive, send)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles with cache headers suited for uploaded logos:
+      - content-hashed names get `Cache-Control: immutable` (1 year)
+      - everything else must revalidate against a precomputed strong ETag
+      - SVGs are served from their .br/.gz siblings when the client accepts them
+    """
+
+    def __init__(self, *args, index: Optional[StaticAssetIndex] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.index = index or asset_index
+
+    def file_response(
+        self,
+        full_path: PathLike,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        asset = self.index.lookup(full_path, stat_result)
+        headers = {
+            "etag": asset.etag,
+            "cache-control": IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL,
+        }
+
+        serve_path, serve_stat = str(full_path), stat_result
+        if asset.variants:
+            headers["vary"] = "Accept-Encoding"
+            accepted = _accepted_encodings(scope)
+            for encoding in ("br", "gzip"):
+                variant = asset.variants.get(encoding)
+                if encoding in accepted and variant and os.path.exists(variant):
+                    serve_path, serve_stat = variant, os.stat(variant)
+                    headers["content-encoding"] = encoding
+                    headers["etag"] = f'{asset.etag[:-1]}-{encoding}"'
+                    break
+
+        media_type = mimetypes.guess_type(str(full_path))[0] or "text/plain"
+        response = SendfileFileResponse(
+            serve_path,
+            status_code=status_code,
+            headers=headers,
+            media_type=media_type,
+            stat_result=serve_stat,
+        )
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+asset_index = StaticAssetIndex()
@@ -0,0 +1,111 @@
+# backend/app/core/warmup.py
+"""
+Explicit warm-up for a freshly started worker.
+
+Heavy dependencies (SQLAlchemy engine/driver, Jinja + receipt.html, pdfkit,
+qrcode/PIL, passlib/argon2, python-jose) are loaded lazily on first use.
+warm_up() loads them ahead of traffic; /health/ready reports the progress.
+
+A failing step (say, the database still coming up) is retried with
+exponential backoff, WARMUP_RETRY_ATTEMPTS times in all. After the last
+attempt it is given up on: marked warm with its error kept, so readiness
+recovers and the dependency is loaded lazily on first use as before.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _database() -> None:
+    from app.db import session
+    session.warm()
+
+
+def _renderer() -> None:
+    from app.services.receipts import pdf_generator
+    pdf_generator.warm()
+
+
+def _qr() -> None:
+    from app.services.receipts import qr_code
+    qr_code.warm()
+
+
+def _auth() -> None:
+    from app.services import utils
+    utils.warm()
+
+
+STEPS: Dict[str, Callable[[], None]] = {
+    "database": _database,
+    "renderer": _renderer,
+    "qr": _qr,
+    "auth": _auth,
+}
+
+MAX_BACKOFF_SECONDS = 30.0
+
+_lock = threading.Lock()
+_stop = threading.Event()
+_state: Dict[str, dict] = {
+    name: {"warm": False, "seconds": None, "error": None, "attempts": 0} for name in STEPS
+}
+
+
+def _run_step(name: str) -> None:
+    from app.core.config import settings
+
+    attempts = max(1, settings.WARMUP_RETRY_ATTEMPTS)
+    delay = settings.WARMUP_RETRY_BACKOFF_SECONDS
+    start = time.perf_counter()
+    for attempt in range(1, attempts + 1):
+        try:
+            STEPS[name]()
+            error = None
+        except Exception as e:
+            error = str(e)
+        last = error is None or attempt == attempts or _stop.is_set()
+        if error is not None:
+            if last:
+                logger.error("warm-up step %s failed after %d attempts, giving up: %s", name, attempt, error)
+            else:
+                logger.warning("warm-up step %s failed (attempt %d/%d): %s", name, attempt, attempts, error)
+        with _lock:
+            _state[name] = {
+                # Given up counts as warm: the step falls back to lazy loading.
+                "warm": last,
+                "seconds": round(time.perf_counter() - start, 4),
+                "error": error,
+                "attempts": attempt,
+            }
+        if last or _stop.wait(delay):
+            return
+        delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+
+
+def warm_up(steps: Optional[List[str]] = None) -> Dict[str, dict]:
+    """Run the warm-up steps (all by default). Failures are retried and recorded, not raised."""
+    _stop.clear()
+    for name in steps or list(STEPS):
+        _run_step(name)
+    return warm_state()
+
+
+def stop() -> None:
+    """Cut pending retries short (shutdown)."""
+    _stop.set()
+
+
+def warm_state() -> Dict[str, dict]:
+    with _lock:
+        return {name: dict(s) for name, s in _state.items()}
+
+
+def is_warm() -> bool:
+    with _lock:
+        return all(s["warm"] for s in _state.values())
@@ -1,19 +1,144 @@
+import itertools
+import threading
+import time
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from fastapi import Depends
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.core.metrics import DB_SESSIONS
+from app.services.utils import verify_token
 
 
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+@lru_cache(maxsize=None)
+def get_engine():
+    """
+    Created on first use (first session or warm-up), which also defers
+    importing the DB driver until the worker actually needs it.
+    """
+    return create_engine(
+        SQLALCHEMY_DATABASE_URL
+    )
+
+
+@lru_cache(maxsize=None)
+def get_read_engines() -> List:
+    """Engines for DATABASE_REPLICA_URLS; empty when no replicas are configured."""
+    return [create_engine(url) for url in settings.DATABASE_REPLICA_URLS]
+
+
+class _LazySessionmaker(sessionmaker):
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None and "bind" not in local_kw:
+            self.configure(bind=get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
+
+
+def warm() -> None:
+    """Create the engines and open one pooled connection on each."""
+    for engine in [get_engine(), *get_read_engines()]:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# ---- read/write routing ----
+#
+# Writes and anything that must see them use get_db (primary). Read-only routes
+# use get_read_db / get_user_read_db, which pick a replica round-robin unless:
+#   - no replicas are configured, or
+#   - the user wrote within READ_STICKY_SECONDS (read-your-writes; per worker).
+# A lookup that misses on a replica (row not replicated yet) can retry on the
+# primary via primary_fallback() when REPLICA_MISS_FALLBACK is on.
+
+_replica_cycle = None
+_cycle_lock = threading.Lock()
+_last_write: Dict[str, float] = {}
+
+
+def _next_read_engine():
+    global _replica_cycle
+    engines = get_read_engines()
+    if not engines:
+        return None
+    with _cycle_lock:
+        if _replica_cycle is None:
+            _replica_cycle = itertools.cycle(engines)
+        return next(_replica_cycle)
+
+
+def note_write(user: str) -> None:
+    """Pin `user`'s reads to the primary for READ_STICKY_SECONDS."""
+    now = time.monotonic()
+    with _cycle_lock:
+        _last_write[user] = now
+        if len(_last_write) > 10_000:  # drop expired pins
+            cutoff = now - settings.READ_STICKY_SECONDS
+            for key in [k for k, t in _last_write.items() if t < cutoff]:
+                del _last_write[key]
+
+
+def _is_sticky(user: Optional[str]) -> bool:
+    if user is None:
+        return False
+    written = _last_write.get(user)
+    return written is not None and time.monotonic() - written < settings.READ_STICKY_SECONDS
+
+
+def read_session(user: Optional[str] = None) -> Session:
+    engine = None if _is_sticky(user) else _next_read_engine()
+    if engine is None:
+        DB_SESSIONS.inc(target="primary")
+        return SessionLocal()
+    DB_SESSIONS.inc(target="replica")
+    db = SessionLocal(bind=engine)
+    db.info["replica"] = True
+    return db
+
+
+def is_replica(db: Session) -> bool:
+    return bool(db.info.get("replica"))
+
+
+def primary_fallback(db: Session) -> Optional[Session]:
+    """
+    A primary session to retry a replica miss on, or None when `db` already is
+    the primary or fallback is disabled. The caller closes it.
+    """
+    if not is_replica(db) or not settings.REPLICA_MISS_FALLBACK:
+        return None
+    DB_SESSIONS.inc(target="fallback")
+    return SessionLocal()
+
+
+def get_read_db():
+    """Replica session for unauthenticated reads (e.g. PDF lookups by id)."""
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_user_read_db(current_user: str = Depends(verify_token)):
+    """Replica session for the caller's own data, sticky to the primary right after a write."""
+    db = read_session(current_user)
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,24 +1,65 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
-from fastapi.staticfiles import StaticFiles
 
-from app.api.v1.endpoints import receip_template ,receipts, auth
+from app.api.v1.endpoints import receip_template ,receipts, auth, metrics, admin, health
 from app.core.config import settings
+from app.core.metrics import ServerTimingMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.static_files import ImmutableStaticFiles, asset_index
+from app.core import warmup
+from app.services.receipts import ingest
+from app.services.receipts.archive import archive_loop
+from app.services.receipts.cache_warmer import cache_warmer
+from app.services.receipts.statements import statement_jobs
+from app.services.receipts.sweeper import sweeper_loop
 # from app.middlewear.auth_mw import AutoRefreshMiddleware
 
 
+STATIC_DIR = "app/static"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Precompute ETags / compressed variants for everything already on disk
+    asset_index.scan(STATIC_DIR)
+
+    tasks = []
+    if settings.WARMUP_ON_STARTUP:
+        # Runs in a worker thread; /health/ready turns 200 when it completes.
+        tasks.append(asyncio.create_task(asyncio.to_thread(warmup.warm_up)))
+    if settings.CACHE_WARM_ON_STARTUP:
+        # Background thread; yields to live renders, progress in /health/ready.
+        tasks.append(asyncio.create_task(asyncio.to_thread(cache_warmer.run)))
+    if settings.SWEEPER_ENABLED:
+        tasks.append(asyncio.create_task(sweeper_loop(settings.SWEEPER_INTERVAL_SECONDS)))
+    if settings.ARCHIVE_ENABLED:
+        tasks.append(asyncio.create_task(archive_loop(settings.ARCHIVE_INTERVAL_SECONDS)))
+    yield
+
+    warmup.stop()
+    cache_warmer.stop()
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    statement_jobs.shutdown()
+    # Commit whatever the group committer still holds before the worker exits
+    await asyncio.to_thread(ingest.shutdown)
 
 
 app = FastAPI(
     title="QR Receipt Generator",
     version="1.0.0", 
-    swagger_ui_parameters={"persistAuthorization": True},)
+    swagger_ui_parameters={"persistAuthorization": True},
+    lifespan=lifespan,)
 
 os.makedirs("app/static/logo", exist_ok=True)
-app.mount("/static", StaticFiles(directory="app/static"), name="static")
+app.mount("/static", ImmutableStaticFiles(directory=STATIC_DIR), name="static")
 
 def custom_openapi():
     if app.openapi_schema:
@@ -60,10 +101,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
 app.include_router(auth.router, prefix="/api/v1", tags=["auth"])
 app.include_router(receipts.router, prefix="/api/v1", tags=["receipts"])
 app.include_router(receip_template.router, prefix="/api/v1", tags=["receip_template"])
+app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
+app.include_router(metrics.router)
+app.include_router(health.router)
 # app.include_router(templates.router, prefix="/api/v1/templates", tags=["templates"])
 # uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload
\ No newline at end of file
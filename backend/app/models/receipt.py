@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Integer
+from sqlalchemy import Column, String, Numeric, DateTime, ForeignKey, Integer, JSON, UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID  
 
 import uuid
@@ -11,4 +11,14 @@ class Receipt(Base):
     receipt_id = Column(UUID(as_uuid=True), unique=True, default=uuid.uuid4, index=True)
     user_id = Column(String, ForeignKey("users.id"))
     transaction_date = Column(DateTime(timezone=True))
-    total = Column(Numeric(10, 2))
\ No newline at end of file
+    total = Column(Numeric(10, 2))
+    # Client-supplied Idempotency-Key of the create request (POS retries)
+    idempotency_key = Column(String(255), nullable=True)
+    # fingerprint() of that request's body, so a key reused with another body is refused
+    idempotency_fingerprint = Column(String(64), nullable=True)
+    # Versioned render inputs frozen at creation (services/receipts/snapshot.py)
+    render_snapshot = Column(JSON, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uq_receipts_user_idempotency_key"),
+    )
\ No newline at end of file
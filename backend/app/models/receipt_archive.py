@@ -0,0 +1,33 @@
+from sqlalchemy import Column, String, Numeric, DateTime, Integer, LargeBinary, Index
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.sql import func
+
+from app.db.base import Base
+
+
+class ReceiptArchive(Base):
+    """Cold receipts moved out of `receipts` (services/receipts/archive.py)."""
+    __tablename__ = "receipt_archive"
+
+    receipt_id = Column(UUID(as_uuid=True), primary_key=True)
+    user_id = Column(String, nullable=False)
+    transaction_date = Column(DateTime(timezone=True))
+    total = Column(Numeric(10, 2))
+    # The snapshot's logo URL, kept out of the payload so the sweeper can see it's still in use
+    logo = Column(String, nullable=True)
+    # zlib-compressed JSON of the remaining receipt columns (render snapshot, etc.)
+    payload = Column(LargeBinary, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_receipt_archive_user_date", "user_id", "transaction_date"),
+    )
+
+
+class ReceiptArchiveTotal(Base):
+    """Per-merchant count/sum of archived receipts, so stats don't scan the archive."""
+    __tablename__ = "receipt_archive_totals"
+
+    user_id = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    total = Column(Numeric(14, 2), nullable=False, default=0)
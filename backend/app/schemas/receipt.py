@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 from decimal import Decimal
+from uuid import UUID
 from pydantic import BaseModel, ConfigDict, Field, EmailStr, SecretStr
 
 
@@ -28,3 +29,59 @@ class ReceiptResponse(ReceiptBase):
         str_strip_whitespace=True,
         populate_by_name=True,
     )
+
+
+# --- Read models (documentation for the pre-encoded list/stats bodies) ---
+
+class ReceiptListItem(BaseModel):
+    id: UUID
+    total: Decimal
+    transaction_date: datetime | None = None
+
+
+class RecentReceipt(BaseModel):
+    total: Decimal
+    transaction_date: datetime | None = None
+
+
+class UserStats(BaseModel):
+    total: Decimal
+    total_today: Decimal
+    recent_receipts: list[RecentReceipt]
+
+
+class RevenueBucket(BaseModel):
+    start: datetime
+    end: datetime
+    revenue: Decimal
+    count: int
+    closed: bool
+
+
+class RevenueSeries(BaseModel):
+    interval: str
+    tz: str
+    start: datetime
+    end: datetime
+    total_revenue: Decimal
+    total_count: int
+    buckets: list[RevenueBucket]
+
+
+# --- Statements ---
+
+class StatementCreate(BaseModel):
+    month: str = Field(pattern=r"^\d{4}-(0[1-9]|1[0-2])$", examples=["2024-05"])
+    tz: str = "UTC"
+
+
+class StatementJobOut(BaseModel):
+    id: str
+    status: str
+    month: str
+    tz: str
+    total: int
+    done: int
+    pages: int
+    error: str | None = None
+    pdf_url: str | None = None
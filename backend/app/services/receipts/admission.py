@@ -0,0 +1,242 @@
+"""
+Admission control and fair scheduling for wkhtmltopdf renders.
+
+Every render is a separate wkhtmltopdf process (~50-150 MB RSS), so an
+unbounded burst of cache misses on /receipts/pdf/{id} can take the host down.
+At most `max_in_flight` renders run at once; up to `max_queue` more wait for a
+slot. A request is shed with 503 + Retry-After when the queue is full, or when
+the expected wait (queue position x average render time) would exceed the
+queue deadline, or when it actually waited that long without getting a slot.
+
+Waiting renders are scheduled per tenant (the merchant's user_id) so one
+merchant replaying receipts or hammering previews cannot take every slot:
+  - priority first: customer scans, then previews, then exports, then
+    background cache warming;
+  - within a priority, the tenant with the least weighted service so far goes
+    next (start-time fair queuing on a per-tenant virtual clock);
+  - a tenant never holds more than its concurrency cap, nor more than its
+    share of the queue.
+
+Only cache misses pass through here: cached PDFs are served without a slot, so
+they keep working while renders are being shed.
+"""
+from __future__ import annotations
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Iterator, Mapping, Optional
+
+from fastapi import HTTPException, status
+
+from app.core.config import settings
+from app.core.metrics import RENDER_ADMISSION, RENDERS_SHED
+
+# Weight of the newest render in the moving average used for wait estimates.
+EWMA_ALPHA = 0.2
+
+# Lower runs first. Unknown kinds get the lowest priority.
+PRIORITIES: Dict[str, int] = {"receipt": 0, "preview": 1, "export": 2, "warm": 3}
+LOWEST_PRIORITY = max(PRIORITIES.values())
+
+
+class RenderOverloaded(HTTPException):
+    def __init__(self, retry_after: float, reason: str) -> None:
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Renderer overloaded ({reason}), retry later",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+        self.reason = reason
+
+
+@dataclass(eq=False)
+class _Waiter:
+    tenant: str
+    priority: int
+    enqueued: float = field(default_factory=time.monotonic)
+    event: threading.Event = field(default_factory=threading.Event)
+    granted: bool = False
+
+
+@dataclass
+class _Tenant:
+    in_flight: int = 0
+    queued: int = 0
+    vtime: float = 0.0  # weighted renders granted so far (virtual clock)
+    waiting: Dict[int, Deque[_Waiter]] = field(default_factory=dict)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int,
+        queue_timeout: float,
+        tenant_max_in_flight: Optional[int] = None,
+        tenant_max_queue: Optional[int] = None,
+        tenant_caps: Optional[Mapping[str, int]] = None,
+        tenant_weights: Optional[Mapping[str, float]] = None,
+        initial_render_seconds: float = 1.0,
+    ) -> None:
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.tenant_max_in_flight = tenant_max_in_flight or self.max_in_flight
+        self.tenant_max_queue = self.max_queue if tenant_max_queue is None else tenant_max_queue
+        self.tenant_caps = dict(tenant_caps or {})
+        self.tenant_weights = dict(tenant_weights or {})
+        self.avg_render_seconds = initial_render_seconds
+        self.in_flight = 0
+        self.queued = 0
+        self._tenants: Dict[str, _Tenant] = {}
+        self._vclock = 0.0  # vtime of the last grant; late joiners start here
+        self._lock = threading.Lock()
+
+    # ---- policy ----
+    def _cap(self, tenant: str) -> int:
+        return self.tenant_caps.get(tenant, self.tenant_max_in_flight)
+
+    def _weight(self, tenant: str) -> float:
+        return max(self.tenant_weights.get(tenant, 1.0), 1e-6)
+
+    def _tenant(self, tenant: str) -> _Tenant:
+        t = self._tenants.get(tenant)
+        if t is None:
+            # Tenants are dropped when idle, so a returning one can't bank credit.
+            t = self._tenants[tenant] = _Tenant(vtime=self._vclock)
+        return t
+
+    def _expected_wait(self, position: int) -> float:
+        # Renders finish in waves of max_in_flight; `position` includes us.
+        return math.ceil(position / self.max_in_flight) * self.avg_render_seconds
+
+    def _ahead_of(self, priority: int) -> int:
+        return sum(
+            len(q) for t in self._tenants.values() for p, q in t.waiting.items() if p <= priority
+        )
+
+    # ---- bookkeeping (all under self._lock) ----
+    def _grant(self, tenant: str, t: _Tenant) -> None:
+        self.in_flight += 1
+        t.in_flight += 1
+        self._vclock = max(self._vclock, t.vtime)  # start tag of the render now in service
+        t.vtime += 1.0 / self._weight(tenant)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        best: Optional[tuple] = None
+        for name, t in self._tenants.items():
+            if not t.queued or t.in_flight >= self._cap(name):
+                continue
+            priority = min(p for p, q in t.waiting.items() if q)
+            key = (priority, t.vtime)
+            if best is None or key < best[0]:
+                best = (key, name, t, priority)
+        if best is None:
+            return None
+        _, name, t, priority = best
+        waiter = t.waiting[priority].popleft()
+        t.queued -= 1
+        self.queued -= 1
+        return waiter
+
+    def _dispatch(self) -> None:
+        while self.in_flight < self.max_in_flight:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            self._grant(waiter.tenant, self._tenants[waiter.tenant])
+            waiter.granted = True
+            waiter.event.set()
+
+    def _dequeue(self, waiter: _Waiter, t: _Tenant) -> None:
+        t.waiting[waiter.priority].remove(waiter)
+        t.queued -= 1
+        self.queued -= 1
+
+    def _forget_idle(self, tenant: str, t: _Tenant) -> None:
+        if not t.in_flight and not t.queued:
+            self._tenants.pop(tenant, None)
+
+    def _publish(self) -> None:
+        RENDER_ADMISSION.set(self.in_flight, state="in_flight")
+        RENDER_ADMISSION.set(self.queued, state="queued")
+        RENDER_ADMISSION.set(len(self._tenants), state="tenants")
+
+    def _reject(self, kind: str, reason: str, retry_after: float) -> RenderOverloaded:
+        RENDERS_SHED.inc(kind=kind, reason=reason)
+        return RenderOverloaded(retry_after, reason)
+
+    # ---- API ----
+    def acquire(self, kind: str, tenant: str = "") -> None:
+        priority = PRIORITIES.get(kind, LOWEST_PRIORITY)
+        with self._lock:
+            t = self._tenant(tenant)
+            waiter = _Waiter(tenant, priority)
+            t.waiting.setdefault(priority, deque()).append(waiter)
+            t.queued += 1
+            self.queued += 1
+            self._dispatch()
+            if waiter.granted:
+                self._publish()
+                return
+
+            # Queued: shed now if we can't be served in time (counts include us).
+            expected = self._expected_wait(self._ahead_of(priority))
+            reason = None
+            if self.queued > self.max_queue:
+                reason = "queue_full"
+            elif t.queued > self.tenant_max_queue:
+                reason = "tenant_queue_full"
+            elif expected > self.queue_timeout:
+                reason = "deadline"
+            if reason is not None:
+                self._dequeue(waiter, t)
+                self._forget_idle(tenant, t)
+                self._publish()
+                raise self._reject(kind, reason, expected)
+            self._publish()
+
+        waiter.event.wait(self.queue_timeout)
+
+        with self._lock:
+            if waiter.granted:
+                return
+            self._dequeue(waiter, t)
+            self._forget_idle(tenant, t)
+            self._publish()
+            raise self._reject(kind, "timeout", self._expected_wait(self._ahead_of(priority) + 1))
+
+    def release(self, tenant: str, elapsed: float) -> None:
+        with self._lock:
+            t = self._tenants[tenant]
+            self.in_flight -= 1
+            t.in_flight -= 1
+            self.avg_render_seconds += EWMA_ALPHA * (elapsed - self.avg_render_seconds)
+            self._dispatch()
+            self._forget_idle(tenant, t)
+            self._publish()
+
+    @contextmanager
+    def slot(self, kind: str, tenant: str = "") -> Iterator[None]:
+        """Hold a render slot for `tenant` during the block, or raise RenderOverloaded."""
+        self.acquire(kind, tenant)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(tenant, time.monotonic() - start)
+
+
+render_admission = AdmissionController(
+    max_in_flight=settings.RENDER_MAX_IN_FLIGHT,
+    max_queue=settings.RENDER_MAX_QUEUE,
+    queue_timeout=settings.RENDER_QUEUE_TIMEOUT_SECONDS,
+    tenant_max_in_flight=settings.RENDER_TENANT_MAX_IN_FLIGHT,
+    tenant_max_queue=settings.RENDER_TENANT_MAX_QUEUE,
+    tenant_caps=settings.RENDER_TENANT_CAPS,
+    tenant_weights=settings.RENDER_TENANT_WEIGHTS,
+)
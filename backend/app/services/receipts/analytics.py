@@ -0,0 +1,249 @@
+"""
+Revenue / receipt-count series for the dashboard, bucketed by hour, day, week
+(ISO, Monday start) or month in the merchant's timezone.
+
+Aggregation happens in SQL:
+  - PostgreSQL: GROUP BY date_trunc(interval, transaction_date AT TIME ZONE tz)
+  - other dialects (SQLite stand-in): GROUP BY 15-minute UTC slot, which the
+    service rolls up into local buckets (every real UTC offset is a multiple
+    of 15 minutes, so this is exact).
+
+Buckets follow local wall-clock time, so a day bucket is 23 or 25 hours long on
+DST change days. A bucket whose end is in the past is closed; closed buckets
+are cached per (user, interval, tz) and only the still-open tail of a range is
+queried again. Creating a receipt invalidates the cached bucket it falls in
+(transaction_date is client-supplied, so it can land in a closed bucket);
+cross-worker staleness is bounded by ANALYTICS_CACHE_TTL_SECONDS.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Integer, String, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS, timed
+from app.services.receipts.archive import receipts_union
+
+INTERVALS = ("hour", "day", "week", "month")
+DEFAULT_SPAN = {
+    "hour": timedelta(hours=48),
+    "day": timedelta(days=30),
+    "week": timedelta(weeks=12),
+    "month": timedelta(days=365),
+}
+MAX_BUCKETS = 1000
+SLOT_MINUTES = 15
+
+
+@dataclass
+class Bucket:
+    start: datetime  # aware, in the requested tz
+    end: datetime
+    revenue: Decimal = Decimal("0.00")
+    count: int = 0
+
+
+# ---- bucket boundaries (local wall-clock) ----
+
+def _floor(wall: datetime, interval: str) -> datetime:
+    wall = wall.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    if interval == "hour":
+        return wall
+    wall = wall.replace(hour=0)
+    if interval == "week":
+        return wall - timedelta(days=wall.weekday())
+    if interval == "month":
+        return wall.replace(day=1)
+    return wall
+
+
+def _step(wall: datetime, interval: str) -> datetime:
+    if interval == "hour":
+        return wall + timedelta(hours=1)
+    if interval == "day":
+        return wall + timedelta(days=1)
+    if interval == "week":
+        return wall + timedelta(weeks=1)
+    return wall.replace(year=wall.year + wall.month // 12, month=wall.month % 12 + 1)
+
+
+def _buckets(start: datetime, end: datetime, interval: str, tz: ZoneInfo) -> List[Bucket]:
+    wall = _floor(start.astimezone(tz), interval)
+    buckets: List[Bucket] = []
+    while wall.replace(tzinfo=tz) < end:
+        nxt = _step(wall, interval)
+        buckets.append(Bucket(wall.replace(tzinfo=tz), nxt.replace(tzinfo=tz)))
+        if len(buckets) > MAX_BUCKETS:
+            raise ValueError(f"Range spans more than {MAX_BUCKETS} {interval} buckets")
+        wall = nxt
+    return buckets
+
+
+# ---- closed-bucket cache ----
+
+class BucketCache:
+    """Closed buckets per user, bounded overall (LRU by user) and expiring after `ttl`."""
+
+    def __init__(self, max_users: int, ttl: float) -> None:
+        self.max_users = max_users
+        self.ttl = ttl
+        # user -> {(interval, tz, start): (start, end, revenue, count, expires)}
+        self._users: "OrderedDict[str, Dict[tuple, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user: str, key: tuple) -> Optional[Tuple[Decimal, int]]:
+        with self._lock:
+            entries = self._users.get(user)
+            hit = entries.get(key) if entries else None
+            if hit is None:
+                return None
+            if hit[4] <= time.monotonic():
+                del entries[key]
+                return None
+            self._users.move_to_end(user)
+            return hit[2], hit[3]
+
+    def put(self, user: str, key: tuple, bucket: Bucket) -> None:
+        with self._lock:
+            entries = self._users.setdefault(user, {})
+            entries[key] = (bucket.start, bucket.end, bucket.revenue, bucket.count, time.monotonic() + self.ttl)
+            self._users.move_to_end(user)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user: str, when: datetime) -> None:
+        """Drop the user's cached buckets (any interval/tz) containing `when`."""
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        with self._lock:
+            entries = self._users.get(user)
+            if not entries:
+                return
+            for key in [k for k, v in entries.items() if v[0] <= when < v[1]]:
+                del entries[key]
+
+
+bucket_cache = BucketCache(
+    max_users=settings.ANALYTICS_CACHE_MAX_USERS,
+    ttl=settings.ANALYTICS_CACHE_TTL_SECONDS,
+)
+
+
+def invalidate_receipt(user_id, transaction_date: Optional[datetime]) -> None:
+    if transaction_date is not None:
+        bucket_cache.invalidate(str(user_id), transaction_date)
+
+
+# ---- aggregation ----
+
+def _aggregate_postgres(db: Session, user_id: str, start: datetime, end: datetime, interval: str, tz: str):
+    receipts = receipts_union(user_id, start, end)  # hot + archived
+    local_start = func.date_trunc(interval, func.timezone(tz, receipts.c.transaction_date)).label("bucket")
+    rows = db.execute(
+        select(local_start, func.sum(receipts.c.total), func.count())
+        .group_by(local_start)
+    ).tuples()
+    # date_trunc(... AT TIME ZONE tz) yields naive local wall-clock starts
+    return ((wall, total, count) for wall, total, count in rows)
+
+
+def _aggregate_slots(db: Session, user_id: str, start: datetime, end: datetime, interval: str, tz: str):
+    receipts = receipts_union(user_id, start, end)  # hot + archived
+    slot = (
+        func.strftime("%Y-%m-%d %H:", receipts.c.transaction_date, type_=String)
+        + func.printf(
+            "%02d",
+            cast(func.strftime("%M", receipts.c.transaction_date), Integer) / SLOT_MINUTES * SLOT_MINUTES,
+            type_=String,
+        )
+    ).label("slot")
+    rows = db.execute(
+        select(slot, func.sum(receipts.c.total), func.count())
+        .group_by(slot)
+    ).tuples()
+    zone = ZoneInfo(tz)
+    for text, total, count in rows:
+        utc = datetime.strptime(text, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc)
+        yield _floor(utc.astimezone(zone), interval), total, count
+
+
+def revenue_series(
+    db: Session,
+    user_id,
+    interval: str,
+    tz: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> dict:
+    if interval not in INTERVALS:
+        raise ValueError(f"interval must be one of {', '.join(INTERVALS)}")
+    zone = ZoneInfo(tz)  # raises ZoneInfoNotFoundError (a KeyError) for unknown names
+
+    now = datetime.now(timezone.utc)
+    end = _aware(end) if end else now
+    if start:
+        start = _aware(start)
+    else:
+        # Default ranges start on a bucket boundary so every closed bucket is cacheable.
+        start = _floor((end - DEFAULT_SPAN[interval]).astimezone(zone), interval).replace(tzinfo=zone)
+    if start >= end:
+        raise ValueError("start must be before end")
+
+    buckets = _buckets(start, end, interval, zone)
+    user = str(user_id)
+    by_wall = {b.start.replace(tzinfo=None): b for b in buckets}
+
+    def cacheable(b: Bucket) -> bool:
+        # Closed, and not cut by the requested range (a partial bucket isn't the bucket's value).
+        return b.end <= now and b.start >= start and b.end <= end
+
+    # Closed buckets come from the cache; query from the first one we don't have.
+    query_from: Optional[datetime] = None
+    for b in buckets:
+        cached = bucket_cache.get(user, (interval, tz, b.start)) if cacheable(b) else None
+        if cached is None:
+            CACHE_REQUESTS.inc(cache="analytics_bucket", result="miss")
+            query_from = b.start
+            break
+        CACHE_REQUESTS.inc(cache="analytics_bucket", result="hit")
+        b.revenue, b.count = cached
+
+    if query_from is not None:
+        lo = max(start, query_from)
+        aggregate = _aggregate_postgres if db.get_bind().dialect.name == "postgresql" else _aggregate_slots
+        with timed("db_query"):
+            rows = list(aggregate(db, user, lo, end, interval, tz))
+        for wall, total, count in rows:
+            b = by_wall.get(wall.replace(tzinfo=None))
+            if b is not None:
+                b.revenue += Decimal(str(total or 0))
+                b.count += count
+        for b in buckets:
+            if b.start >= query_from and cacheable(b):
+                bucket_cache.put(user, (interval, tz, b.start), b)
+
+    return {
+        "interval": interval,
+        "tz": tz,
+        "start": start,
+        "end": end,
+        "total_revenue": sum((b.revenue for b in buckets), Decimal("0.00")),
+        "total_count": sum(b.count for b in buckets),
+        "buckets": [
+            {"start": b.start, "end": b.end, "revenue": b.revenue, "count": b.count, "closed": b.end <= now}
+            for b in buckets
+        ],
+    }
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
@@ -0,0 +1,303 @@
+"""
+Cold-receipt archive.
+
+Almost every scan is for a receipt from the last few days, yet `receipts` and
+the PDF cache grow forever. archive_receipts() moves receipts whose
+transaction_date is older than ARCHIVE_AFTER_DAYS into `receipt_archive`:
+
+  - indexed by receipt_id (primary key) and (user_id, transaction_date);
+  - only the columns reads filter or sum on are kept as columns (plus the
+    snapshot's logo URL, which the logo sweeper checks); the rest (render
+    snapshot, idempotency key, original id) is zlib-compressed JSON;
+  - per-merchant count/sum go to `receipt_archive_totals`, so dashboard
+    totals stay one hot-table aggregate plus a one-row lookup;
+  - insert + totals + delete happen in one transaction per batch, and the
+    receipts' cached PDF/HTML files are evicted after it commits.
+
+Reads are transparent: PDF/HTML/ESC/POS lookups fall back to the archive by
+primary key (archived_receipt), and listings, analytics, exports and
+statements read receipts_union(), a UNION ALL of both tables with the user
+and date filters pushed into each side.
+
+Everything here, reads included, is gated on ARCHIVE_ENABLED: with it off
+(the default) the archive tables are never queried, so deployments that
+haven't created them keep working. Once receipts have been archived, leave
+it on, or they drop out of every read path.
+
+Run periodically from the app lifespan (ARCHIVE_ENABLED), or by hand:
+    python -m app.services.receipts.archive [--older-than-days 90] [--dry-run]
+
+There is no migration tooling; before enabling, create the tables as
+models/receipt_archive.py defines them (PostgreSQL):
+
+    CREATE TABLE receipt_archive (
+        receipt_id UUID PRIMARY KEY, user_id VARCHAR NOT NULL,
+        transaction_date TIMESTAMPTZ, total NUMERIC(10,2), logo VARCHAR,
+        payload BYTEA NOT NULL, archived_at TIMESTAMPTZ DEFAULT now());
+    CREATE INDEX ix_receipt_archive_user_date
+        ON receipt_archive (user_id, transaction_date);
+    CREATE TABLE receipt_archive_totals (
+        user_id VARCHAR PRIMARY KEY, count INTEGER NOT NULL DEFAULT 0,
+        total NUMERIC(14,2) NOT NULL DEFAULT 0);
+
+(A receipt_archive created before the `logo` column needs
+`ALTER TABLE receipt_archive ADD COLUMN logo VARCHAR;`.)
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, null, select, union_all
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import RECEIPTS_ARCHIVED
+from app.models.receipt import Receipt
+from app.models.receipt_archive import ReceiptArchive, ReceiptArchiveTotal
+
+logger = logging.getLogger(__name__)
+
+# Archived receipts are at least this old, so "today"/"last 24h" reads can stay on the hot table.
+MIN_AGE_DAYS = 1
+
+
+# ---- payload ----
+
+def _pack(receipt: Receipt) -> bytes:
+    extra = {
+        "id": receipt.id,
+        "idempotency_key": receipt.idempotency_key,
+        "render_snapshot": receipt.render_snapshot,
+    }
+    return zlib.compress(json.dumps(extra, separators=(",", ":"), default=str).encode(), 6)
+
+
+def _unpack(payload: bytes) -> dict:
+    return json.loads(zlib.decompress(payload))
+
+
+# ---- reads ----
+
+def archived_receipt(db: Session, receipt_id) -> Optional[Receipt]:
+    """An archived receipt as a detached Receipt (never added to the session), or None."""
+    if not settings.ARCHIVE_ENABLED:
+        return None
+    row = db.get(ReceiptArchive, uuid.UUID(str(receipt_id)))
+    if row is None:
+        return None
+    extra = _unpack(row.payload)
+    return Receipt(
+        id=extra.get("id"),
+        receipt_id=row.receipt_id,
+        user_id=row.user_id,
+        transaction_date=row.transaction_date,
+        total=row.total,
+        idempotency_key=extra.get("idempotency_key"),
+        render_snapshot=extra.get("render_snapshot"),
+    )
+
+
+def receipts_union(user_id, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    Hot + archived receipts of one merchant as a subquery with columns
+    receipt_id, user_id, transaction_date, total; [start, end) applied to both sides.
+    Just the hot table while ARCHIVE_ENABLED is off.
+    """
+    parts = []
+    for model in (Receipt, ReceiptArchive) if settings.ARCHIVE_ENABLED else (Receipt,):
+        query = select(model.receipt_id, model.user_id, model.transaction_date, model.total).where(
+            model.user_id == str(user_id)
+        )
+        if start is not None:
+            query = query.where(model.transaction_date >= start)
+        if end is not None:
+            query = query.where(model.transaction_date < end)
+        parts.append(query)
+    if len(parts) == 1:
+        return parts[0].subquery("all_receipts")
+    return union_all(*parts).subquery("all_receipts")
+
+
+def archived_total(user_id):
+    """Scalar subquery: the merchant's archived receipt total (NULL when none or ARCHIVE_ENABLED is off)."""
+    if not settings.ARCHIVE_ENABLED:
+        return null()
+    return (
+        select(ReceiptArchiveTotal.total)
+        .where(ReceiptArchiveTotal.user_id == str(user_id))
+        .scalar_subquery()
+    )
+
+
+# ---- archiving ----
+
+@dataclass
+class ArchiveReport:
+    dry_run: bool
+    cutoff: datetime
+    receipts: int = 0
+    batches: int = 0
+    cache_files_evicted: int = 0
+
+
+def _evict_cached(receipt_ids: List[str], report: ArchiveReport) -> None:
+    from app.services.receipts import pdf_generator  # imports this module for archived_receipt
+
+    for rid in receipt_ids:
+        # <id>.<profile>.pdf, <id>.html, <id>.html.gz and pre-profile <id>.pdf
+        for path in glob.glob(os.path.join(pdf_generator.TEMP_DIR, f"{rid}.*")):
+            try:
+                os.remove(path)
+                report.cache_files_evicted += 1
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("archive: could not evict %s: %s", path, e)
+
+
+def _archive_batch(db: Session, cutoff: datetime, batch_size: int) -> List[str]:
+    receipts = db.execute(
+        select(Receipt)
+        .where(Receipt.transaction_date < cutoff)
+        .order_by(Receipt.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)  # concurrent archivers take disjoint batches
+    ).scalars().all()
+    if not receipts:
+        return []
+
+    db.execute(insert(ReceiptArchive), [
+        {
+            "receipt_id": r.receipt_id,
+            "user_id": r.user_id,
+            "transaction_date": r.transaction_date,
+            "total": r.total,
+            "logo": (r.render_snapshot or {}).get("logo"),
+            "payload": _pack(r),
+        }
+        for r in receipts
+    ])
+
+    per_user: Dict[str, List[Decimal]] = {}
+    for r in receipts:
+        per_user.setdefault(r.user_id, []).append(Decimal(r.total or 0))
+    totals = {
+        t.user_id: t
+        for t in db.execute(
+            select(ReceiptArchiveTotal)
+            .where(ReceiptArchiveTotal.user_id.in_(list(per_user)))
+            .with_for_update()
+        ).scalars()
+    }
+    for user_id, amounts in per_user.items():
+        t = totals.get(user_id)
+        if t is None:
+            t = ReceiptArchiveTotal(user_id=user_id, count=0, total=Decimal("0"))
+            db.add(t)
+        t.count += len(amounts)
+        t.total += sum(amounts, Decimal("0"))
+
+    db.execute(delete(Receipt).where(Receipt.id.in_([r.id for r in receipts])))
+    db.commit()
+    return [str(r.receipt_id) for r in receipts]
+
+
+def archive_receipts(
+    db: Session,
+    older_than_days: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    dry_run: bool = False,
+) -> ArchiveReport:
+    if not settings.ARCHIVE_ENABLED and not dry_run:
+        # Reads skip the archive while it's off; moved receipts would vanish.
+        raise RuntimeError("ARCHIVE_ENABLED is off; create the archive tables and enable it first")
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.now(timezone.utc) - timedelta(days=max(days, MIN_AGE_DAYS))
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    report = ArchiveReport(dry_run=dry_run, cutoff=cutoff)
+
+    if dry_run:
+        report.receipts = len(db.execute(
+            select(Receipt.id).where(Receipt.transaction_date < cutoff)
+        ).all())
+        return report
+
+    while True:
+        try:
+            moved = _archive_batch(db, cutoff, batch_size)
+        except Exception:
+            db.rollback()
+            raise
+        if not moved:
+            break
+        report.receipts += len(moved)
+        report.batches += 1
+        RECEIPTS_ARCHIVED.inc(len(moved))
+        _evict_cached(moved, report)
+    return report
+
+
+def _archive_once() -> ArchiveReport:
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return archive_receipts(db)
+    finally:
+        db.close()
+
+
+async def archive_loop(interval_seconds: float) -> None:
+    """Background task started from the app lifespan."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            report = await asyncio.to_thread(_archive_once)
+            if report.receipts:
+                logger.info(
+                    "archive: moved %d receipts in %d batches, evicted %d cached files",
+                    report.receipts, report.batches, report.cache_files_evicted,
+                )
+        except Exception:
+            logger.exception("archive: run failed")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move cold receipts into the archive table.")
+    parser.add_argument("--older-than-days", type=float, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be archived")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        report = archive_receipts(db, args.older_than_days, args.batch_size, dry_run=args.dry_run)
+    except RuntimeError as e:
+        print(f"error: {e}")
+        return 1
+    finally:
+        db.close()
+
+    verb = "would archive" if report.dry_run else "archived"
+    print(
+        f"{verb} {report.receipts} receipts older than {report.cutoff.isoformat()}"
+        f" ({report.batches} batches, {report.cache_files_evicted} cached files evicted)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+"""
+Cross-process coordination for the rendered-PDF caches in temporary_files/.
+
+With `uvicorn --workers N` every worker sees the same directory but not each
+other's memory. cache_lock(path) takes an OS file lock per cache entry so only
+one worker renders a given receipt (or preview); the others block on the lock
+and then find the published file. publish() writes to a private temp name and
+renames it into place, so readers never see a half-written PDF.
+
+Locks are flock()/msvcrt locks, which the kernel drops when the holding
+process dies, so a crashed worker can't wedge a cache key. Its leftover lock
+file is simply reused by the next worker (and its partial temp file is
+cleaned up by the sweeper).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_POLL_SECONDS = 0.02
+
+
+class LockTimeout(Exception):
+    pass
+
+
+def _lock_path(path: str) -> str:
+    directory, name = os.path.split(path)
+    digest = hashlib.sha1(name.encode()).hexdigest()[:16]
+    return os.path.join(directory, ".locks", f"{digest}.lock")
+
+
+def _try_lock(fd: int) -> bool:
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _still_linked(fd: int, lock_path: str) -> bool:
+    # The previous holder unlinks the lock file on release; a lock taken on
+    # that orphaned inode excludes nobody, so start over on the new file.
+    try:
+        return os.fstat(fd).st_ino == os.stat(lock_path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def cache_lock(path: str, timeout: float) -> Iterator[None]:
+    """Hold the cross-process lock for cache entry `path`; raises LockTimeout."""
+    lock_path = _lock_path(path)
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    deadline = time.monotonic() + timeout
+    while True:
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        if _try_lock(fd):
+            if fcntl is None or _still_linked(fd, lock_path):
+                break
+            _unlock(fd)
+        os.close(fd)
+        if time.monotonic() >= deadline:
+            raise LockTimeout(f"Timed out waiting for render lock on {os.path.basename(path)}")
+        time.sleep(LOCK_POLL_SECONDS)
+
+    try:
+        yield
+    finally:
+        if fcntl is not None:
+            # Unlink while still holding the lock so the directory doesn't grow
+            # one file per receipt; see _still_linked for the waiter side.
+            try:
+                os.unlink(lock_path)
+            except FileNotFoundError:
+                pass
+        _unlock(fd)
+        os.close(fd)
+
+
+def publish(path: str, data: bytes) -> None:
+    """Atomically write `data` to `path` (temp file in the same dir + rename)."""
+    tmp = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,175 @@
+"""
+Post-deploy cache warming for recent receipts.
+
+A new node starts with an empty temporary_files/, so the first wave of QR scans
+would all render at once. With CACHE_WARM_ON_STARTUP the lifespan starts this
+job in a background thread. It pre-renders the HTML page and the default-profile
+PDF of the newest receipts (transaction_date within CACHE_WARM_WINDOW_HOURS, at
+most CACHE_WARM_MAX_RECEIPTS, newest first).
+
+It stays out of the way of real traffic:
+  - at most CACHE_WARM_RATE_PER_SECOND renders per second;
+  - it waits while any live render is running or queued, and its own renders
+    use the lowest admission priority ("warm"), so scans always go first;
+  - its fills are counted as qr_cache_requests_total{result="warm"}, not as
+    misses, so they don't drag down the hit ratio users see;
+  - a warm render shed by admission control is retried after a back-off.
+
+Readiness does not wait for it (the node serves while warming). Progress is
+reported in /health/ready under "cache_warm" and as qr_cache_warm_receipts.
+
+Can also be run by hand:
+    python -m app.services.receipts.cache_warmer [--window-hours 48] [--max 1000]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.metrics import CACHE_WARM
+from app.db.session import read_session
+from app.models.receipt import Receipt
+from app.services.receipts.admission import RenderOverloaded, render_admission
+from app.services.receipts.pdf_generator import (
+    generate_receipt_html,
+    generate_receipt_pdf,
+    receipt_html_cached,
+    receipt_pdf_cached,
+)
+
+logger = logging.getLogger(__name__)
+
+# Poll interval while live renders are running.
+YIELD_POLL_SECONDS = 0.2
+MAX_ATTEMPTS = 3
+
+
+class CacheWarmer:
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._state: Dict[str, object] = {"status": "idle"}
+
+    # ---- progress ----
+    def _update(self, **changes) -> None:
+        with self._lock:
+            self._state.update(changes)
+            for key in ("pending", "rendered", "cached", "failed"):
+                if key in changes:
+                    CACHE_WARM.set(float(changes[key]), state=key)  # type: ignore[arg-type]
+
+    def state(self) -> Dict[str, object]:
+        with self._lock:
+            return dict(self._state)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # ---- job ----
+    def _candidates(self, window_hours: float, limit: int) -> List[str]:
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=window_hours)
+        with read_session() as db:
+            rows = db.execute(
+                select(Receipt.receipt_id)
+                .where(Receipt.transaction_date >= cutoff)
+                .order_by(Receipt.id.desc())
+                .limit(limit)
+            ).scalars()
+            return [str(rid) for rid in rows]
+
+    def _yield_to_traffic(self) -> None:
+        while not self._stop.is_set() and (render_admission.in_flight or render_admission.queued):
+            self._stop.wait(YIELD_POLL_SECONDS)
+
+    def _warm_one(self, receipt_id: str) -> str:
+        """Render what's missing for one receipt: "rendered", or "cached" if nothing was."""
+        html_cached = receipt_html_cached(receipt_id)
+        pdf_cached = receipt_pdf_cached(receipt_id)
+        if html_cached and pdf_cached:
+            return "cached"
+        with read_session() as db:
+            if not html_cached:
+                generate_receipt_html(db, receipt_id, pdf_url="?format=pdf", kind="warm")
+            if not pdf_cached:
+                generate_receipt_pdf(db, receipt_id, kind="warm")
+        return "rendered"
+
+    def _warm_with_retries(self, receipt_id: str) -> Optional[str]:
+        """Outcome for one receipt ("rendered" / "cached" / "failed"), None when stopped."""
+        for _ in range(MAX_ATTEMPTS):
+            self._yield_to_traffic()
+            if self._stop.is_set():
+                return None
+            try:
+                return self._warm_one(receipt_id)
+            except RenderOverloaded:
+                # Live traffic filled the renderer; back off and retry.
+                self._stop.wait(settings.RENDER_QUEUE_TIMEOUT_SECONDS)
+            except Exception as e:
+                logger.warning("cache warm: receipt %s failed: %s", receipt_id, e)
+                return "failed"
+        return "failed"
+
+    def run(
+        self,
+        window_hours: Optional[float] = None,
+        max_receipts: Optional[int] = None,
+        rate_per_second: Optional[float] = None,
+    ) -> Dict[str, object]:
+        window_hours = settings.CACHE_WARM_WINDOW_HOURS if window_hours is None else window_hours
+        max_receipts = settings.CACHE_WARM_MAX_RECEIPTS if max_receipts is None else max_receipts
+        rate = settings.CACHE_WARM_RATE_PER_SECOND if rate_per_second is None else rate_per_second
+        interval = 1.0 / rate if rate > 0 else 0.0
+
+        start = time.monotonic()
+        self._stop.clear()
+        try:
+            ids = self._candidates(window_hours, max_receipts)
+        except Exception as e:
+            logger.warning("cache warm: listing receipts failed: %s", e)
+            self._update(status="failed", error=str(e))
+            return self.state()
+
+        counts = {"rendered": 0, "cached": 0, "failed": 0}
+        self._update(status="running", total=len(ids), pending=len(ids), error=None, **counts)
+        for i, receipt_id in enumerate(ids):
+            outcome = self._warm_with_retries(receipt_id)
+            if outcome is None:
+                self._update(status="stopped", seconds=round(time.monotonic() - start, 2))
+                return self.state()
+            counts[outcome] += 1
+            self._update(pending=len(ids) - i - 1, **counts)
+            if outcome == "rendered":
+                self._stop.wait(interval)
+
+        self._update(status="done", seconds=round(time.monotonic() - start, 2))
+        logger.info(
+            "cache warm: %d rendered, %d already cached, %d failed",
+            counts["rendered"], counts["cached"], counts["failed"],
+        )
+        return self.state()
+
+
+cache_warmer = CacheWarmer()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Pre-render recent receipts into the local cache.")
+    parser.add_argument("--window-hours", type=float, default=None)
+    parser.add_argument("--max", type=int, default=None, dest="max_receipts")
+    parser.add_argument("--rate", type=float, default=None, help="renders per second (0 = unlimited)")
+    args = parser.parse_args(argv)
+    state = cache_warmer.run(args.window_hours, args.max_receipts, args.rate)
+    print(state)
+    return 0 if state.get("status") == "done" else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
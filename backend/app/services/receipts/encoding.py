@@ -0,0 +1,72 @@
+"""
+Hand-rolled JSON encoders for the hot list/stats responses.
+
+Rows come straight from SQLAlchemy result tuples and are written into the
+output buffer field by field, so no per-row dict (and no jsonable_encoder pass)
+is ever built. The output matches the typed models in app.schemas.receipt.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Optional, Sequence
+from uuid import UUID
+
+from app.core.responses import format_decimal
+
+
+def _dt(value: Optional[datetime]) -> str:
+    return f'"{value.isoformat()}"' if value is not None else "null"
+
+
+def _uuid(value: Optional[UUID]) -> str:
+    return f'"{value}"' if value is not None else "null"
+
+
+def encode_receipt_rows(rows: Iterable[Sequence]) -> bytes:
+    """
+    rows: (total, transaction_date, receipt_id) tuples
+    -> [{"id": ..., "total": ..., "transaction_date": ...}, ...]
+    """
+    parts = [
+        f'{{"id":{_uuid(rid)},"total":{format_decimal(total)},"transaction_date":{_dt(ts)}}}'
+        for total, ts, rid in rows
+    ]
+    return ("[" + ",".join(parts) + "]").encode()
+
+
+def encode_recent_rows(rows: Iterable[Sequence]) -> str:
+    """rows: (total, transaction_date) tuples"""
+    parts = [
+        f'{{"total":{format_decimal(total)},"transaction_date":{_dt(ts)}}}'
+        for total, ts in rows
+    ]
+    return "[" + ",".join(parts) + "]"
+
+
+def encode_user_stats(
+    total: Decimal | int | None,
+    total_today: Decimal | int | None,
+    recent_rows: Iterable[Sequence],
+) -> bytes:
+    return (
+        f'{{"total":{format_decimal(total or 0)},'
+        f'"total_today":{format_decimal(total_today or 0)},'
+        f'"recent_receipts":{encode_recent_rows(recent_rows)}}}'
+    ).encode()
+
+
+def encode_receipt_event(
+    total: Decimal | int | None,
+    total_today: Decimal | int | None,
+    receipt_id: Optional[UUID],
+    receipt_total: Decimal | None,
+    transaction_date: Optional[datetime],
+) -> str:
+    """Live dashboard delta pushed on receipt creation (see services/receipts/live.py)."""
+    return (
+        f'{{"total":{format_decimal(total or 0)},'
+        f'"total_today":{format_decimal(total_today or 0)},'
+        f'"receipt":{{"id":{_uuid(receipt_id)},"total":{format_decimal(receipt_total)},'
+        f'"transaction_date":{_dt(transaction_date)}}}}}'
+    )
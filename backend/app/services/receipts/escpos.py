@@ -0,0 +1,239 @@
+"""
+ESC/POS output for 58/80 mm thermal counter printers.
+
+Builds the printer byte stream directly from a Receipt + the merchant's
+ReceiptTemplate, so the POS box no longer rasterizes a PDF:
+
+  - text in the printer's built-in font (code page PC437),
+  - the template logo as a `GS v 0` raster image,
+  - the receipt URL as a native `GS ( k` QR code (the printer draws it),
+  - feed + partial cut.
+
+Only the logo costs real work (decode, scale, dither). Rasters are cached per
+(template id, template updated_at, paper), so editing the template naturally
+misses the old entry and the old one ages out of the LRU.
+
+Logos are taken from our own /static/logo uploads or data: URLs; remote logo
+URLs are not fetched on the print path and are left out.
+"""
+from __future__ import annotations
+
+import base64
+import io
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Hashable, List, Optional
+
+from app.core.metrics import CACHE_REQUESTS, RENDER_FAILURES, timed
+
+ESC = b"\x1b"
+GS = b"\x1d"
+
+LOGO_DIR = os.path.join("app", "static", "logo")
+LOGO_MAX_HEIGHT = 160  # dots (~20 mm at 203 dpi)
+LOGO_CACHE_SIZE = 256
+
+
+@dataclass(frozen=True)
+class Paper:
+    dots: int  # printable width in dots at 203 dpi
+    columns: int  # characters per line, font A
+    qr_module: int  # QR module size in dots
+
+
+PAPERS: Dict[int, Paper] = {
+    58: Paper(dots=384, columns=32, qr_module=5),
+    80: Paper(dots=576, columns=48, qr_module=6),
+}
+
+
+# ---- logo raster cache ----
+
+class RasterCache:
+    """LRU of encoded `GS v 0` logo commands keyed by template revision."""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            raster = self._data.get(key)
+            if raster is not None:
+                self._data.move_to_end(key)
+            return raster
+
+    def put(self, key: Hashable, raster: bytes) -> None:
+        with self._lock:
+            self._data[key] = raster
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+
+raster_cache = RasterCache(LOGO_CACHE_SIZE)
+
+
+def _logo_bytes(logo: str) -> Optional[bytes]:
+    """Image bytes for a template logo we can read without network access."""
+    if logo.startswith("data:"):
+        header, _, data = logo.partition(",")
+        return base64.b64decode(data) if header.endswith(";base64") else None
+    if "/static/logo/" in logo:
+        path = os.path.join(LOGO_DIR, os.path.basename(logo.split("?", 1)[0]))
+        if os.path.isfile(path):
+            with open(path, "rb") as f:
+                return f.read()
+    return None
+
+
+def raster_image(data: bytes, max_width: int, max_height: int = LOGO_MAX_HEIGHT) -> bytes:
+    """`GS v 0` command for an image, scaled to fit and dithered to 1 bit."""
+    from PIL import Image  # deferred like the QR encoder's
+
+    img = Image.open(io.BytesIO(data))
+    if img.mode in ("RGBA", "LA", "P"):
+        # Transparent areas print as paper, not black.
+        img = img.convert("RGBA")
+        background = Image.new("RGBA", img.size, (255, 255, 255, 255))
+        img = Image.alpha_composite(background, img)
+    img = img.convert("L")
+    img.thumbnail((max_width, max_height))
+    # Pad to whole bytes per row; "1" mode dithers (Floyd-Steinberg).
+    width_bytes = (img.width + 7) // 8
+    canvas = Image.new("L", (width_bytes * 8, img.height), 255)
+    canvas.paste(img, (0, 0))
+    bits = canvas.convert("1").tobytes()
+    # PIL packs white as 1; the printer burns 1 bits.
+    bits = bytes(b ^ 0xFF for b in bits)
+    header = GS + b"v0\x00" + width_bytes.to_bytes(2, "little") + img.height.to_bytes(2, "little")
+    return header + bits
+
+
+def logo_raster(template: Any, paper: Paper) -> bytes:
+    """Cached raster for the template's logo; b"" when there is none we can print."""
+    if not template.logo:
+        return b""
+    key = (template.id, template.updated_at, paper.dots)
+    raster = raster_cache.get(key)
+    if raster is not None:
+        CACHE_REQUESTS.inc(cache="escpos_logo", result="hit")
+        return raster
+    CACHE_REQUESTS.inc(cache="escpos_logo", result="miss")
+    raster = b""
+    try:
+        data = _logo_bytes(template.logo)
+        if data is not None:
+            with timed("logo_raster"):
+                raster = raster_image(data, paper.dots)
+    except Exception:
+        # A broken logo shouldn't stop the receipt from printing.
+        RENDER_FAILURES.inc(kind="escpos_logo")
+    raster_cache.put(key, raster)
+    return raster
+
+
+# ---- commands ----
+
+def _text(value: str) -> bytes:
+    return value.encode("cp437", errors="replace")
+
+
+def _align(mode: int) -> bytes:
+    return ESC + b"a" + bytes([mode])  # 0 left, 1 center, 2 right
+
+
+def _bold(on: bool) -> bytes:
+    return ESC + b"E" + bytes([1 if on else 0])
+
+
+def _size(double: bool) -> bytes:
+    return GS + b"!" + (b"\x11" if double else b"\x00")
+
+
+def _qr(data: str, module: int) -> bytes:
+    payload = data.encode("ascii")
+    store_len = len(payload) + 3
+
+    def fn(body: bytes) -> bytes:
+        return GS + b"(k" + len(body).to_bytes(2, "little") + body
+
+    return (
+        fn(b"1A2\x00")  # model 2
+        + fn(b"1C" + bytes([module]))  # module size
+        + fn(b"1E1")  # error correction M
+        + GS + b"(k" + store_len.to_bytes(2, "little") + b"1P0" + payload  # store
+        + fn(b"1Q0")  # print
+    )
+
+
+def _columns(left: str, right: str, width: int) -> str:
+    left = left[: max(width - len(right) - 1, 0)]
+    return left + " " * (width - len(left) - len(right)) + right
+
+
+def _wrap(value: str, width: int) -> List[str]:
+    return [value[i : i + width] for i in range(0, len(value), width)] or [""]
+
+
+def encode_receipt(
+    receipt: Dict[str, Any],
+    template: Optional[Any],
+    receipt_url: str,
+    paper_mm: int = 80,
+) -> bytes:
+    """ESC/POS byte stream for one receipt (see module docstring)."""
+    paper = PAPERS[paper_mm]
+    width = paper.columns
+    out = bytearray()
+    out += ESC + b"@"  # initialize
+    out += ESC + b"t\x00"  # code page PC437
+
+    out += _align(1)
+    if template is not None:
+        raster = logo_raster(template, paper)
+        if raster:
+            out += raster + b"\n"
+    name = (template.business_name if template is not None else None) or receipt.get("company_name") or ""
+    if name:
+        out += _bold(True) + _size(True)
+        for line in _wrap(name, width // 2):
+            out += _text(line) + b"\n"
+        out += _size(False) + _bold(False)
+    if template is not None:
+        for value in (
+            f"GST/HST: {template.gst_hst_number}" if template.gst_hst_number else None,
+            template.contact_phone,
+            template.contact_email,
+            template.website_url,
+        ):
+            if value:
+                for line in _wrap(value, width):
+                    out += _text(line) + b"\n"
+
+    out += _align(0) + _text("-" * width) + b"\n"
+    when: Optional[datetime] = receipt.get("transaction_date")
+    if when is not None:
+        out += _text(_columns("Date", when.strftime("%Y-%m-%d %H:%M"), width)) + b"\n"
+    for line in _wrap(f"Receipt {receipt['receipt_id']}", width):
+        out += _text(line) + b"\n"
+    out += _text("-" * width) + b"\n"
+
+    total = Decimal(str(receipt.get("total") or 0)).quantize(Decimal("0.01"))
+    out += _bold(True) + _size(True)
+    out += _text(_columns("TOTAL", f"${total}", width // 2)) + b"\n"
+    out += _size(False) + _bold(False)
+
+    out += b"\n" + _align(1)
+    out += _qr(receipt_url, paper.qr_module)
+    out += _text("Scan to view or verify this receipt") + b"\n\n"
+    out += _text("Thank you for your business!") + b"\n"
+
+    out += ESC + b"d\x04"  # feed 4 lines
+    out += GS + b"V\x42\x00"  # partial cut
+    return bytes(out)
@@ -0,0 +1,162 @@
+"""
+Raw receipt export (GET /receipts/export) as CSV or Parquet.
+
+Rows are read with yield_per (a server-side cursor on PostgreSQL; SQLite's
+cursor is lazy anyway) EXPORT_CHUNK_SIZE at a time, and each chunk is encoded
+and handed to the response before the next one is fetched. Memory stays flat
+no matter how many receipts a merchant has, unlike /receipts/all, which
+builds the whole list first.
+
+Columns: receipt_id, transaction_date (ISO 8601, UTC), total.
+CSV is plain UTF-8 with a header row. Parquet writes one row group per chunk
+(total as decimal128(10, 2), transaction_date as timestamp[us, UTC]) and needs
+the optional `pyarrow` package.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.db.session import read_session
+from app.services.receipts.archive import receipts_union
+
+COLUMNS = ("receipt_id", "transaction_date", "total")
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+class ExportUnavailable(Exception):
+    """The requested format needs an optional dependency that isn't installed."""
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _utc(when: Optional[datetime]) -> Optional[datetime]:
+    if when is None:
+        return None
+    return when.astimezone(timezone.utc) if when.tzinfo else when.replace(tzinfo=timezone.utc)
+
+
+def _iso(when: Optional[datetime]) -> str:
+    when = _utc(when)
+    return when.isoformat() if when is not None else ""
+
+
+def receipt_chunks(
+    user: Optional[str],
+    user_id: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[Sequence[Tuple]]:
+    """(receipt_id, transaction_date, total) rows in transaction order, chunk by chunk; archived receipts included."""
+    receipts = receipts_union(user_id, start, end)
+    query = select(receipts.c.receipt_id, receipts.c.transaction_date, receipts.c.total)
+    query = query.order_by(receipts.c.transaction_date, receipts.c.receipt_id).execution_options(
+        yield_per=chunk_size or settings.EXPORT_CHUNK_SIZE
+    )
+    # Own session: the response body is produced after the request's dependencies are gone.
+    with read_session(user) as db:
+        result = db.execute(query)
+        while True:
+            with timed("db_query"):
+                chunk = result.fetchmany()
+            if not chunk:
+                return
+            yield chunk
+
+
+def iter_csv(chunks: Iterable[Sequence[Tuple]]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        writer.writerows((rid, _iso(when), total) for rid, when, total in chunk)
+        yield buf.getvalue().encode("utf-8")
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode("utf-8")
+
+
+class _ChunkSink:
+    """Write-only file object for ParquetWriter; the bytes are collected per row group."""
+
+    def __init__(self) -> None:
+        self._parts: List[bytes] = []
+        self._pos = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._pos
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def iter_parquet(chunks: Iterable[Sequence[Tuple]]) -> Iterator[bytes]:
+    if not parquet_available():
+        raise ExportUnavailable("Parquet export needs the optional 'pyarrow' package")
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("receipt_id", pa.string()),
+        ("transaction_date", pa.timestamp("us", tz="UTC")),
+        ("total", pa.decimal128(10, 2)),
+    ])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for chunk in chunks:
+            ids, dates, totals = zip(*chunk)
+            table = pa.Table.from_arrays(
+                [
+                    pa.array([str(rid) for rid in ids], pa.string()),
+                    pa.array([_utc(d) for d in dates], schema.field("transaction_date").type),
+                    pa.array(totals, pa.decimal128(10, 2)),
+                ],
+                schema=schema,
+            )
+            writer.write_table(table)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_export(fmt: str, chunks: Iterable[Sequence[Tuple]]) -> Iterator[bytes]:
+    if fmt == "parquet":
+        return iter_parquet(chunks)
+    return iter_csv(chunks)
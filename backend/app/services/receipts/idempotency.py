@@ -0,0 +1,85 @@
+"""
+Idempotency-Key support for POST /receipts.
+
+POS terminals retry the create call when store Wi-Fi drops the response. With
+an `Idempotency-Key` header, the first successful response is remembered per
+(merchant, key) in a bounded in-process store with a TTL, and a replay is
+answered from it without touching the receipts table or the QR encoder.
+
+The store is per worker and forgets entries on eviction/restart, so the
+receipts table also carries a UNIQUE (user_id, idempotency_key) guard: a retry
+that lands on another worker loses the INSERT race and is answered from the
+existing row instead of creating a duplicate. The row keeps the request's
+fingerprint too, so that path refuses a reused key with 422 just like the store.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, Optional
+
+from app.core.config import settings
+
+MAX_KEY_LENGTH = 255
+
+
+@dataclass
+class StoredResponse:
+    fingerprint: str
+    body: Dict[str, Any]
+    expires: float
+
+
+class TTLStore:
+    """LRU map bounded by `max_entries`; entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_entries: int, ttl: float) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, StoredResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[StoredResponse]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry
+
+    def put(self, key: Hashable, fingerprint: str, body: Dict[str, Any]) -> None:
+        with self._lock:
+            self._data[key] = StoredResponse(fingerprint, body, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            self._evict()
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # Oldest-used first; expired entries at the head go regardless of size.
+        while self._data:
+            key, entry = next(iter(self._data.items()))
+            if len(self._data) <= self.max_entries and entry.expires > now:
+                break
+            del self._data[key]
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def fingerprint(payload: Dict[str, Any]) -> str:
+    """Hash of the fields the client actually sent (defaults like a server-side `now` excluded)."""
+    raw = json.dumps(payload, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+idempotency_store = TTLStore(
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+    ttl=settings.IDEMPOTENCY_TTL_SECONDS,
+)
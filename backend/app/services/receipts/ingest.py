@@ -0,0 +1,165 @@
+"""
+Group-commit ingestion for POST /receipts (enabled with INGEST_GROUP_COMMIT).
+
+Instead of one INSERT + COMMIT + SELECT (refresh) per receipt, request threads
+hand their row to a single committer thread and block on a Future. The
+committer collects rows for at most INGEST_MAX_LATENCY_MS after the first one
+arrives (or until INGEST_MAX_BATCH rows), writes them with one multi-row
+INSERT ... RETURNING in one transaction, commits, and only then resolves each
+request's Future. A response is therefore never sent before its row is durable.
+
+If a batch fails as a whole, its rows are retried one transaction each so a
+single bad row only fails its own request.
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.core.metrics import INGEST_BATCH_SIZE, timed
+from app.models.receipt import Receipt
+
+logger = logging.getLogger(__name__)
+
+RETURNING = (Receipt.receipt_id, Receipt.total, Receipt.transaction_date)
+
+_Item = Tuple[Dict[str, Any], Future]
+
+
+class GroupCommitter:
+    def __init__(self, session_factory, max_batch: int, max_latency: float) -> None:
+        self.session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.max_latency = max_latency
+        self._queue: "queue.Queue[Optional[_Item]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, values: Dict[str, Any]) -> Future:
+        """Queue one receipt row; the Future resolves to its RETURNING row after COMMIT."""
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((values, fut))
+        return fut
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="receipt-group-commit", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Flush everything queued so far, then stop the committer thread."""
+        thread = self._thread
+        if thread is None:
+            return
+        self._queue.put(None)
+        thread.join(timeout)
+        self._thread = None
+
+    # ---- committer thread ----
+    def _collect(self, first: _Item) -> Tuple[List[_Item], bool]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stopping = self._collect(first)
+            try:
+                self._commit(batch)
+            except Exception as e:  # never strand a waiting request
+                logger.exception("group commit crashed")
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            if stopping:
+                return
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> Dict[Any, Any]:
+        db = self.session_factory()
+        try:
+            result = db.execute(insert(Receipt).returning(*RETURNING), rows)
+            # RETURNING order isn't guaranteed for multi-row inserts; match on the
+            # client-generated receipt_id instead.
+            returned = {r.receipt_id: r for r in result}
+            db.commit()
+            return returned
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _commit(self, batch: List[_Item]) -> None:
+        INGEST_BATCH_SIZE.observe(len(batch))
+        live = [(values, fut) for values, fut in batch if fut.set_running_or_notify_cancel()]
+        if not live:
+            return
+        try:
+            with timed("db_group_commit"):
+                returned = self._insert([values for values, _ in live])
+        except Exception as e:
+            if len(live) == 1:
+                live[0][1].set_exception(e)
+                return
+            logger.warning("group commit of %d receipts failed; retrying one by one", len(live), exc_info=True)
+            for item in live:
+                self._commit_one(item)
+            return
+        for values, fut in live:
+            fut.set_result(returned[values["receipt_id"]])
+
+    def _commit_one(self, item: _Item) -> None:
+        values, fut = item
+        try:
+            returned = self._insert([values])
+        except Exception as e:
+            fut.set_exception(e)
+        else:
+            fut.set_result(returned[values["receipt_id"]])
+
+
+_committer: Optional[GroupCommitter] = None
+_committer_lock = threading.Lock()
+
+
+def get_committer() -> GroupCommitter:
+    global _committer
+    if _committer is None:
+        from app.db.session import SessionLocal
+
+        with _committer_lock:
+            if _committer is None:
+                _committer = GroupCommitter(
+                    SessionLocal,
+                    max_batch=settings.INGEST_MAX_BATCH,
+                    max_latency=settings.INGEST_MAX_LATENCY_MS / 1000,
+                )
+    return _committer
+
+
+def shutdown() -> None:
+    if _committer is not None:
+        _committer.stop()
@@ -0,0 +1,123 @@
+"""
+Live dashboard updates: per-user pub/sub behind GET /receipts/stream (SSE).
+
+create_receipt publishes a stats delta (new total, today's total, the new
+receipt) once its row is committed; every open dashboard of that merchant gets
+it pushed instead of polling /receipts/stats.
+
+Cost model:
+  - no subscribers for a user -> publish is a dict lookup, no stats query;
+  - an idle connection is one parked coroutine plus a heartbeat comment every
+    LIVE_HEARTBEAT_SECONDS (keeps proxies from closing it);
+  - each connection has a bounded queue; a dashboard that can't keep up has
+    its backlog replaced by a single `resync` event (refetch /receipts/stats)
+    rather than growing memory.
+
+The broker is pluggable (LIVE_BROKER = "module:Class"). It has four methods:
+  - subscribe(user) -> Subscription: a connection on this worker;
+  - unsubscribe(sub);
+  - has_subscribers(user): whether a connection on ANY worker the broker
+    reaches is subscribed. Publishers skip the stats query when it's False,
+    so a broker that can't answer that cheaply must return True;
+  - publish(user, event): deliver to all of them, wherever they are.
+InProcessBroker only reaches connections on the same worker (so its local
+answers are the global ones); with several workers, plug in a broker backed
+by a shared channel (e.g. Redis pub/sub, has_subscribers from PUBSUB NUMSUB).
+"""
+from __future__ import annotations
+
+import asyncio
+import importlib
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.metrics import LIVE_EVENTS, LIVE_SUBSCRIBERS
+
+# Events are (type, pre-encoded JSON data) pairs.
+Event = Tuple[str, str]
+RESYNC: Event = ("resync", "{}")
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+@dataclass(eq=False)
+class Subscription:
+    user: str
+    loop: asyncio.AbstractEventLoop
+    queue: "asyncio.Queue[Event]" = field(default_factory=lambda: asyncio.Queue(settings.LIVE_QUEUE_SIZE))
+
+    def offer(self, event: Event) -> None:
+        """Runs on the subscriber's event loop."""
+        try:
+            self.queue.put_nowait(event)
+            LIVE_EVENTS.inc(result="queued")
+        except asyncio.QueueFull:
+            # Slow consumer: drop the backlog, tell it to refetch a snapshot.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+            LIVE_EVENTS.inc(result="dropped")
+
+
+class InProcessBroker:
+    def __init__(self) -> None:
+        self._subs: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user: str) -> Subscription:
+        sub = Subscription(user=user, loop=asyncio.get_running_loop())
+        with self._lock:
+            subs = self._subs.setdefault(user, set())
+            if len(subs) >= settings.LIVE_MAX_CONNECTIONS_PER_USER:
+                raise TooManySubscribers(user)
+            subs.add(sub)
+        LIVE_SUBSCRIBERS.inc()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            subs = self._subs.get(sub.user)
+            if subs is None or sub not in subs:
+                return
+            subs.discard(sub)
+            if not subs:
+                del self._subs[sub.user]
+        LIVE_SUBSCRIBERS.dec()
+
+    def has_subscribers(self, user: str) -> bool:
+        """Anyone listening for `user` wherever publish() delivers (here: this worker)."""
+        return user in self._subs
+
+    def publish(self, user: str, event: Event) -> None:
+        """Thread-safe; called from sync request handlers."""
+        with self._lock:
+            subs = list(self._subs.get(user, ()))
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub.offer, event)
+            except RuntimeError:  # loop closed (worker shutting down)
+                self.unsubscribe(sub)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    module, _, name = settings.LIVE_BROKER.partition(":")
+    return getattr(importlib.import_module(module), name)()
+
+
+def format_sse(event: Event) -> str:
+    kind, data = event
+    return f"event: {kind}\ndata: {data}\n\n"
+
+
+async def next_event(sub: Subscription) -> Optional[Event]:
+    """Next event for `sub`, or None when it's time to send a heartbeat."""
+    try:
+        return await asyncio.wait_for(sub.queue.get(), settings.LIVE_HEARTBEAT_SECONDS)
+    except asyncio.TimeoutError:
+        return None
@@ -1,38 +1,74 @@
-from pdfkit import from_string
-from jinja2 import Environment, FileSystemLoader, select_autoescape
 from sqlalchemy.orm import Session
 
+import gzip
 import os
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from app.core.config import settings
+from app.db.session import primary_fallback
+from app.core.metrics import CACHE_REQUESTS, PDF_BYTES, RENDER_FAILURES, RENDERS_IN_FLIGHT, RENDERS_SHED, timed
+from app.services.receipts.admission import RenderOverloaded, render_admission
+from app.services.receipts.archive import archived_receipt
+from app.services.receipts.cache_lock import LockTimeout, cache_lock, publish
+from app.services.receipts.escpos import encode_receipt
+from app.services.receipts.signing import receipt_url
+from app.services.receipts.snapshot import snapshot_context, snapshot_template
 from app.services.utils import get_company_name, get_user_id
 from app.models.receipt import Receipt
 from app.models.receipt_template import ReceiptTemplate
 
 
-
+# Jinja, pdfkit and the temp dir are set up on first use (or by warm()),
+# so importing this module stays cheap for cold starts.
 
 CWD = os.getcwd()
 TEMPLATE_DIR = os.path.join(CWD, "app", "services", "receipts", "jinja_templates")
 TEMP_DIR = os.path.join(CWD, "app", "services", "receipts", "temporary_files")
 
-os.makedirs(TEMP_DIR, exist_ok=True)
-
+# wkhtmltopdf options per output profile. Qt already embeds fonts as subsets
+# and deflates page streams, so what a profile can trade is image resampling
+# (image-dpi), JPEG quality, rasterization dpi and margins.
+PDF_PROFILES: Dict[str, Dict[str, Any]] = {
+    # Phone download / cache: logos resampled to screen resolution, tight margins.
+    "mobile": {
+        "dpi": 96, "image-dpi": 150, "image-quality": 70,
+        "margin-top": "4mm", "margin-bottom": "4mm", "margin-left": "4mm", "margin-right": "4mm",
+    },
+    # Office printers.
+    "print": {
+        "dpi": 300, "image-dpi": 300, "image-quality": 90,
+        "margin-top": "10mm", "margin-bottom": "10mm", "margin-left": "10mm", "margin-right": "10mm",
+    },
+    # Long-term records: keep images close to their source resolution.
+    "archive": {
+        "dpi": 300, "image-dpi": 600, "image-quality": 100,
+        "margin-top": "10mm", "margin-bottom": "10mm", "margin-left": "10mm", "margin-right": "10mm",
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def get_env():
+    from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+    return Environment(
+        loader=FileSystemLoader(TEMPLATE_DIR),
+        autoescape=select_autoescape(["html", "xml"]),
+        enable_async=False,
+    )
 
-ENV = Environment(
-    loader=FileSystemLoader(TEMPLATE_DIR),
-    autoescape=select_autoescape(["html", "xml"]),
-    enable_async=False,
-)
 
-def _pdfkit_config():
+@lru_cache(maxsize=None)
+def get_pdfkit_config():
     """
     Use a custom wkhtmltopdf path when set in .env:
       WKHTMLTOPDF_CMD="C:\\Program Files\\wkhtmltopdf\\bin\\wkhtmltopdf.exe"
     """
-    cmd = getattr(settings, "WKHTMLTOPDF_CMD", None)
+    cmd = settings.WKHTMLTOPDF_CMD
     if not cmd:
         return None
     try:
@@ -41,58 +77,291 @@ def _pdfkit_config():
     except Exception:
         return None
 
-PDFKIT_CONFIG = _pdfkit_config()
+
+def from_string(html: str, options: Dict[str, Any], configuration=None) -> bytes:
+    import pdfkit
+
+    return pdfkit.from_string(html, options=options, configuration=configuration)
+
+
+def from_file(inputs: List[str], output_path: str, options: Dict[str, Any], configuration=None) -> None:
+    """Several HTML files into one PDF written straight to `output_path` (one wkhtmltopdf run)."""
+    import pdfkit
+
+    pdfkit.from_file(inputs, output_path, options=options, configuration=configuration)
+
+
+@lru_cache(maxsize=None)
+def _ensure_dir(path: str) -> str:
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _temp_path(name: str) -> str:
+    return os.path.join(_ensure_dir(TEMP_DIR), name)
+
+
+def warm() -> None:
+    """Load Jinja + compile receipt.html, resolve the wkhtmltopdf config, create TEMP_DIR."""
+    get_env().get_template("receipt.html")
+    get_pdfkit_config()
+    import pdfkit  # noqa: F401
+    _ensure_dir(TEMP_DIR)
+
+
+def resolve_profile(profile: Optional[str]) -> str:
+    profile = profile or settings.PDF_PROFILE
+    if profile not in PDF_PROFILES:
+        raise ValueError(f"Unknown PDF profile {profile!r}; expected one of {', '.join(PDF_PROFILES)}")
+    return profile
+
+
+def pdf_options(profile: str) -> Dict[str, Any]:
+    return {"encoding": "UTF-8", **PDF_PROFILES[profile]}
+
+
+def _render_pdf(html: str, kind: str, user_id: Any, profile: str) -> bytes:
+    """
+    wkhtmltopdf call, timed and counted under `kind` (receipt / preview).
+    Waits for a render slot scheduled fairly across merchants (user_id);
+    raises RenderOverloaded when shed.
+    """
+    with render_admission.slot(kind, tenant=str(user_id)):
+        pdf = _run_wkhtmltopdf(html, kind, pdf_options(profile))
+    PDF_BYTES.observe(len(pdf), kind=kind, profile=profile)
+    return pdf
+
+
+def _run_wkhtmltopdf(html: str, kind: str, options: Dict[str, Any]) -> bytes:
+    RENDERS_IN_FLIGHT.inc(kind=kind)
+    try:
+        with timed("pdf_render"):
+            return from_string(html, options=options, configuration=get_pdfkit_config())
+    except Exception:
+        RENDER_FAILURES.inc(kind=kind)
+        raise
+    finally:
+        RENDERS_IN_FLIGHT.dec(kind=kind)
+
+
+def render_pdf_files(inputs: List[str], output_path: str, kind: str, user_id: Any, profile: Optional[str] = None) -> None:
+    """
+    Multi-page documents (a batch of statement pages): wkhtmltopdf reads the
+    page files from disk and writes the PDF to disk, so neither passes
+    through this process.
+    Takes one admission slot like any other render.
+    """
+    profile = resolve_profile(profile)
+    with render_admission.slot(kind, tenant=str(user_id)):
+        RENDERS_IN_FLIGHT.inc(kind=kind)
+        try:
+            with timed("pdf_render"):
+                from_file(inputs, output_path, options=pdf_options(profile), configuration=get_pdfkit_config())
+        except Exception:
+            RENDER_FAILURES.inc(kind=kind)
+            raise
+        finally:
+            RENDERS_IN_FLIGHT.dec(kind=kind)
+    PDF_BYTES.observe(os.path.getsize(output_path), kind=kind, profile=profile)
+
+
+@contextmanager
+def _render_lock(path: str, kind: str) -> Iterator[None]:
+    """Cross-worker lock for one cache entry; sheds with 503 if held too long."""
+    try:
+        with cache_lock(path, timeout=settings.RENDER_LOCK_TIMEOUT_SECONDS):
+            yield
+    except LockTimeout:
+        RENDERS_SHED.inc(kind=kind, reason="lock_timeout")
+        raise RenderOverloaded(settings.RENDER_LOCK_TIMEOUT_SECONDS, "lock_timeout")
+
+
+def _find_receipt(db: Session, recipt_id: str) -> Optional[Receipt]:
+    """Hot table first, then the cold archive (see archive.py)."""
+    receipt = db.query(Receipt).filter(Receipt.receipt_id == uuid.UUID(str(recipt_id))).first()
+    return receipt if receipt is not None else archived_receipt(db, recipt_id)
+
 
 def model_to_dict(obj) -> Dict[str, Any]:
     return {c.name: getattr(obj, c.name) for c in obj.__table__.columns}  # type: ignore[attr-defined]
 
 
 
-def generate_receipt_pdf(db: Session, recipt_id: str) -> str:
+def _receipt_context(db: Session, recipt_id: str) -> Dict[str, Any]:
     """
-    Render a receipt PDF from DB using Jinja + pdfkit, save it, and return the file path.
-    If the PDF already exists, returns the existing file path.
+    Template context for one receipt; falls back to the primary on a replica miss.
+    Built from the row's render snapshot alone when it has one (see snapshot.py);
+    older rows are rendered from live user data.
     """
-    file_path = os.path.join(TEMP_DIR, f"{recipt_id}.pdf")
-    if os.path.exists(file_path):
-        return file_path
-
-    # Load template
+    primary: Optional[Session] = None
+    try:
+        with timed("db_lookup"):
+            receipt: Optional[Receipt] = _find_receipt(db, recipt_id)
+            if not receipt and (primary := primary_fallback(db)) is not None:
+                # Not on the replica yet (QR scanned right after creation)
+                db = primary
+                receipt = _find_receipt(db, recipt_id)
+            if not receipt:
+                raise RuntimeError(f"Receipt '{recipt_id}' not found")
+
+            if receipt.render_snapshot:
+                return {
+                    **snapshot_context(receipt.render_snapshot),
+                    "user_id": receipt.user_id,
+                    "snapshot": receipt.render_snapshot,
+                }
+            return {
+                **model_to_dict(receipt),
+                "company_name": get_company_name(db, receipt.user_id),
+            }
+    finally:
+        if primary is not None:
+            primary.close()
+
+
+def _load_receipt_template():
     try:
-        template = ENV.get_template("receipt.html")
+        with timed("template_load"):
+            return get_env().get_template("receipt.html")
     except Exception as e:
+        RENDER_FAILURES.inc(kind="template_load")
         raise RuntimeError(f"Template 'receipt.html' load error: {e}")
 
-    # Fetch receipt row
-    receipt: Optional[Receipt] = db.query(Receipt).filter(Receipt.receipt_id == recipt_id).first()
-    if not receipt:
-        raise RuntimeError(f"Receipt '{recipt_id}' not found")
 
-    # Build render context
-    ctx: Dict[str, Any] = {
-        **model_to_dict(receipt),
-        "company_name": get_company_name(db, receipt.user_id),
-    }
+def _receipt_pdf_path(recipt_id: str, profile: str) -> str:
+    return _temp_path(f"{recipt_id}.{profile}.pdf")
 
-    # Render to HTML
-    html = template.render(ctx)
 
-    # Convert HTML -> PDF bytes
-    try:
-        pdf_bytes = from_string(html, options={"encoding": "UTF-8"}, configuration=PDFKIT_CONFIG)
-    except Exception as e:
-        raise RuntimeError(f"PDF render failed: {e}")
+def receipt_pdf_cached(recipt_id: str, profile: Optional[str] = None) -> bool:
+    return os.path.exists(_receipt_pdf_path(recipt_id, resolve_profile(profile)))
 
-    # Write PDF to disk
-    try:
-        with open(file_path, "wb") as f:
-            f.write(pdf_bytes)
-    except Exception as e:
-        raise RuntimeError(f"Saving PDF failed: {e}")
 
+def receipt_html_cached(recipt_id: str) -> bool:
+    return os.path.exists(_temp_path(f"{recipt_id}.html"))
+
+
+def _count_lookup(cache: str, result: str, kind: str) -> None:
+    # Cache warming isn't demand: its lookups and fills are counted apart, so
+    # the hit ratio after a deploy reflects what users actually asked for.
+    CACHE_REQUESTS.inc(cache=cache, result="warm" if kind == "warm" else result)
+
+
+def cached_receipt_html(recipt_id: str, kind: str = "receipt") -> Optional[Tuple[str, str]]:
+    """(html_path, gzip_path) when the receipt page is already rendered; no DB access."""
+    html_path = _temp_path(f"{recipt_id}.html")
+    if not os.path.exists(html_path):
+        return None
+    _count_lookup("receipt_html", "hit", kind)
+    return html_path, f"{html_path}.gz"
+
+
+def generate_receipt_html(db: Session, recipt_id: str, pdf_url: str, kind: str = "receipt") -> Tuple[str, str]:
+    """
+    Render receipt.html for direct display (phone scans), cached on disk as
+    `<id>.html` plus a gzip sibling. Returns (html_path, gzip_path). The page
+    links to `pdf_url`, so wkhtmltopdf only runs when the PDF is asked for.
+    `kind` "warm" (background warming) counts its lookup as result="warm".
+    """
+    cached = cached_receipt_html(recipt_id, kind)
+    if cached is not None:
+        return cached
+
+    html_path = _temp_path(f"{recipt_id}.html")
+    gz_path = f"{html_path}.gz"
+    with _render_lock(html_path, kind="receipt_html"):
+        if os.path.exists(html_path):
+            _count_lookup("receipt_html", "coalesced", kind)
+            return html_path, gz_path
+        _count_lookup("receipt_html", "miss", kind)
+
+        template = _load_receipt_template()
+        ctx = _receipt_context(db, recipt_id)
+        with timed("html_render"):
+            body = template.render({**ctx, "pdf_url": pdf_url}).encode("utf-8")
+
+        with timed("file_write"):
+            # gzip first: a visible .html implies its .gz is complete
+            publish(gz_path, gzip.compress(body, compresslevel=9, mtime=0))
+            publish(html_path, body)
+
+    return html_path, gz_path
+
+
+def cached_receipt_pdf(recipt_id: str, profile: Optional[str] = None, kind: str = "receipt") -> Optional[str]:
+    """Path of the cached PDF for this profile, if rendered; no DB access."""
+    file_path = _receipt_pdf_path(recipt_id, resolve_profile(profile))
+    if not os.path.exists(file_path):
+        return None
+    _count_lookup("receipt_pdf", "hit", kind)
     return file_path
 
 
+def generate_receipt_pdf(db: Session, recipt_id: str, profile: Optional[str] = None, kind: str = "receipt") -> str:
+    """
+    Render a receipt PDF from DB using Jinja + pdfkit, save it, and return the file path.
+    If the PDF already exists, returns the existing file path.
+    Each output profile (default settings.PDF_PROFILE) is cached separately.
+    `kind` is the admission class (background warming passes "warm", which
+    also counts its cache lookup as result="warm").
+    """
+    cached = cached_receipt_pdf(recipt_id, profile, kind)
+    if cached is not None:
+        return cached
+
+    profile = resolve_profile(profile)
+    file_path = _receipt_pdf_path(recipt_id, profile)
+
+    with _render_lock(file_path, kind=kind):
+        if os.path.exists(file_path):
+            # Another worker rendered it while we waited for the lock
+            _count_lookup("receipt_pdf", "coalesced", kind)
+            return file_path
+        _count_lookup("receipt_pdf", "miss", kind)
+
+        # Load template, fetch receipt row and build the render context
+        template = _load_receipt_template()
+        ctx = _receipt_context(db, recipt_id)
+
+        # Render to HTML
+        with timed("html_render"):
+            html = template.render(ctx)
+
+        # Convert HTML -> PDF bytes
+        try:
+            pdf_bytes = _render_pdf(html, kind=kind, user_id=ctx["user_id"], profile=profile)
+        except RenderOverloaded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"PDF render failed: {e}")
+
+        # Publish atomically so other workers never read a partial file
+        try:
+            with timed("file_write"):
+                publish(file_path, pdf_bytes)
+        except Exception as e:
+            raise RuntimeError(f"Saving PDF failed: {e}")
+
+    return file_path
+
+
+def generate_receipt_escpos(db: Session, recipt_id: str, paper_mm: int = 80, owner: Optional[int] = None) -> bytes:
+    """
+    ESC/POS byte stream for a thermal printer (no wkhtmltopdf involved).
+    With `owner`, raises PermissionError when the receipt belongs to someone else.
+    """
+    ctx = _receipt_context(db, recipt_id)
+    if owner is not None and ctx["user_id"] != str(owner):
+        raise PermissionError(recipt_id)
+    if ctx.get("snapshot"):
+        tpl = snapshot_template(ctx["snapshot"])
+    else:
+        with timed("db_lookup"):
+            tpl = db.query(ReceiptTemplate).filter(ReceiptTemplate.user_id == int(ctx["user_id"])).first()
+    url = receipt_url(ctx["receipt_id"], ctx["snapshot"]["v"] if ctx.get("snapshot") else 0)
+    with timed("escpos_encode"):
+        return encode_receipt(ctx, tpl, url, paper_mm)
+
+
 def generate_template_pdf(db: Session, email: str) -> str:
     """
     Render a **preview** PDF using the user's ReceiptTemplate (no DB Receipt row).
@@ -103,50 +372,58 @@ def generate_template_pdf(db: Session, email: str) -> str:
     if not user_id:
         raise RuntimeError("User not found or unauthorized")
 
-    out_path = os.path.join(TEMP_DIR, f"template_preview_{email}.pdf")
-
-    # Load template
-    try:
-        template = ENV.get_template("receipt.html")
-    except Exception as e:
-        raise RuntimeError(f"Template 'receipt.html' load error: {e}")
-
-    # Load the user's template header fields
-    tpl: Optional[ReceiptTemplate] = (
-        db.query(ReceiptTemplate).filter(ReceiptTemplate.user_id == user_id).first()
-    )
-    if not tpl:
-        raise RuntimeError(f"No ReceiptTemplate found for user {user_id}")
-
-    # Minimal preview context (no items in your receipts)
-    ctx: Dict[str, Any] = {
-        "receipt_id": "PREVIEW-ONLY",
-        "transaction_date": datetime.utcnow(),
-        "total": 42.00,  # sample total
-
-        # Header fields from the user's template:
-        "business_name": tpl.business_name,
-        "logo": tpl.logo,
-        "gst_hst_number": tpl.gst_hst_number,
-        "contact_phone": tpl.contact_phone,
-        "contact_email": tpl.contact_email,
-        "website_url": tpl.website_url,
-    }
-
-    # Render HTML
-    html = template.render(ctx)
-
-    # Convert to PDF
-    try:
-        pdf_bytes = from_string(html, options={"encoding": "UTF-8"}, configuration=PDFKIT_CONFIG)
-    except Exception as e:
-        raise RuntimeError(f"Preview PDF render failed: {e}")
-
-    # Save to disk (always overwrite preview)
-    try:
-        with open(out_path, "wb") as f:
-            f.write(pdf_bytes)
-    except Exception as e:
-        raise RuntimeError(f"Saving preview PDF failed: {e}")
+    out_path = _temp_path(f"template_preview_{email}.pdf")
+
+    # One render per preview at a time across workers
+    with _render_lock(out_path, kind="preview"):
+        # Load template
+        try:
+            with timed("template_load"):
+                template = get_env().get_template("receipt.html")
+        except Exception as e:
+            RENDER_FAILURES.inc(kind="template_load")
+            raise RuntimeError(f"Template 'receipt.html' load error: {e}")
+
+        # Load the user's template header fields
+        with timed("db_lookup"):
+            tpl: Optional[ReceiptTemplate] = (
+                db.query(ReceiptTemplate).filter(ReceiptTemplate.user_id == user_id).first()
+            )
+        if not tpl:
+            raise RuntimeError(f"No ReceiptTemplate found for user {user_id}")
+
+        # Minimal preview context (no items in your receipts)
+        ctx: Dict[str, Any] = {
+            "receipt_id": "PREVIEW-ONLY",
+            "transaction_date": datetime.utcnow(),
+            "total": 42.00,  # sample total
+
+            # Header fields from the user's template:
+            "business_name": tpl.business_name,
+            "logo": tpl.logo,
+            "gst_hst_number": tpl.gst_hst_number,
+            "contact_phone": tpl.contact_phone,
+            "contact_email": tpl.contact_email,
+            "website_url": tpl.website_url,
+        }
+
+        # Render HTML
+        with timed("html_render"):
+            html = template.render(ctx)
+
+        # Convert to PDF
+        try:
+            pdf_bytes = _render_pdf(html, kind="preview", user_id=user_id, profile=resolve_profile(None))
+        except RenderOverloaded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Preview PDF render failed: {e}")
+
+        # Save to disk (always overwrite preview, atomically)
+        try:
+            with timed("file_write"):
+                publish(out_path, pdf_bytes)
+        except Exception as e:
+            raise RuntimeError(f"Saving preview PDF failed: {e}")
 
     return out_path
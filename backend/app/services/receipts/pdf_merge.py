@@ -0,0 +1,135 @@
+"""
+Page-level PDF concatenation that streams to disk.
+
+Statements are rendered as several small PDFs (one wkhtmltopdf run per batch
+of page files, so the renderer's memory is bounded by the batch, not the
+month). concat_pdfs() joins them into one document without building it in
+memory: each part is opened on its own, the objects its pages reach (content
+streams, fonts, images) are renumbered and written out immediately, and only
+the per-object byte offsets and the page ids (packed arrays, a dozen bytes
+or so per page) are kept until the page tree, catalog and xref table are
+written at the end.
+
+Inherited page attributes (Resources, MediaBox, CropBox, Rotate) are copied
+onto each page, since the parts' own page trees aren't carried over; nor are
+their outlines. Needs the `pypdf` package (parsing only).
+"""
+from __future__ import annotations
+
+import gc
+from array import array
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+INHERITABLE = ("/Resources", "/MediaBox", "/CropBox", "/Rotate")
+CATALOG_ID, PAGES_ID = 1, 2
+
+
+class _Writer:
+    def __init__(self, out: BinaryIO) -> None:
+        self.out = out
+        self.offsets = array("q", [0, 0, 0])  # by object id; 0 unused, 1 catalog, 2 page tree
+        self.kids = array("q")
+
+    def alloc(self) -> int:
+        self.offsets.append(0)
+        return len(self.offsets) - 1
+
+    def write_object(self, obj_id: int, obj: Any) -> None:
+        self.offsets[obj_id] = self.out.tell()
+        self.out.write(f"{obj_id} 0 obj\n".encode())
+        obj.write_to_stream(self.out)
+        self.out.write(b"\nendobj\n")
+
+
+def _copy_part(reader: Any, writer: _Writer) -> int:
+    """Write every page of one part (and everything its pages reference); returns the page count."""
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, StreamObject
+
+    pages = list(reader.pages)
+    page_keys = {(p.indirect_reference.idnum, p.indirect_reference.generation) for p in pages}
+    ids: Dict[Tuple[int, int], int] = {}
+    pending: List[Tuple[int, Any]] = []
+
+    def new_id(key: Tuple[int, int], indirect: Optional[IndirectObject] = None) -> int:
+        if key not in ids:
+            ids[key] = writer.alloc()
+            if key not in page_keys:  # pages are written by the loop below, not as plain objects
+                pending.append((ids[key], indirect))
+        return ids[key]
+
+    def remap(obj: Any) -> Any:
+        if isinstance(obj, IndirectObject):
+            return IndirectObject(new_id((obj.idnum, obj.generation), obj), 0, None)
+        if isinstance(obj, StreamObject):
+            copy = StreamObject()
+            copy._data = obj._data  # stored (still encoded) bytes; /Filter etc. copied below
+            for k, v in obj.items():
+                if k != "/Length":
+                    copy[NameObject(k)] = remap(v)
+            return copy
+        if isinstance(obj, DictionaryObject):
+            copy = DictionaryObject()
+            for k, v in obj.items():
+                if k == "/Parent" and v.get_object().get("/Type") == "/Pages":
+                    # Never drag in the part's own page tree.
+                    copy[NameObject(k)] = IndirectObject(PAGES_ID, 0, None)
+                else:
+                    copy[NameObject(k)] = remap(v)
+            return copy
+        if isinstance(obj, ArrayObject):
+            return ArrayObject(remap(v) for v in obj)
+        return obj
+
+    for page in pages:
+        flat = DictionaryObject(page)
+        node = page.get("/Parent")
+        while node is not None:
+            node = node.get_object()
+            for key in INHERITABLE:
+                if key not in flat and key in node:
+                    flat[NameObject(key)] = node[key]
+            node = node.get("/Parent")
+        flat.pop("/Parent", None)
+
+        ref = page.indirect_reference
+        page_id = new_id((ref.idnum, ref.generation))
+        out = remap(flat)
+        out[NameObject("/Parent")] = IndirectObject(PAGES_ID, 0, None)
+        writer.write_object(page_id, out)
+        writer.kids.append(page_id)
+
+        while pending:
+            obj_id, indirect = pending.pop()
+            writer.write_object(obj_id, remap(indirect.get_object()))
+    return len(pages)
+
+
+def concat_pdfs(parts: List[str], output_path: str) -> int:
+    """Concatenate the pages of `parts`, in order, into `output_path`. Returns the page count."""
+    from pypdf import PdfReader
+
+    with open(output_path, "wb") as out:
+        out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        writer = _Writer(out)
+        for part in parts:
+            _copy_part(PdfReader(part), writer)
+            # A reader and its parsed objects form reference cycles; free them per part
+            # rather than whenever the cyclic GC next gets to them.
+            gc.collect()
+
+        writer.offsets[PAGES_ID] = out.tell()
+        out.write(f"{PAGES_ID} 0 obj\n<< /Type /Pages /Count {len(writer.kids)} /Kids [".encode())
+        for lo in range(0, len(writer.kids), 1024):
+            out.write("".join(f"{k} 0 R " for k in writer.kids[lo : lo + 1024]).encode())
+        out.write(b"] >>\nendobj\n")
+        writer.offsets[CATALOG_ID] = out.tell()
+        out.write(f"{CATALOG_ID} 0 obj\n<< /Type /Catalog /Pages {PAGES_ID} 0 R >>\nendobj\n".encode())
+
+        xref = out.tell()
+        out.write(f"xref\n0 {len(writer.offsets)}\n0000000000 65535 f \n".encode())
+        for offset in writer.offsets[1:]:
+            out.write(f"{offset:010d} 00000 n \n".encode())
+        out.write(
+            f"trailer\n<< /Size {len(writer.offsets)} /Root {CATALOG_ID} 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+        )
+    return len(writer.kids)
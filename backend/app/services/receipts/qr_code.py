@@ -1,16 +1,25 @@
-import qrcode
 import io
 import base64
 
+from app.core.metrics import timed
+
 # def generate_qr(data):
 #     img = qrcode.make(data)
 #     img.save('new_qr.png')
 #     return 'new_qr.png'
 
+def warm() -> None:
+    """Import qrcode + PIL and run one encode so the first receipt doesn't pay for it."""
+    generate_qr("warmup")
+
+
 def generate_qr(data: str) -> str:
-    img = qrcode.make(data)
-    buffered = io.BytesIO()
-    img.save(buffered)
-    img_base64 = base64.b64encode(buffered.getbuffer()).decode("utf-8")
+    import qrcode  # pulls in PIL; deferred to keep cold start cheap
+
+    with timed("qr_encode"):
+        img = qrcode.make(data)
+        buffered = io.BytesIO()
+        img.save(buffered)
+        img_base64 = base64.b64encode(buffered.getbuffer()).decode("utf-8")
     return img_base64
 
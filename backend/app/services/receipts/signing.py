@@ -0,0 +1,84 @@
+"""
+Signed receipt tokens for the QR code URL (GET /receipts/r/{token}).
+
+    <kid>.<base64url(receipt uuid bytes | snapshot version | HMAC-SHA256[:16])>
+
+The token proves we issued the URL, so the handler can reject bogus ids and
+serve cached PDFs/HTML without touching the database; an edge cache can key on
+the path alone. The snapshot version (0 = row without a render snapshot) is
+part of the signed payload so a future snapshot format gets new URLs.
+
+Rotation: RECEIPT_SIGNING_KEYS maps key id -> secret and RECEIPT_SIGNING_KEY_ID
+names the one new tokens are signed with. Add a key, switch the active id,
+and drop the old key once its QR codes no longer need to resolve. With no keys
+configured a key derived from SECRET_KEY is used (key id "s0").
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import hmac
+import uuid
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+MAC_BYTES = 16
+DEFAULT_KEY_ID = "s0"
+
+
+@dataclass(frozen=True)
+class ReceiptToken:
+    receipt_id: uuid.UUID
+    snapshot_version: int
+    key_id: str
+
+
+@lru_cache(maxsize=None)
+def _keys() -> Tuple[str, Dict[str, bytes]]:
+    """(active key id, key id -> secret)."""
+    keys = {kid: secret.encode() for kid, secret in settings.RECEIPT_SIGNING_KEYS.items()}
+    if not keys:
+        derived = hmac.new(settings.SECRET_KEY.encode(), b"receipt-url-signing", hashlib.sha256).digest()
+        return DEFAULT_KEY_ID, {DEFAULT_KEY_ID: derived}
+    active = settings.RECEIPT_SIGNING_KEY_ID or next(iter(keys))
+    if active not in keys:
+        raise RuntimeError(f"RECEIPT_SIGNING_KEY_ID {active!r} is not in RECEIPT_SIGNING_KEYS")
+    return active, keys
+
+
+def _mac(key: bytes, kid: str, payload: bytes) -> bytes:
+    return hmac.new(key, kid.encode() + b"." + payload, hashlib.sha256).digest()[:MAC_BYTES]
+
+
+def sign_receipt(receipt_id, snapshot_version: int) -> str:
+    kid, keys = _keys()
+    payload = uuid.UUID(str(receipt_id)).bytes + bytes([snapshot_version])
+    raw = payload + _mac(keys[kid], kid, payload)
+    return f"{kid}.{base64.urlsafe_b64encode(raw).rstrip(b'=').decode()}"
+
+
+def verify_receipt_token(token: str) -> Optional[ReceiptToken]:
+    """The token's contents, or None for anything we didn't sign with a current key."""
+    kid, dot, body = token.partition(".")
+    key = _keys()[1].get(kid) if dot else None
+    if key is None or len(body) > 64:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(body + "=" * (-len(body) % 4))
+    except (binascii.Error, ValueError):
+        return None
+    if len(raw) != 17 + MAC_BYTES:
+        return None
+    payload, mac = raw[:17], raw[17:]
+    if not hmac.compare_digest(mac, _mac(key, kid, payload)):
+        return None
+    return ReceiptToken(uuid.UUID(bytes=payload[:16]), payload[16], kid)
+
+
+def receipt_url(receipt_id, snapshot_version: int) -> str:
+    """Public URL printed in the receipt's QR code."""
+    return f"{settings.BASE_URL}/api/v1/receipts/r/{sign_receipt(receipt_id, snapshot_version)}"
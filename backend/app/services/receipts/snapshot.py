@@ -0,0 +1,88 @@
+"""
+Render snapshots: everything a receipt's PDF/HTML/ESC/POS output needs, frozen
+at creation and stored on the row (receipts.render_snapshot).
+
+Re-rendering a cached-out receipt is then one indexed read of the receipt row
+(no users / receipt_templates lookups), and a later template edit doesn't
+change what the customer was given. The logo is stored by reference (URL plus
+the template id/updated_at it came from), not inline; the logo sweeper keeps
+any uploaded file a snapshot still points at (sweeper._in_snapshots).
+
+The snapshot is versioned (`v`): readers must keep understanding every version
+ever written. Rows created before snapshots existed have none and are rendered
+from live data as before.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.receipt_template import ReceiptTemplate
+from app.models.user import User
+
+SNAPSHOT_VERSION = 1
+
+# Header fields copied from ReceiptTemplate.
+HEADER_FIELDS = ("business_name", "logo", "gst_hst_number", "contact_phone", "contact_email", "website_url")
+
+
+def build_snapshot(db: Session, user_id: int, values: Dict[str, Any]) -> Dict[str, Any]:
+    """Snapshot for a receipt about to be inserted with `values` (create_receipt's row values)."""
+    row = db.execute(
+        select(User.company_name, ReceiptTemplate)
+        .outerjoin(ReceiptTemplate, ReceiptTemplate.user_id == User.id)
+        .where(User.id == user_id)
+    ).first()
+    company_name, tpl = (row[0], row[1]) if row is not None else (None, None)
+
+    header = {f: getattr(tpl, f) if tpl is not None else None for f in HEADER_FIELDS}
+    header["business_name"] = header["business_name"] or company_name
+    when: Optional[datetime] = values.get("transaction_date")
+    return {
+        "v": SNAPSHOT_VERSION,
+        "receipt_id": str(values["receipt_id"]),
+        "transaction_date": when.isoformat() if when is not None else None,
+        "total": str(values["total"]),
+        "company_name": company_name,
+        **header,
+        "template": (
+            {"id": tpl.id, "updated_at": tpl.updated_at.isoformat() if tpl.updated_at else None}
+            if tpl is not None else None
+        ),
+    }
+
+
+def snapshot_context(snapshot: Dict[str, Any]) -> Dict[str, Any]:
+    """receipt.html / ESC/POS context from a stored snapshot."""
+    version = snapshot.get("v")
+    if version != 1:
+        raise RuntimeError(f"Unsupported render snapshot version {version!r}")
+    when = snapshot["transaction_date"]
+    return {
+        **{f: snapshot.get(f) for f in HEADER_FIELDS},
+        "company_name": snapshot.get("company_name"),
+        "receipt_id": snapshot["receipt_id"],
+        "transaction_date": datetime.fromisoformat(when) if when else None,
+        "total": Decimal(snapshot["total"]),
+    }
+
+
+def snapshot_template(snapshot: Dict[str, Any]) -> Optional[SimpleNamespace]:
+    """
+    ReceiptTemplate stand-in (header fields + id/updated_at for the ESC/POS logo
+    cache) as it was when the receipt was created.
+    """
+    ref = snapshot.get("template")
+    if ref is None:
+        return None
+    updated_at = ref.get("updated_at")
+    return SimpleNamespace(
+        id=ref["id"],
+        updated_at=datetime.fromisoformat(updated_at) if updated_at else None,
+        **{f: snapshot.get(f) for f in HEADER_FIELDS},
+    )
@@ -0,0 +1,325 @@
+"""
+Monthly statements: one PDF listing every receipt of a merchant's month.
+
+A month can hold tens of thousands of receipts, far too many for one HTML
+document in memory (or in one wkhtmltopdf DOM). The job instead:
+
+  1. streams the month's receipts with a server-side cursor (yield_per),
+     STATEMENT_CHUNK_SIZE rows at a time;
+  2. renders each chunk through statement.html into its own page file on
+     disk, then drops it; a final file carries the month's totals;
+  3. renders the page files in batches of STATEMENT_PAGES_PER_RENDER, one
+     wkhtmltopdf run each writing a part PDF to disk
+     (pdf_generator.render_pdf_files), so the renderer's memory is bounded
+     by the batch rather than the month; each batch's HTML is dropped as
+     soon as its part exists, and a batch shed by admission control under
+     scan load is retried with back-off;
+  4. concatenates the parts page by page into the final PDF, streaming
+     (pdf_merge.concat_pdfs), so the document is never held here either.
+
+Jobs run on a small thread pool (STATEMENT_MAX_CONCURRENT_JOBS) and report
+progress through GET /receipts/statements/{job_id}. With `--workers N` the
+status request can land on any worker, so job state lives next to the output
+in temporary_files/statement_<id>.json (published atomically, updated per
+chunk and per batch), not in memory. The job id is derived from (user, month,
+tz), so a repeat POST on another worker finds the same job; the check-and-
+start runs under cache_lock. A job whose state hasn't moved for
+STATEMENT_JOB_STALE_SECONDS (its worker died) counts as failed and may be
+restarted; the restart gets a new run token, and a still-living old run gives
+up on its next save. The PDF is kept for STATEMENT_JOB_TTL_SECONDS after the
+job finishes (the sweeper leaves statement files alone until then) and the
+job is reported "expired" after that.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.db.session import read_session
+from app.models.receipt_template import ReceiptTemplate
+from app.models.user import User
+from app.services.receipts import pdf_generator
+from app.services.receipts.admission import RenderOverloaded
+from app.services.receipts.archive import receipts_union
+from app.services.receipts.cache_lock import cache_lock, publish
+from app.services.receipts.pdf_merge import concat_pdfs
+
+logger = logging.getLogger(__name__)
+
+FILE_PREFIX = "statement_"  # outputs and job state in temporary_files/ (see sweeper)
+LIVE = ("queued", "running", "rendering")
+MAX_BACKOFF_SECONDS = 60.0  # between retries of a shed renderer batch
+
+
+def month_range(month: str, tz: str) -> Tuple[datetime, datetime]:
+    """[start, end) of "YYYY-MM" in `tz`, as aware datetimes. Raises ValueError / KeyError."""
+    zone = ZoneInfo(tz)
+    start = datetime.strptime(month, "%Y-%m").replace(tzinfo=zone)
+    end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+    return start, end
+
+
+def job_id(user: str, month: str, tz: str) -> str:
+    """Same id on every worker for the same statement."""
+    return hashlib.sha1(f"{user}\n{month}\n{tz}".encode()).hexdigest()[:32]
+
+
+class Superseded(Exception):
+    """Another run has taken this job over (this one was presumed dead)."""
+
+
+@dataclass
+class StatementJob:
+    user: str  # token subject (email)
+    user_id: int
+    month: str
+    tz: str
+    id: str = ""
+    run: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued / running / rendering / done / failed / expired
+    total: int = 0
+    done: int = 0
+    pages: int = 0
+    error: Optional[str] = None
+    updated: float = 0.0  # wall clock of the last save
+    finished: Optional[float] = None
+
+    def __post_init__(self) -> None:
+        self.id = self.id or job_id(self.user, self.month, self.tz)
+
+    @property
+    def path(self) -> str:
+        return pdf_generator._temp_path(f"{FILE_PREFIX}{self.id}.pdf")
+
+    @property
+    def state_path(self) -> str:
+        return pdf_generator._temp_path(f"{FILE_PREFIX}{self.id}.json")
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "month": self.month,
+            "tz": self.tz,
+            "total": self.total,
+            "done": self.done,
+            "pages": self.pages,
+            "error": self.error,
+        }
+
+    def effective(self, now: Optional[float] = None) -> "StatementJob":
+        """The job as a reader should see it: dead runs failed, old or swept outputs expired."""
+        now = time.time() if now is None else now
+        if self.status in LIVE and now - self.updated > settings.STATEMENT_JOB_STALE_SECONDS:
+            self.status, self.error = "failed", "statement worker stopped"
+        elif self.status == "done" and (
+            now - (self.finished or 0) > settings.STATEMENT_JOB_TTL_SECONDS or not os.path.exists(self.path)
+        ):
+            self.status = "expired"
+        return self
+
+    def write(self) -> None:
+        """Publish this state unconditionally; callers hold the job's lock."""
+        self.updated = time.time()
+        publish(self.state_path, json.dumps(asdict(self)).encode())
+
+    def save(self) -> None:
+        """Publish progress from the run that owns the job; raises Superseded otherwise."""
+        with cache_lock(self.state_path, timeout=settings.RENDER_LOCK_TIMEOUT_SECONDS):
+            current = load(self.id)
+            if current is None or current.run != self.run:
+                raise Superseded(self.id)
+            self.write()
+
+
+def load(job_id: str) -> Optional[StatementJob]:
+    """Stored state of `job_id` as last saved, or None."""
+    if not job_id.isalnum():
+        return None
+    try:
+        with open(pdf_generator._temp_path(f"{FILE_PREFIX}{job_id}.json"), encoding="utf-8") as f:
+            return StatementJob(**json.load(f))
+    except (FileNotFoundError, ValueError, TypeError):
+        return None
+
+
+def _header(db, user_id: int) -> dict:
+    row = db.execute(
+        select(User.company_name, ReceiptTemplate.business_name, ReceiptTemplate.gst_hst_number)
+        .outerjoin(ReceiptTemplate, ReceiptTemplate.user_id == User.id)
+        .where(User.id == user_id)
+    ).first()
+    if row is None:
+        return {}
+    company_name, business_name, gst_hst_number = row
+    return {"business_name": business_name or company_name, "gst_hst_number": gst_hst_number}
+
+
+def _render_batch(batch: List[str], part: str, job: StatementJob, progress: Callable[[], None]) -> None:
+    """
+    One renderer run. Receipt scans outrank exports in admission control, so a
+    batch shed under load is retried with a doubling back-off (saving progress
+    meanwhile so the job doesn't look dead); the job fails only after
+    STATEMENT_RENDER_ATTEMPTS sheds in a row.
+    """
+    delay = settings.RENDER_QUEUE_TIMEOUT_SECONDS
+    for attempt in range(1, settings.STATEMENT_RENDER_ATTEMPTS + 1):
+        try:
+            pdf_generator.render_pdf_files(batch, part, kind="export", user_id=job.user_id)
+            return
+        except RenderOverloaded as e:
+            if attempt == settings.STATEMENT_RENDER_ATTEMPTS:
+                raise
+            logger.info("statement %s: batch shed (%s), retry %d in %.0fs", job.id, e.reason, attempt, delay)
+        time.sleep(delay)
+        delay = min(delay * 2, MAX_BACKOFF_SECONDS)
+        progress()
+
+
+def build_statement(
+    job: StatementJob,
+    chunk_size: Optional[int] = None,
+    progress: Callable[[], None] = lambda: None,
+) -> str:
+    """
+    Render `job`'s statement to job.path and return it. Updates the job's
+    counters and calls `progress` after each chunk and each renderer batch.
+    """
+    chunk_size = chunk_size or settings.STATEMENT_CHUNK_SIZE
+    start, end = month_range(job.month, job.tz)
+    zone = ZoneInfo(job.tz)
+    template = pdf_generator.get_env().get_template("statement.html")
+    out_path = job.path
+    workdir = tempfile.mkdtemp(prefix=f"{FILE_PREFIX}{job.id}_", dir=pdf_generator._temp_path(""))
+
+    receipts = receipts_union(job.user_id, start, end)  # hot + archived
+    try:
+        pages: List[str] = []
+        count, revenue = 0, Decimal("0.00")
+        with read_session() as db:
+            header = {**_header(db, job.user_id), "month": job.month, "tz": job.tz}
+            job.total = db.execute(select(func.count()).select_from(receipts)).scalar_one()
+            result = db.execute(
+                select(receipts.c.transaction_date, receipts.c.receipt_id, receipts.c.total)
+                .order_by(receipts.c.transaction_date, receipts.c.receipt_id)
+                .execution_options(yield_per=chunk_size)  # server-side cursor where supported
+            )
+            for chunk in result.partitions():
+                rows = [
+                    (when.astimezone(zone) if when.tzinfo else when.replace(tzinfo=timezone.utc).astimezone(zone),
+                     rid, total or Decimal("0.00"))
+                    for when, rid, total in chunk
+                ]
+                subtotal = sum((r[2] for r in rows), Decimal("0.00"))
+                path = os.path.join(workdir, f"page_{len(pages):05d}.html")
+                with timed("statement_chunk"):
+                    template.stream(
+                        {**header, "rows": rows, "subtotal": subtotal, "first": count + 1, "last": count + len(rows)}
+                    ).dump(path, encoding="utf-8")
+                pages.append(path)
+                count += len(rows)
+                revenue += subtotal
+                job.done = count
+                progress()
+
+        summary = os.path.join(workdir, "summary.html")
+        template.stream({**header, "rows": None, "summary": {"count": count, "total": revenue}}).dump(
+            summary, encoding="utf-8"
+        )
+        pages.append(summary)
+        job.pages = len(pages)
+
+        job.status = "rendering"
+        progress()
+        per_run = max(1, settings.STATEMENT_PAGES_PER_RENDER)
+        parts: List[str] = []
+        for lo in range(0, len(pages), per_run):
+            batch = pages[lo : lo + per_run]
+            part = os.path.join(workdir, f"part_{len(parts):05d}.pdf")
+            _render_batch(batch, part, job, progress)
+            parts.append(part)
+            for path in batch:
+                os.remove(path)
+            progress()
+
+        partial = os.path.join(workdir, "statement.pdf")  # per run: a taken-over run may still be merging
+        with timed("statement_merge"):
+            concat_pdfs(parts, partial)
+        os.replace(partial, out_path)
+        return out_path
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class StatementJobs:
+    """Job runner; state is shared through temporary_files/, the thread pool is per worker."""
+
+    def __init__(self) -> None:
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=settings.STATEMENT_MAX_CONCURRENT_JOBS, thread_name_prefix="statement"
+            )
+        return self._executor
+
+    def submit(self, user: str, user_id: int, month: str, tz: str) -> StatementJob:
+        """Start a statement job, or return the live/finished one for the same month (from any worker)."""
+        month_range(month, tz)  # validate before queueing
+        job = StatementJob(user=user, user_id=user_id, month=month, tz=tz)
+        with cache_lock(job.state_path, timeout=settings.RENDER_LOCK_TIMEOUT_SECONDS):
+            current = load(job.id)
+            if current is not None and current.effective().status in LIVE + ("done",):
+                return current
+            job.write()
+        self._pool().submit(self._run, job)
+        return job
+
+    def _run(self, job: StatementJob) -> None:
+        try:
+            job.status = "running"
+            job.save()
+            build_statement(job, progress=job.save)
+            job.status = "done"
+        except Superseded:
+            logger.warning("statement %s: taken over by another run, abandoning", job.id)
+            return
+        except Exception as e:
+            logger.warning("statement %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.status = "failed"
+        job.finished = time.time()
+        try:
+            job.save()
+        except Superseded:
+            logger.warning("statement %s: taken over by another run, abandoning", job.id)
+
+    def get(self, job_id: str, user: str) -> Optional[StatementJob]:
+        job = load(job_id)
+        return job.effective() if job is not None and job.user == user else None
+
+    def shutdown(self) -> None:
+        """Drop queued jobs; running ones finish. Dropped jobs go stale and can be resubmitted."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+statement_jobs = StatementJobs()
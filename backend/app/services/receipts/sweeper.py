@@ -0,0 +1,290 @@
+"""
+Garbage collector for generated artifacts.
+
+Two kinds of files pile up on disk and are never deleted by the request path:
+  - services/receipts/temporary_files/: cached receipt PDFs and template previews
+    (both can be re-rendered on demand, so they are safe to drop). Monthly
+    statements (statement_<id>.pdf) can't be: they are kept for
+    STATEMENT_JOB_TTL_SECONDS after the job finished and stay out of the
+    size-based eviction; their job state (.json) is kept for the normal max age.
+  - app/static/logo/: uploaded logos left behind when a template's logo is replaced.
+    Only files named like an upload (user_<id>_<hex>.<ext>) whose merchant's
+    template has since moved to a newer upload, and which no receipt's render
+    snapshot (hot or archived) still shows, are deleted; anything else in
+    the directory (logos shipped with the checkout, hand-placed files) is kept.
+
+Run periodically from the app lifespan, or by hand:
+    python -m app.services.receipts.sweeper --dry-run
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.static_files import asset_index
+from app.models.receipt import Receipt
+from app.models.receipt_archive import ReceiptArchive
+from app.models.receipt_template import ReceiptTemplate
+from app.services.receipts.pdf_generator import TEMP_DIR
+
+logger = logging.getLogger(__name__)
+
+LOGO_DIR = Path("app/static/logo")
+# Siblings written next to logos by the static layer; they follow their source file.
+LOGO_VARIANT_SUFFIXES = (".gz", ".br")
+# File names written by the logo upload endpoint (endpoints/receip_template.py).
+UPLOAD_NAME = re.compile(r"^user_(\d+)_[0-9a-f]{32}\.(?:png|jpg|webp|svg)$")
+# Partial PDFs left by a worker that died mid-publish (see cache_lock.publish).
+PARTIAL_SUFFIX = ".tmp"
+PARTIAL_MAX_AGE_SECONDS = 3600
+# Statement outputs and job state (services/receipts/statements.py).
+STATEMENT_PREFIX = "statement_"
+
+
+@dataclass
+class SweepReport:
+    dry_run: bool
+    files_deleted: int = 0
+    bytes_reclaimed: int = 0
+    temp_bytes_remaining: int = 0
+    deleted: List[str] = field(default_factory=list)
+
+    def _record(self, path: str, size: int) -> None:
+        self.files_deleted += 1
+        self.bytes_reclaimed += size
+        self.deleted.append(path)
+
+
+@dataclass
+class _Entry:
+    path: str
+    size: int
+    mtime: float
+    last_used: float
+
+
+def _scan(directory: str | os.PathLike) -> List[_Entry]:
+    entries: List[_Entry] = []
+    try:
+        with os.scandir(directory) as it:
+            for de in it:
+                if not de.is_file(follow_symlinks=False):
+                    continue
+                try:
+                    st = de.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                entries.append(_Entry(de.path, st.st_size, st.st_mtime, max(st.st_mtime, st.st_atime)))
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _remove(path: str, size: int, report: SweepReport) -> None:
+    if not report.dry_run:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return  # another worker got there first
+        except OSError as e:
+            logger.warning("sweeper: could not delete %s: %s", path, e)
+            return
+    report._record(path, size)
+
+
+def sweep_temp_files(
+    report: SweepReport,
+    max_bytes: int,
+    max_age_seconds: float,
+    now: Optional[float] = None,
+) -> None:
+    """
+    Drop cached PDFs/previews older than max_age_seconds (and abandoned partial
+    writes after an hour), then evict the least recently used ones until the
+    directory fits in max_bytes. Statement PDFs only go once their job's TTL
+    has passed since they were written, and don't count towards max_bytes.
+    """
+    now = time.time() if now is None else now
+    entries = sorted(_scan(TEMP_DIR), key=lambda e: e.last_used)
+
+    kept: List[_Entry] = []
+    statements = 0
+    for e in entries:
+        age = now - e.last_used
+        if os.path.basename(e.path).startswith(STATEMENT_PREFIX) and not e.path.endswith(PARTIAL_SUFFIX):
+            keep_for = settings.STATEMENT_JOB_TTL_SECONDS
+            if e.path.endswith(".json"):  # outlives the PDF so the job reads "expired", not unknown
+                keep_for = max(keep_for, max_age_seconds)
+            if now - e.mtime > keep_for:
+                _remove(e.path, e.size, report)
+            else:
+                statements += e.size
+        elif age > max_age_seconds or (e.path.endswith(PARTIAL_SUFFIX) and age > PARTIAL_MAX_AGE_SECONDS):
+            _remove(e.path, e.size, report)
+        else:
+            kept.append(e)
+
+    used = sum(e.size for e in kept)
+    for e in kept:  # oldest first
+        if used <= max_bytes:
+            break
+        _remove(e.path, e.size, report)
+        used -= e.size
+    report.temp_bytes_remaining = used + statements
+
+
+def _file_name(logo: str) -> str:
+    # Stored as a public URL ("{base}/static/logo/<fname>"); compare by file name.
+    return logo.rstrip("/").rsplit("/", 1)[-1]
+
+
+def _template_logos(db: Session) -> Dict[str, str]:
+    """user_id -> file name of the logo their template points at now."""
+    rows = db.execute(
+        select(ReceiptTemplate.user_id, ReceiptTemplate.logo).where(ReceiptTemplate.logo.is_not(None))
+    ).tuples()
+    return {str(user_id): _file_name(logo) for user_id, logo in rows}
+
+
+def _replaced(name: str, mtime: float, current: Dict[str, str]) -> bool:
+    """An upload whose merchant's template now points at a newer upload of theirs."""
+    match = UPLOAD_NAME.match(name)
+    if match is None:
+        return False
+    newer = current.get(match.group(1))
+    if newer is None or newer == name or not newer.startswith(f"user_{match.group(1)}_"):
+        return False
+    try:
+        return os.stat(LOGO_DIR / newer).st_mtime > mtime
+    except FileNotFoundError:
+        return False
+
+
+def _in_snapshots(db: Session, name: str) -> bool:
+    """Whether a receipt snapshot of the uploader (hot or archived) still shows logo `name`."""
+    user_id = UPLOAD_NAME.match(name).group(1)
+    pattern = f"%/{name}"  # "_" in the name matches any char: errs on the side of keeping
+    if db.execute(
+        select(Receipt.id)
+        .where(Receipt.user_id == user_id, Receipt.render_snapshot["logo"].as_string().like(pattern))
+        .limit(1)
+    ).first():
+        return True
+    if settings.ARCHIVE_ENABLED:
+        return db.execute(
+            select(ReceiptArchive.receipt_id)
+            .where(ReceiptArchive.user_id == user_id, ReceiptArchive.logo.like(pattern))
+            .limit(1)
+        ).first() is not None
+    return False
+
+
+def sweep_orphan_logos(
+    db: Session,
+    report: SweepReport,
+    grace_seconds: float,
+    now: Optional[float] = None,
+) -> None:
+    """
+    Delete uploaded logos their merchant's template has replaced with a newer
+    upload and no other template or receipt snapshot points at. Files younger
+    than grace_seconds are kept so an upload whose template row isn't
+    committed yet survives.
+    """
+    now = time.time() if now is None else now
+    current = _template_logos(db)
+    referenced = set(current.values())
+
+    for e in _scan(LOGO_DIR):
+        name = os.path.basename(e.path)
+        if name.endswith(LOGO_VARIANT_SUFFIXES):
+            source = name.rsplit(".", 1)[0]
+            if source in referenced or os.path.exists(os.path.join(LOGO_DIR, source)):
+                continue
+        elif (
+            name in referenced
+            or now - e.mtime < grace_seconds
+            or not _replaced(name, e.mtime, current)
+            or _in_snapshots(db, name)  # re-renders of older receipts still need it
+        ):
+            continue
+        _remove(e.path, e.size, report)
+        if not report.dry_run:
+            asset_index.forget(e.path)
+
+
+def run_sweep(db: Session, dry_run: bool = False) -> SweepReport:
+    report = SweepReport(dry_run=dry_run)
+    sweep_temp_files(
+        report,
+        max_bytes=settings.TEMP_FILES_MAX_BYTES,
+        max_age_seconds=settings.TEMP_FILES_MAX_AGE_HOURS * 3600,
+    )
+    sweep_orphan_logos(db, report, grace_seconds=settings.ORPHAN_LOGO_GRACE_HOURS * 3600)
+    return report
+
+
+def _sweep_once() -> SweepReport:
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return run_sweep(db)
+    finally:
+        db.close()
+
+
+async def sweeper_loop(interval_seconds: float) -> None:
+    """Background task started from the app lifespan."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            report = await asyncio.to_thread(_sweep_once)
+            if report.files_deleted:
+                logger.info(
+                    "sweeper: deleted %d files, reclaimed %d bytes",
+                    report.files_deleted, report.bytes_reclaimed,
+                )
+        except Exception:
+            logger.exception("sweeper: sweep failed")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Delete stale receipt PDFs and orphaned logos.")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be deleted")
+    parser.add_argument("-v", "--verbose", action="store_true", help="list every file")
+    args = parser.parse_args(argv)
+
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        report = run_sweep(db, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    if args.verbose:
+        for path in report.deleted:
+            print(path)
+    verb = "would delete" if report.dry_run else "deleted"
+    print(
+        f"{verb} {report.files_deleted} files, "
+        f"{report.bytes_reclaimed} bytes reclaimed, "
+        f"{report.temp_bytes_remaining} bytes left in temporary_files/"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,85 +1,93 @@
+import logging
 import uuid
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, case, select
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from typing import Any, Tuple
 
+from app.core.metrics import timed
 from app.services.utils import get_user_id
 from app.models.receipt import Receipt
+from app.services.receipts.archive import archived_total, receipts_union
+from app.services.receipts.live import get_broker
+from app.services.receipts.encoding import encode_receipt_event, encode_receipt_rows, encode_user_stats
+
+logger = logging.getLogger(__name__)
+
 
 def generate_uuid():
     return uuid.uuid1()
 
-def get_user_stats(db: Session, email: str):
+def get_user_totals(db: Session, user_id, since: datetime) -> Tuple[Any, Any]:
+    """
+    (all-time total, total since `since`) in a single pass over the user's hot
+    receipts plus the archived running total. `since` must be within the last
+    day: archived receipts are never newer than that.
+    """
+    total, total_since, archived = db.execute(
+        select(
+            func.sum(Receipt.total),
+            func.sum(case((Receipt.transaction_date >= since, Receipt.total))),
+            archived_total(user_id),
+        ).where(Receipt.user_id == str(user_id))
+    ).one()
+    if archived is not None:
+        total = archived if total is None else total + archived
+    return total, total_since
+
+
+def get_user_stats(db: Session, email: str) -> bytes:
+    """
+    JSON body for /receipts/stats (see schemas.receipt.UserStats).
+    """
     user_id = get_user_id(db, email)
     if user_id is None:
-        return {
-            'total': 0,
-            'total_today': 0,
-            'recent_receipts': []
-        }
-
-    total_revenue = db.query(func.sum(Receipt.total)) \
-        .filter(Receipt.user_id == user_id) \
-        .scalar()
-    
-    if total_revenue is None:
-        total_revenue = 0
+        return encode_user_stats(0, 0, [])
 
     twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
 
-    total_today = db.query(func.sum(Receipt.total)) \
-        .filter(
-            Receipt.user_id == user_id,
-            Receipt.transaction_date >= twenty_four_hours_ago
-            ).scalar()
-    
-    if total_revenue is None:
-        total_revenue = 0
-
-    recent_receipts = db.query(
-        Receipt.total,
-        Receipt.transaction_date
-    ).filter(
-        Receipt.user_id == user_id,
-        Receipt.transaction_date >= twenty_four_hours_ago
-    ).order_by(
-        desc(Receipt.transaction_date)
-    ).all()
+    with timed("db_query"):
+        total_revenue, total_today = get_user_totals(db, user_id, twenty_four_hours_ago)
 
-    # Format receipts as list of dicts
-    recent_receipts_list = [
-        {
-            'total': float(r.total),
-            'transaction_date': r.transaction_date
-        }
-        for r in recent_receipts
-    ]
+        recent_receipts = db.execute(
+            select(Receipt.total, Receipt.transaction_date)
+            .where(
+                Receipt.user_id == str(user_id),
+                Receipt.transaction_date >= twenty_four_hours_ago,
+            )
+            .order_by(desc(Receipt.transaction_date))
+        ).tuples().all()
 
-    result = {
-        'total': total_revenue,
-        'total_today': total_today,
-        'recent_receipts': recent_receipts_list
-    }
-    return result
+    with timed("encode"):
+        return encode_user_stats(total_revenue, total_today, recent_receipts)
 
 
-def get_receipts(db: Session, email: str):
+def get_receipts(db: Session, email: str) -> bytes:
+    """
+    JSON body for /receipts/all (see schemas.receipt.ReceiptListItem).
+    Rows are encoded straight from the result tuples; archived receipts included.
+    """
     user_id = get_user_id(db, email)
-    receipts = db.query(
-        Receipt.total,
-        Receipt.transaction_date,
-        Receipt.receipt_id
-    ).filter(
-        Receipt.user_id == user_id
-    ).order_by(
-        desc(Receipt.transaction_date)
-    ).all()
-    receipts_list = [
-        {
-            'id' : r.receipt_id,
-            'total': float(r.total),
-            'transaction_date': r.transaction_date
-        }
-        for r in receipts
-    ]
-    return receipts_list
+    rows = receipts_union(user_id)
+    with timed("db_query"):
+        receipts = db.execute(
+            select(rows.c.total, rows.c.transaction_date, rows.c.receipt_id)
+            .order_by(desc(rows.c.transaction_date))
+        ).tuples().all()
+    with timed("encode"):
+        return encode_receipt_rows(receipts)
+
+
+def publish_receipt_created(db: Session, email: str, user_id, row) -> None:
+    """Push the new totals + receipt to the merchant's open dashboards, if any."""
+    broker = get_broker()
+    if not broker.has_subscribers(email):  # across workers: see live.py for the contract
+        return
+    try:
+        with timed("db_query"):
+            total, total_today = get_user_totals(db, user_id, datetime.utcnow() - timedelta(hours=24))
+        data = encode_receipt_event(total, total_today, row.receipt_id, row.total, row.transaction_date)
+        broker.publish(email, ("receipt", data))
+    except Exception:
+        # The receipt is committed; a missed push only delays the dashboard.
+        logger.warning("live publish for %s failed", email, exc_info=True)
@@ -2,21 +2,30 @@
 from __future__ import annotations
 
 from datetime import datetime, timedelta, timezone
-from typing import Optional, Dict, Any, List
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
 
-from fastapi import Header, HTTPException, status
-from jose import jwt, JWTError
-from passlib.context import CryptContext
+from fastapi import Header, HTTPException, Query, status
 from sqlalchemy import select, func, desc, and_
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
 from app.models.user import User
 from app.models.receipt import Receipt
+from app.models.receipt_archive import ReceiptArchiveTotal
 from app.models.user import User
 
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# passlib (+ argon2 backend) and python-jose are imported on first use to keep
+# worker cold starts cheap; warm() loads them ahead of traffic.
+
 # ---- password hashing (prefer argon2; fallback to bcrypt) ----
-def _build_pwd_context() -> CryptContext:
+@lru_cache(maxsize=None)
+def get_pwd_context() -> "CryptContext":
+    from passlib.context import CryptContext
+
     try:
         # Prefer argon2 if installed
         return CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
@@ -24,14 +33,21 @@ def _build_pwd_context() -> CryptContext:
         # Fallback to bcrypt-only if argon2 unavailable
         return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-pwd_context = _build_pwd_context()
-
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+def warm() -> None:
+    """Build the password context, load its hash backend, import python-jose."""
+    from jose import jwt  # noqa: F401
+
+    handler = get_pwd_context().handler()
+    if hasattr(handler, "get_backend"):
+        handler.get_backend()
 
 
 # ---- user lookups ----
@@ -57,12 +73,16 @@ def _expiry_from_delta(expires_delta: Optional[timedelta], fallback_minutes: int
     return datetime.now(timezone.utc) + timedelta(minutes=fallback_minutes)
 
 def create_refresh_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
     expire = _expiry_from_delta(expires_delta, settings.REFRESH_TTL_MIN)
     to_encode.update({"exp": expire, "type": "refresh"})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
     expire = _expiry_from_delta(expires_delta, settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire, "type": "access"})
@@ -75,6 +95,8 @@ def verify_token(authorization: Optional[str] = Header(None)) -> str:
     Reads 'Authorization: Bearer <jwt>' and returns the user's email (sub).
     Raise 401 if missing/invalid.
     """
+    from jose import jwt, JWTError
+
     if not authorization or not authorization.lower().startswith("bearer "):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing bearer token")
 
@@ -89,6 +111,29 @@ def verify_token(authorization: Optional[str] = Header(None)) -> str:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
 
+def require_admin(authorization: Optional[str] = Header(None)) -> str:
+    """
+    Like verify_token, but only lets through subjects listed in settings.ADMIN_EMAILS.
+    """
+    email = verify_token(authorization)
+    if email not in settings.ADMIN_EMAILS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin only")
+    return email
+
+
+def verify_stream_token(
+    authorization: Optional[str] = Header(None),
+    token: Optional[str] = Query(None),
+) -> str:
+    """
+    verify_token for streaming endpoints: browsers' EventSource can't set
+    headers, so the access token may also come as `?token=<jwt>`.
+    """
+    if not authorization and token:
+        authorization = f"Bearer {token}"
+    return verify_token(authorization)
+
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     user = get_user(db, email)
     if not user:
@@ -113,11 +158,18 @@ def get_user_stats(db: Session, email: str) -> Dict[str, Any]:
 
     user_id_str = str(uid)
 
-    # Total & count
+    # Total & count (hot table + archived running totals)
     total_sum, count = db.execute(
         select(func.coalesce(func.sum(Receipt.total), 0), func.count(Receipt.id))
         .where(Receipt.user_id == user_id_str)
     ).one()
+    archived = settings.ARCHIVE_ENABLED and db.execute(
+        select(ReceiptArchiveTotal.total, ReceiptArchiveTotal.count)
+        .where(ReceiptArchiveTotal.user_id == user_id_str)
+    ).first()
+    if archived:
+        total_sum += archived[0]
+        count += archived[1]
 
     # Today's totals (UTC day window)
     now = datetime.now(timezone.utc)
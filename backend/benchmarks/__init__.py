@@ -0,0 +1,19 @@
+"""
+Offline benchmarks. Run from backend/, e.g.:
+    python -m benchmarks.load --concurrency 8 --requests 200
+    python -m benchmarks.bench_serialization
+"""
+import os
+
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+
+# Settings() requires DATABASE_URL; benchmarks never touch the real database.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+
+@compiles(UUID, "sqlite")
+def _uuid_as_text(type_, compiler, **kw):
+    # A bare "UUID" column gets NUMERIC affinity in SQLite, which turns hex ids
+    # such as "1234e567..." into floats. Store them as text on the stand-in DB.
+    return "CHAR(32)"
@@ -0,0 +1,123 @@
+"""
+GET /receipts/export throughput and memory on the SQLite stand-in.
+
+    python -m benchmarks.bench_export [--rows 1000000] [--chunk 5000]
+
+Seeds one merchant with `--rows` receipts in a scratch SQLite file, then runs
+each encoder in a fresh child process so peak RSS (ru_maxrss) belongs to that
+run alone:
+  - csv / parquet: the streaming export (app.services.receipts.export);
+  - all_json: the /receipts/all path (every row encoded into one body), for
+    comparison.
+The encoded bytes are discarded as they are produced, as a client would read them.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+SEED_BATCH = 50_000
+
+
+def seed(rows: int) -> None:
+    from sqlalchemy import insert
+
+    from app.db.base import Base
+    from app.db.session import get_engine
+    from app.models.receipt import Receipt
+    from app.models.receipt_template import ReceiptTemplate  # noqa: F401  (FK targets)
+    from app.models.user import User
+
+    engine = get_engine()
+    Base.metadata.create_all(engine)
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "email": "bench@example.com", "hashed_password": "x"}])
+        for lo in range(0, rows, SEED_BATCH):
+            conn.execute(insert(Receipt), [
+                {
+                    "receipt_id": uuid.uuid4(),
+                    "user_id": "1",
+                    "transaction_date": start + timedelta(seconds=30 * i),
+                    "total": Decimal(i % 10000) / 100,
+                }
+                for i in range(lo, min(lo + SEED_BATCH, rows))
+            ])
+
+
+def child(mode: str, path: str, chunk: int) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ["EXPORT_CHUNK_SIZE"] = str(chunk)
+    import benchmarks  # noqa: F401  (SQLite UUID DDL)
+    from app.models.receipt_template import ReceiptTemplate  # noqa: F401  (FK targets)
+    from app.services.receipts.export import iter_export, receipt_chunks
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    t0 = time.perf_counter()
+    size = 0
+    if mode == "all_json":
+        from app.db.session import SessionLocal
+        from app.services.receipts.utils import get_receipts
+
+        with SessionLocal() as db:
+            size = len(get_receipts(db, "bench@example.com"))
+    else:
+        for part in iter_export(mode, receipt_chunks(None, 1)):
+            size += len(part)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "bytes": size, "peak_kb": peak, "baseline_kb": baseline}))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=5000)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.db, args.chunk)
+        return
+
+    workdir = tempfile.mkdtemp(prefix="qr-export-")
+    path = os.path.join(workdir, "export.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"  # before the app reads its settings
+    import benchmarks  # noqa: F401
+    from app.services.receipts.export import parquet_available
+
+    try:
+        t0 = time.perf_counter()
+        seed(args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - t0:.1f}s")
+        modes = ["csv", "parquet", "all_json"] if parquet_available() else ["csv", "all_json"]
+        print(f"{'mode':>9} {'rows/s':>10} {'output':>10} {'peak RSS':>10} {'over import':>12}")
+        for mode in modes:
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_export", "--child", mode, "--db", path,
+                 "--chunk", str(args.chunk)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out.strip().splitlines()[-1])
+            # ru_maxrss is KiB on Linux
+            print(
+                f"{mode:>9} {args.rows / r['seconds']:>10,.0f} {r['bytes'] / 2**20:>8.1f}MB "
+                f"{r['peak_kb'] / 1024:>8.1f}MB {(r['peak_kb'] - r['baseline_kb']) / 1024:>10.1f}MB"
+            )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Render scheduling under a noisy neighbour: latency of a light merchant's
+customer scans while a heavy merchant floods the renderer.
+
+    python -m benchmarks.bench_fairness [--seconds 5] [--render-ms 50] [--check]
+
+Renders are simulated with sleep() so this measures only the scheduler
+(app.services.receipts.admission). Four runs are compared:
+  fifo    one shared arrival-order queue, no per-tenant caps
+  fair    per-tenant fair queuing, no caps, heavy tenant replaying receipts
+  capped  fair queuing + per-tenant caps (half the slots / half the queue)
+  mixed   fair queuing, no caps, heavy tenant hammering previews instead
+
+With --check the exit code is 1 unless the light tenant's p99 wait stays
+within --bound render times in every run except fifo.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import threading
+import time
+from typing import Dict, List
+
+from app.services.receipts.admission import AdmissionController, RenderOverloaded
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round((len(values) - 1) * pct / 100)))]
+
+
+def run(
+    controller: AdmissionController,
+    seconds: float,
+    render_s: float,
+    heavy_workers: int,
+    heavy_kind: str,
+    light_interval: float,
+) -> Dict[str, dict]:
+    waits: Dict[str, List[float]] = {"heavy": [], "light": []}
+    shed = {"heavy": 0, "light": 0}
+    stop = time.monotonic() + seconds
+
+    def render(tenant: str, kind: str) -> None:
+        t0 = time.monotonic()
+        try:
+            with controller.slot(kind, tenant=tenant):
+                waits[tenant].append(time.monotonic() - t0)
+                time.sleep(render_s)
+        except RenderOverloaded:
+            shed[tenant] += 1
+            time.sleep(render_s)  # back off like a client honouring Retry-After would
+
+    def heavy() -> None:
+        while time.monotonic() < stop:
+            render("heavy", heavy_kind)
+
+    def light() -> None:
+        while time.monotonic() < stop:
+            threading.Thread(target=render, args=("light", "receipt")).start()
+            time.sleep(light_interval)
+
+    threads = [threading.Thread(target=heavy) for _ in range(heavy_workers)]
+    threads.append(threading.Thread(target=light))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    time.sleep(render_s * 4)  # let the last light renders finish
+
+    return {
+        tenant: {
+            "renders": len(w),
+            "shed": shed[tenant],
+            "p50_ms": round(statistics.median(w) * 1000, 1) if w else 0.0,
+            "p99_ms": round(percentile(w, 99) * 1000, 1),
+            "max_ms": round(max(w) * 1000, 1) if w else 0.0,
+        }
+        for tenant, w in waits.items()
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--render-ms", type=float, default=50.0)
+    parser.add_argument("--slots", type=int, default=4)
+    parser.add_argument("--queue", type=int, default=32)
+    parser.add_argument("--heavy-workers", type=int, default=24)
+    parser.add_argument("--light-interval-ms", type=float, default=100.0)
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--bound", type=float, default=3.0, help="allowed light p99 wait, in render times")
+    args = parser.parse_args()
+
+    render_s = args.render_ms / 1000
+    timeout = render_s * 200  # measure queueing, not shedding
+
+    def controller(capped: bool = False) -> AdmissionController:
+        return AdmissionController(
+            max_in_flight=args.slots,
+            max_queue=args.queue,
+            queue_timeout=timeout,
+            tenant_max_in_flight=args.slots // 2 if capped else args.slots,
+            tenant_max_queue=args.queue // 2 if capped else args.queue,
+            initial_render_seconds=render_s,
+        )
+
+    def fifo() -> AdmissionController:
+        c = controller()
+        c._next_waiter = lambda: _fifo_next(c)  # one global arrival-order queue
+        return c
+
+    runs = {
+        "fifo": (fifo(), "receipt"),
+        "fair": (controller(), "receipt"),
+        "capped": (controller(capped=True), "receipt"),
+        "mixed": (controller(), "preview"),
+    }
+    light_interval = args.light_interval_ms / 1000
+    results = {
+        name: run(c, args.seconds, render_s, args.heavy_workers, kind, light_interval)
+        for name, (c, kind) in runs.items()
+    }
+
+    print(f"{'run':<7}{'tenant':<7}{'renders':>9}{'shed':>6}{'p50 wait':>11}{'p99 wait':>11}{'max wait':>11}")
+    for name, by_tenant in results.items():
+        for tenant, r in by_tenant.items():
+            print(
+                f"{name:<7}{tenant:<7}{r['renders']:>9}{r['shed']:>6}"
+                f"{r['p50_ms']:>9.1f}ms{r['p99_ms']:>9.1f}ms{r['max_ms']:>9.1f}ms"
+            )
+
+    if args.check:
+        limit_ms = args.bound * args.render_ms
+        failed = [n for n in results if n != "fifo" and results[n]["light"]["p99_ms"] > limit_ms]
+        if failed:
+            print(f"\nFAIL: light tenant p99 wait above {limit_ms:.0f} ms in: {', '.join(failed)}")
+            return 1
+        print(f"\nOK: light tenant p99 wait within {limit_ms:.0f} ms under heavy load")
+    return 0
+
+
+def _fifo_next(c: AdmissionController):
+    oldest = None
+    for t in c._tenants.values():
+        for q in t.waiting.values():
+            if q and (oldest is None or q[0].enqueued < oldest.enqueued):
+                oldest = q[0]
+    if oldest is None:
+        return None
+    t = c._tenants[oldest.tenant]
+    t.waiting[oldest.priority].popleft()
+    t.queued -= 1
+    c.queued -= 1
+    return oldest
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
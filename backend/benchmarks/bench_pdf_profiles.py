@@ -0,0 +1,77 @@
+"""
+PDF size and render time per output profile (pdf_generator.PDF_PROFILES) on
+sample receipts. Needs a real wkhtmltopdf (WKHTMLTOPDF_CMD or on PATH).
+
+    python -m benchmarks.bench_pdf_profiles [--repeat 5] [--logo-px 1600]
+
+Samples: a bare receipt, and one with line items plus a large photographic
+logo (the case where image-dpi / image-quality matter most).
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import io
+import statistics
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict
+
+import benchmarks  # noqa: F401  (env defaults)
+from app.services.receipts.pdf_generator import PDF_PROFILES, from_string, get_env, get_pdfkit_config, pdf_options
+
+
+def sample_logo(px: int) -> str:
+    """Noisy gradient JPEG: compresses like a photo, not like flat art."""
+    import random
+
+    from PIL import Image
+
+    rng = random.Random(42)
+    img = Image.new("RGB", (px, px // 3))
+    img.putdata([
+        (x * 255 // px, y * 255 // (px // 3), rng.randrange(256))
+        for y in range(px // 3) for x in range(px)
+    ])
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95)
+    return "data:image/jpeg;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+def samples(logo_px: int) -> Dict[str, Dict[str, Any]]:
+    base = {
+        "receipt_id": "3f1c0d8e-1d2a-4d5b-9a8e-000000000001",
+        "transaction_date": datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        "total": 42.0,
+        "business_name": "Sample Coffee Co.",
+        "gst_hst_number": "123456789RT0001",
+    }
+    items = [{"name": f"Item {i}", "qty": 1 + i % 3, "unit_price": 2.5 + i} for i in range(12)]
+    return {
+        "plain": base,
+        "items+logo": {**base, "items": items, "subtotal": 37.17, "tax": 4.83, "logo": sample_logo(logo_px)},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--logo-px", type=int, default=1600)
+    args = parser.parse_args()
+
+    template = get_env().get_template("receipt.html")
+    print(f"{'sample':>12} {'profile':>8} {'size':>10} {'median':>10}")
+    for name, ctx in samples(args.logo_px).items():
+        html = template.render(ctx)
+        for profile in PDF_PROFILES:
+            times, size = [], 0
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                pdf = from_string(html, options=pdf_options(profile), configuration=get_pdfkit_config())
+                times.append(time.perf_counter() - t0)
+                size = len(pdf)
+            print(f"{name:>12} {profile:>8} {size / 1024:8.1f} KB {statistics.median(times) * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+/receipts/all serialization: dict rows + jsonable_encoder (old path) vs
+encoding SQLAlchemy result tuples directly (app.services.receipts.encoding).
+
+    python -m benchmarks.bench_serialization [--rows 100000] [--repeat 5]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import create_engine, desc, insert, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.db.base import Base
+from app.models.receipt import Receipt
+from app.models.receipt_template import ReceiptTemplate  # noqa: F401  (FK targets)
+from app.models.user import User
+from app.services.receipts.encoding import encode_receipt_rows
+
+
+def seed(rows: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with Session(engine) as db:
+        db.add(User(id=1, email="bench@example.com", hashed_password="x", company_name="Bench"))
+        db.commit()
+        batch = [
+            {
+                "receipt_id": uuid.uuid4(),
+                "user_id": "1",
+                "transaction_date": start + timedelta(minutes=i),
+                "total": Decimal(i % 10000) / 100,
+            }
+            for i in range(rows)
+        ]
+        db.execute(insert(Receipt), batch)
+        db.commit()
+    return engine
+
+
+def _query(db: Session):
+    return db.execute(
+        select(Receipt.total, Receipt.transaction_date, Receipt.receipt_id)
+        .where(Receipt.user_id == "1")
+        .order_by(desc(Receipt.transaction_date))
+    )
+
+
+def old_path(db: Session) -> bytes:
+    rows = _query(db).all()
+    body = [
+        {"id": r.receipt_id, "total": float(r.total), "transaction_date": r.transaction_date}
+        for r in rows
+    ]
+    return JSONResponse(jsonable_encoder(body)).body
+
+
+def new_path(db: Session) -> bytes:
+    return encode_receipt_rows(_query(db).tuples())
+
+
+def bench(fn, engine, repeat: int) -> list[float]:
+    times = []
+    for _ in range(repeat):
+        with Session(engine) as db:
+            t0 = time.perf_counter()
+            fn(db)
+            times.append(time.perf_counter() - t0)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = seed(args.rows)
+    with Session(engine) as db:
+        assert json.loads(old_path(db)) == json.loads(new_path(db)), "encoders disagree"
+
+    results = {}
+    for name, fn in (("jsonable_encoder", old_path), ("direct_tuples", new_path)):
+        times = bench(fn, engine, args.repeat)
+        results[name] = statistics.median(times)
+        print(f"{name:>18}: median {results[name] * 1000:8.1f} ms  ({args.rows} rows, {args.repeat} runs)")
+    print(f"{'speedup':>18}: {results['jsonable_encoder'] / results['direct_tuples']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
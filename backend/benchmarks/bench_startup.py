@@ -0,0 +1,119 @@
+"""
+Worker cold-start cost: `import app.main` wall time, import time per module
+(python -X importtime), and the duration of each warm-up step.
+
+    python -m benchmarks.bench_startup [--runs 5] [--top 25] [--json out.json]
+
+Every run happens in a fresh interpreter so nothing is cached in sys.modules.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from typing import Dict, List
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+sys.stderr.write("--- warm-up ---\n")
+from app.core.warmup import warm_up
+state = warm_up()
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "warmup_s": t2 - t1, "steps": state}))
+"""
+
+WATCHED = ("pdfkit", "jinja2", "qrcode", "PIL", "passlib", "argon2", "jose", "sqlalchemy", "psycopg2", "fastapi", "pydantic")
+
+
+MARKER = "--- warm-up ---"
+
+
+def run_once() -> tuple[dict, Dict[str, float], Dict[str, float]]:
+    env = {**os.environ, "SWEEPER_ENABLED": "false"}
+    env.setdefault("DATABASE_URL", "sqlite://")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    # "import time: <self us> | <cumulative us> | <module>"; a module is charged
+    # to whichever import loads it first. Lines after MARKER were deferred to warm-up.
+    at_import: Dict[str, float] = {}
+    deferred: Dict[str, float] = {}
+    target = at_import
+    for line in proc.stderr.splitlines():
+        if line.strip() == MARKER:
+            target = deferred
+            continue
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _self_us, cum_us, name = line[len("import time:"):].split("|")
+        target[name.strip()] = int(cum_us) / 1e6
+    return result, at_import, deferred
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--json", help="write results here")
+    args = parser.parse_args(argv)
+
+    imports, warmups = [], []
+    steps: Dict[str, List[float]] = defaultdict(list)
+    modules: Dict[str, List[float]] = defaultdict(list)
+    lazy: Dict[str, List[float]] = defaultdict(list)
+    for _ in range(args.runs):
+        result, cumulative, deferred = run_once()
+        imports.append(result["import_s"])
+        warmups.append(result["warmup_s"])
+        for name, s in result["steps"].items():
+            if s["seconds"] is not None:
+                steps[name].append(s["seconds"])
+        for name, s in cumulative.items():
+            modules[name].append(s)
+        for name, s in deferred.items():
+            lazy[name].append(s)
+
+    med = {name: statistics.median(v) for name, v in modules.items()}
+    lazy_med = {name: statistics.median(v) for name, v in lazy.items()}
+    print(f"import app.main: median {statistics.median(imports) * 1000:.1f} ms over {args.runs} runs")
+    print(f"warm_up():       median {statistics.median(warmups) * 1000:.1f} ms")
+    for name, v in steps.items():
+        print(f"  {name:<10} {statistics.median(v) * 1000:8.1f} ms")
+
+    print("\nheavy dependencies (cumulative import ms):")
+    print(f"  {'module':<12} {'at import':>10} {'deferred':>10}")
+    for name in WATCHED:
+        eager = f"{med[name] * 1000:.1f}" if name in med else "-"
+        deferred = f"{lazy_med[name] * 1000:.1f}" if name in lazy_med else "-"
+        print(f"  {name:<12} {eager:>10} {deferred:>10}")
+
+    print(f"\ntop {args.top} app modules (cumulative ms):")
+    app_modules = sorted(((n, s) for n, s in med.items() if n.startswith("app")), key=lambda x: -x[1])
+    for name, s in app_modules[: args.top]:
+        print(f"  {s * 1000:8.1f}  {name}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "runs": args.runs,
+                "import_ms": statistics.median(imports) * 1000,
+                "warmup_ms": statistics.median(warmups) * 1000,
+                "warmup_steps_ms": {n: statistics.median(v) * 1000 for n, v in steps.items()},
+                "modules_ms": {n: s * 1000 for n, s in sorted(med.items(), key=lambda x: -x[1])},
+                "deferred_modules_ms": {n: s * 1000 for n, s in sorted(lazy_med.items(), key=lambda x: -x[1])},
+            }, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
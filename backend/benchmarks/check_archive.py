@@ -0,0 +1,162 @@
+"""
+Cold-receipt archive against the seeded harness (stub renderer).
+
+    python -m benchmarks.check_archive
+
+Backdates part of a merchant's receipts (plus one created through the API, so
+it carries a render snapshot), renders them into the cache, archives
+everything older than ARCHIVE_AFTER_DAYS and checks:
+  0. with ARCHIVE_ENABLED off and the archive tables missing (migration not
+     run yet), the read endpoints still work;
+  1. the hot table holds only the recent receipts and their cached files are gone;
+  2. /all, /stats, /analytics and /export return the same data as before;
+  3. archived receipts still render through /pdf/{id} and their signed URL,
+     and the snapshot receipt's HTML is byte-identical to before;
+  4. a second run has nothing left to move.
+Exits 1 on the first step that doesn't behave.
+"""
+from __future__ import annotations
+
+import asyncio
+import glob
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+os.environ["ARCHIVE_ENABLED"] = "true"
+
+from benchmarks.harness import Harness  # noqa: E402
+
+OLD, RECENT = 40, 20
+
+
+def check(ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        raise SystemExit(1)
+
+
+async def snapshot_views(client, headers, until: datetime) -> dict:
+    from app.services.receipts import analytics
+
+    # Fresh closed-bucket cache, so the series is aggregated from the tables again.
+    analytics.bucket_cache = analytics.BucketCache(max_users=10, ttl=3600)
+    window = {"interval": "month", "start": (until - timedelta(days=400)).isoformat(), "end": until.isoformat()}
+    views = {}
+    for name, url, params in (
+        ("all", "/api/v1/receipts/all", None),
+        ("stats", "/api/v1/receipts/stats", None),
+        ("analytics", "/api/v1/receipts/analytics", window),
+        ("export", "/api/v1/receipts/export", None),
+    ):
+        r = await client.get(url, params=params, headers=headers)
+        assert r.status_code == 200, (url, r.status_code, r.text)
+        views[name] = r.content
+    return views
+
+
+async def run(harness: Harness) -> None:
+    from sqlalchemy import func, select, text, update
+
+    from app.core.config import settings
+    from app.db.session import SessionLocal
+    from app.models.receipt import Receipt
+    from app.models.receipt_archive import ReceiptArchive
+    from app.services.receipts import pdf_generator
+    from app.services.receipts.archive import archive_receipts
+    from app.services.receipts.signing import sign_receipt
+    from app.services.receipts.snapshot import SNAPSHOT_VERSION
+
+    email = next(iter(harness.tokens))
+    headers = harness.auth(email)
+    ids = harness.receipt_ids[email]
+    old_ids = ids[:OLD]
+    long_ago = datetime.now(timezone.utc) - timedelta(days=200)
+
+    async with harness.client() as client:
+        settings.ARCHIVE_ENABLED = False
+        with SessionLocal() as db:
+            for table in ("receipt_archive", "receipt_archive_totals"):
+                db.execute(text(f"ALTER TABLE {table} RENAME TO {table}_away"))
+            db.commit()
+        harness.replicate()
+        await snapshot_views(client, headers, datetime.now(timezone.utc))
+        r = await client.get(f"/api/v1/receipts/pdf/{ids[-1]}")
+        check(r.status_code == 200, "reads work with the archive off and its tables missing")
+        with SessionLocal() as db:
+            for table in ("receipt_archive", "receipt_archive_totals"):
+                db.execute(text(f"ALTER TABLE {table}_away RENAME TO {table}"))
+            db.commit()
+        harness.replicate()
+        settings.ARCHIVE_ENABLED = True
+
+        r = await client.post(
+            "/api/v1/receipts/",
+            json={"total": "12.34", "transaction_date": (long_ago - timedelta(days=1)).isoformat()},
+            headers=headers,
+        )
+        check(r.status_code == 201, "receipt with a render snapshot created")
+
+        with SessionLocal() as db:
+            for i, rid in enumerate(old_ids):
+                db.execute(
+                    update(Receipt)
+                    .where(Receipt.receipt_id == uuid.UUID(rid))
+                    .values(transaction_date=long_ago + timedelta(minutes=i))
+                )
+            db.commit()
+            snap_id = str(db.execute(
+                select(Receipt.receipt_id).where(Receipt.render_snapshot.isnot(None))
+            ).scalar_one())
+        harness.replicate()
+        archived_ids = old_ids + [snap_id]
+
+        for rid in archived_ids[-5:]:
+            check((await client.get(f"/api/v1/receipts/pdf/{rid}")).status_code == 200, f"render {rid[:8]} before")
+        html_before = (await client.get(f"/api/v1/receipts/pdf/{snap_id}?format=html")).content
+        until = datetime.now(timezone.utc) + timedelta(hours=1)
+        before = await snapshot_views(client, headers, until)
+        cached = lambda rid: glob.glob(os.path.join(pdf_generator.TEMP_DIR, f"{rid}.*"))  # noqa: E731
+        check(all(cached(rid) for rid in archived_ids[-5:]), "archived-to-be receipts cached")
+
+        with SessionLocal() as db:
+            report = archive_receipts(db, older_than_days=90, batch_size=16)
+            hot = db.execute(select(func.count()).select_from(Receipt)).scalar_one()
+            cold = db.execute(select(func.count()).select_from(ReceiptArchive)).scalar_one()
+        harness.replicate()
+        check(
+            report.receipts == OLD + 1 and report.batches == 3 and hot == RECENT and cold == OLD + 1,
+            f"moved {report.receipts} in {report.batches} batches; hot={hot} archive={cold}",
+        )
+        check(not any(cached(rid) for rid in archived_ids), f"cache evicted ({report.cache_files_evicted} files)")
+
+        after = await snapshot_views(client, headers, until)
+        for name in before:
+            check(after[name] == before[name], f"/{name} unchanged")
+
+        r = await client.get(f"/api/v1/receipts/pdf/{old_ids[0]}")
+        check(r.status_code == 200 and r.content.startswith(b"%PDF"), "archived receipt renders via /pdf/{id}")
+        r = await client.get(f"/api/v1/receipts/r/{sign_receipt(snap_id, SNAPSHOT_VERSION)}")
+        check(r.status_code == 200, "archived receipt renders via its signed URL")
+        html_after = (await client.get(f"/api/v1/receipts/pdf/{snap_id}?format=html")).content
+        check(html_after == html_before, "snapshot receipt HTML byte-identical after archiving")
+        r = await client.get(f"/api/v1/receipts/escpos/{snap_id}", headers=headers)
+        check(r.status_code == 200, "archived receipt prints as ESC/POS")
+
+        with SessionLocal() as db:
+            again = archive_receipts(db, older_than_days=90)
+        check(again.receipts == 0, "second run moves nothing")
+
+
+def main() -> int:
+    harness = Harness.create(users=1, receipts_per_user=OLD + RECENT, render_ms=5)
+    try:
+        asyncio.run(run(harness))
+    finally:
+        harness.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
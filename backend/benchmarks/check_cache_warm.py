@@ -0,0 +1,85 @@
+"""
+Startup cache warming against the seeded harness (stub renderer).
+
+    python -m benchmarks.check_cache_warm
+
+Starts the app with CACHE_WARM_ON_STARTUP and checks:
+  1. /health/ready is 200 while warming and reports progress;
+  2. a live scan of a cold receipt during warming costs about one render
+     (the warmer yields instead of queueing renders ahead of it);
+  3. the job finishes with every recent receipt cached, its fills counted as
+     result="warm" (the only misses are the live scan's), and a scan of a
+     warmed receipt is a cache hit.
+Exits 1 on the first step that doesn't behave.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+
+os.environ["CACHE_WARM_ON_STARTUP"] = "true"
+os.environ["CACHE_WARM_RATE_PER_SECOND"] = "0"
+os.environ["CACHE_WARM_MAX_RECEIPTS"] = "40"
+
+from benchmarks.harness import Harness  # noqa: E402
+
+RENDER_MS = 50
+
+
+def check(ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        raise SystemExit(1)
+
+
+async def run(harness: Harness) -> None:
+    from app.core.metrics import CACHE_REQUESTS
+    from app.services.receipts.cache_warmer import cache_warmer
+
+    email = next(iter(harness.tokens))
+    ids = harness.receipt_ids[email]
+    newest, oldest_warmed = ids[-1], ids[-40]
+    async with harness.client() as client:
+        await asyncio.sleep(0.2)
+        r = await client.get("/health/ready")
+        state = r.json()["cache_warm"]
+        check(r.status_code == 200 and state["status"] == "running", f"ready while warming ({state})")
+
+        # The warmer goes newest first; the 40th newest is still cold.
+        t0 = time.perf_counter()
+        r = await client.get(f"/api/v1/receipts/pdf/{oldest_warmed}")
+        elapsed = (time.perf_counter() - t0) * 1000
+        check(r.status_code == 200 and elapsed < 3 * RENDER_MS, f"live scan while warming took {elapsed:.0f} ms")
+
+        for _ in range(200):
+            if cache_warmer.state()["status"] == "done":
+                break
+            await asyncio.sleep(0.05)
+        state = cache_warmer.state()
+        check(
+            state["status"] == "done" and state["rendered"] + state["cached"] == 40 and not state["failed"],
+            f"warming finished ({state})",
+        )
+        misses = [CACHE_REQUESTS.value(cache=c, result="miss") for c in ("receipt_html", "receipt_pdf")]
+        warm = CACHE_REQUESTS.value(cache="receipt_pdf", result="warm")
+        check(misses == [0, 1] and warm >= 39, f"warm fills not counted as misses ({misses} misses, {warm:.0f} warm)")
+        hits = CACHE_REQUESTS.value(cache="receipt_pdf", result="hit")
+        await client.get(f"/api/v1/receipts/pdf/{newest}")
+        check(CACHE_REQUESTS.value(cache="receipt_pdf", result="hit") == hits + 1, "warmed receipt is a cache hit")
+        metrics = (await client.get("/metrics")).text
+        check('qr_cache_warm_receipts{state="pending"} 0.0' in metrics, "progress exported as metrics")
+
+
+def main() -> int:
+    harness = Harness.create(users=1, receipts_per_user=60, render_ms=RENDER_MS)
+    try:
+        asyncio.run(run(harness))
+    finally:
+        harness.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
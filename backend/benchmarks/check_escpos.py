@@ -0,0 +1,226 @@
+"""
+ESC/POS output checks against the seeded harness.
+
+    python -m benchmarks.check_escpos [--update-golden]
+
+First compares encode_receipt() output for a fixed receipt, template (with
+logo) and URL, at 58 mm and 80 mm, byte for byte against the golden files in
+benchmarks/golden/ (escpos_58.bin, escpos_80.bin; the logo fixture is
+escpos_logo.png). After an intentional output change, rerun with
+--update-golden and commit the new files.
+
+Then walks the byte stream returned by GET /receipts/escpos/{id} command by command
+(so a malformed length prefix fails loudly) and checks:
+  1. init / code page / cut framing and the business name + total text;
+  2. a native QR command carrying the signed receipt URL;
+  3. a GS v 0 logo raster no wider than the paper, rendered once per template
+     revision and re-rendered after the template changes;
+  4. another merchant's receipt is a 404.
+Exits 1 on the first step that doesn't behave.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import io
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+from typing import List, Tuple
+
+from benchmarks.harness import Harness
+
+
+def check(ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        raise SystemExit(1)
+
+
+def parse(data: bytes) -> List[Tuple[str, bytes]]:
+    """Split a stream into (command, argument bytes) and ("text", line) items."""
+    items: List[Tuple[str, bytes]] = []
+    fixed = {b"\x1b@": 0, b"\x1bt": 1, b"\x1ba": 1, b"\x1bE": 1, b"\x1bd": 1, b"\x1d!": 1, b"\x1dV": 2}
+    i = 0
+    text = bytearray()
+    while i < len(data):
+        op = data[i : i + 2]
+        if op in fixed:
+            n = fixed[op]
+            items.append((op.hex(), data[i + 2 : i + 2 + n]))
+            i += 2 + n
+        elif data[i : i + 3] == b"\x1d(k":
+            n = int.from_bytes(data[i + 3 : i + 5], "little")
+            items.append(("qr", data[i + 5 : i + 5 + n]))
+            i += 5 + n
+        elif data[i : i + 4] == b"\x1dv0\x00":
+            w = int.from_bytes(data[i + 4 : i + 6], "little")
+            h = int.from_bytes(data[i + 6 : i + 8], "little")
+            items.append(("raster", data[i + 4 : i + 8]))
+            i += 8 + w * h
+        elif data[i] < 0x20 and data[i] != 0x0A:
+            raise ValueError(f"unknown command {data[i:i + 4].hex()} at {i}")
+        else:
+            if data[i] == 0x0A:
+                items.append(("text", bytes(text)))
+                text.clear()
+            else:
+                text.append(data[i])
+            i += 1
+    return items
+
+
+def logo_data_url() -> str:
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGBA", (800, 300), (0, 0, 0, 0))
+    ImageDraw.Draw(img).ellipse((50, 20, 750, 280), fill=(20, 20, 20, 255))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode()
+
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden")
+GOLDEN_LOGO = os.path.join(GOLDEN_DIR, "escpos_logo.png")
+GOLDEN_URL = "https://receipts.example.com/api/v1/receipts/r/s0.Z29sZGVuLXJlY2VpcHQtdG9rZW4"
+
+
+def golden_logo() -> bytes:
+    """A logo with a transparent border and a gradient, so padding and dithering are both exercised."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGBA", (640, 240), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    for x in range(40, 600):
+        shade = 255 * (x - 40) // 560
+        draw.line((x, 30, x, 210), fill=(shade, shade, shade, 255))
+    draw.ellipse((250, 60, 390, 180), fill=(0, 0, 0, 255))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def golden_output(paper: int, logo: bytes) -> bytes:
+    from app.services.receipts.escpos import encode_receipt
+
+    receipt = {
+        "receipt_id": "3f2b8c1e-5d4a-4e6f-9a7b-0c1d2e3f4a5b",
+        "transaction_date": datetime(2025, 3, 14, 15, 9, 26),
+        "total": Decimal("1234.50"),
+        "company_name": "Golden Bakery Ltd.",
+    }
+    template = SimpleNamespace(
+        id=f"golden-{paper}",  # own raster cache key
+        updated_at=None,
+        logo="data:image/png;base64," + base64.b64encode(logo).decode(),
+        business_name="Golden Bakery & Café (Main Street)",
+        gst_hst_number="123456789RT0001",
+        contact_phone="+1 416 555 0199",
+        contact_email="hello@goldenbakery.example.com",
+        website_url="https://goldenbakery.example.com/a/very/long/path/that/wraps",
+    )
+    return encode_receipt(receipt, template, GOLDEN_URL, paper_mm=paper)
+
+
+def check_golden(update: bool) -> None:
+    if update:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        with open(GOLDEN_LOGO, "wb") as f:
+            f.write(golden_logo())
+    with open(GOLDEN_LOGO, "rb") as f:
+        logo = f.read()
+    for paper in (58, 80):
+        path = os.path.join(GOLDEN_DIR, f"escpos_{paper}.bin")
+        data = golden_output(paper, logo)
+        if update:
+            with open(path, "wb") as f:
+                f.write(data)
+            print(f"wrote {path} ({len(data)} bytes)")
+            continue
+        with open(path, "rb") as f:
+            expected = f.read()
+        at = next((i for i, (a, b) in enumerate(zip(data, expected)) if a != b), min(len(data), len(expected)))
+        check(
+            data == expected,
+            f"{paper} mm: output matches {os.path.basename(path)}"
+            + ("" if data == expected else f" (first difference at byte {at}; {len(data)} vs {len(expected)} bytes)"),
+        )
+        ops = [op for op, _ in parse(data)]  # the golden stream is itself well-formed
+        check("raster" in ops and "qr" in ops, f"{paper} mm: golden stream carries the logo raster and QR")
+
+
+async def run(harness: Harness) -> None:
+    from app.core.metrics import CACHE_REQUESTS
+    from app.db.session import SessionLocal
+    from app.models.receipt_template import ReceiptTemplate
+    from app.services.receipts.signing import verify_receipt_token
+
+    first, second = list(harness.tokens)
+    rid = harness.receipt_ids[first][-1]
+
+    def set_logo(updated_at: datetime) -> None:
+        with SessionLocal() as db:
+            tpl = db.query(ReceiptTemplate).filter(ReceiptTemplate.user_id == 1).one()
+            tpl.logo = logo_data_url()
+            tpl.updated_at = updated_at
+            db.commit()
+
+    def misses() -> float:
+        return CACHE_REQUESTS.value(cache="escpos_logo", result="miss")
+
+    set_logo(datetime.now(timezone.utc))
+    async with harness.client() as client:
+        for paper, dots in ((58, 384), (80, 576)):
+            r = await client.get(f"/api/v1/receipts/escpos/{rid}?paper={paper}", headers=harness.auth(first))
+            check(r.status_code == 200, f"{paper} mm: 200")
+            items = parse(r.content)
+            ops = [op for op, _ in items]
+            lines = [arg.decode("cp437") for op, arg in items if op == "text"]
+            check(ops[0] == "1b40" and ops[-1] == "1d56", f"{paper} mm: starts with ESC @, ends with a cut")
+            check("Merchant 1" in lines and any(l.startswith("TOTAL") for l in lines), f"{paper} mm: name and total printed")
+            qr = [arg for op, arg in items if op == "qr"]
+            urls = [arg[3:].decode() for arg in qr if arg.startswith(b"1P0")]
+            signed = [verify_receipt_token(url.rsplit("/r/", 1)[-1]) for url in urls]
+            check(
+                len(signed) == 1 and signed[0] is not None and str(signed[0].receipt_id) == rid,
+                f"{paper} mm: QR stores the signed receipt URL",
+            )
+            raster = [arg for op, arg in items if op == "raster"]
+            check(
+                len(raster) == 1 and int.from_bytes(raster[0][:2], "little") * 8 <= dots,
+                f"{paper} mm: logo raster fits {dots} dots",
+            )
+
+        before = misses()
+        await client.get(f"/api/v1/receipts/escpos/{rid}", headers=harness.auth(first))
+        check(misses() == before, "logo raster reused for the same template revision")
+
+        set_logo(datetime.now(timezone.utc) + timedelta(seconds=1))
+        await client.get(f"/api/v1/receipts/escpos/{rid}", headers=harness.auth(first))
+        check(misses() == before + 1, "template update re-renders the raster")
+
+        r = await client.get(f"/api/v1/receipts/escpos/{rid}", headers=harness.auth(second))
+        check(r.status_code == 404, "other merchants' receipts are not printable")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--update-golden", action="store_true", help="rewrite benchmarks/golden/escpos_* from current output")
+    args = parser.parse_args()
+
+    check_golden(args.update_golden)
+    if args.update_golden:
+        return 0
+    harness = Harness.create(users=2, receipts_per_user=3, render_ms=1)
+    try:
+        asyncio.run(run(harness))
+    finally:
+        harness.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Read/write routing against two SQLite files standing in for primary + replica.
+
+    python -m benchmarks.check_read_routing
+
+Replication is manual (Harness.replicate), so replica lag is whatever we make
+it. Walks through:
+  1. a write followed by an immediate read is served by the primary (sticky);
+  2. once the sticky window has passed, reads go to the lagging replica;
+  3. a PDF lookup for a receipt the replica doesn't have yet falls back to
+     the primary;
+  4. after replication the replica serves the new row.
+Exits 1 on the first step that doesn't behave.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+
+os.environ["READ_STICKY_SECONDS"] = "0.3"
+os.environ["REPLICA_MISS_FALLBACK"] = "true"
+
+from benchmarks.harness import Harness  # noqa: E402
+
+
+def check(ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        raise SystemExit(1)
+
+
+async def run(harness: Harness) -> None:
+    from app.core.metrics import DB_SESSIONS
+
+    email = next(iter(harness.tokens))
+    auth = harness.auth(email)
+    seeded = len(harness.receipt_ids[email])
+
+    async with harness.client() as client:
+        r = await client.get("/api/v1/receipts/all", headers=auth)
+        check(len(r.json()) == seeded and DB_SESSIONS.value(target="replica") == 1, "reads go to the replica")
+
+        r = await client.post("/api/v1/receipts/", json={"total": "4.20"}, headers=auth)
+        check(r.status_code == 201, "create on primary")
+        r = await client.get("/api/v1/receipts/all", headers=auth)
+        check(len(r.json()) == seeded + 1, "read-your-writes right after create (sticky to primary)")
+
+        time.sleep(0.35)
+        r = await client.get("/api/v1/receipts/all", headers=auth)
+        rows = r.json()
+        check(len(rows) == seeded, "after the sticky window the lagging replica is read")
+
+        # The new receipt only exists on the primary.
+        from app.db.session import SessionLocal
+        from app.models.receipt import Receipt
+
+        with SessionLocal() as db:
+            new_id = db.query(Receipt.receipt_id).order_by(Receipt.id.desc()).first()[0]
+        fallbacks = DB_SESSIONS.value(target="fallback")
+        r = await client.get(f"/api/v1/receipts/pdf/{new_id}")
+        check(
+            r.status_code == 200 and DB_SESSIONS.value(target="fallback") == fallbacks + 1,
+            "PDF lookup missing on the replica falls back to the primary",
+        )
+
+        harness.replicate()
+        r = await client.get("/api/v1/receipts/all", headers=auth)
+        check(len(r.json()) == seeded + 1, "replica serves the row once replicated")
+
+
+def main() -> int:
+    harness = Harness.create(users=1, receipts_per_user=3, replicas=1, render_ms=1)
+    try:
+        asyncio.run(run(harness))
+    finally:
+        harness.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
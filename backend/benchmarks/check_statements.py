@@ -0,0 +1,295 @@
+"""
+Monthly statement rendering against the seeded harness.
+
+    python -m benchmarks.check_statements
+
+Seeds a month of receipts and builds its statement. Uses the real wkhtmltopdf
+when it is installed; otherwise a stand-in renderer that writes a genuine
+PDF per run (one text page per input file, fonts and media box inherited
+from the page tree, compressed content) so the merge works on real files.
+Checks that:
+  1. no renderer run gets more than STATEMENT_PAGES_PER_RENDER page files;
+  2. the merged statement parses (strictly), has every part's pages, in order,
+     with the totals summary last;
+  3. merge memory is bounded by one part: beyond it, only a few bytes of xref
+     bookkeeping per page;
+  4. a batch shed by admission control is retried, not the job failed;
+  5. through the API, with a second StatementJobs standing in for another
+     worker: the job is visible there, a repeat submit (done or live) doesn't
+     start a duplicate, a job whose worker died is restarted and the old run
+     gives up;
+  6. the sweeper leaves a live statement's files alone even when evicting
+     everything else, and once the TTL has passed the job reads "expired"
+     (410 for the PDF) and a new POST builds it again.
+Exits 1 on the first step that doesn't behave.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import List
+
+os.environ["STATEMENT_CHUNK_SIZE"] = "200"
+os.environ["STATEMENT_PAGES_PER_RENDER"] = "4"
+
+from benchmarks.harness import Harness  # noqa: E402
+
+MONTH, RECEIPTS = "2025-03", 3000
+runs: List[int] = []
+
+
+def check(ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        raise SystemExit(1)
+
+
+def text_pdf(pages: List[str]) -> bytes:
+    """A minimal but real PDF: one Helvetica text line per page."""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>", 3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    for i, line in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        body = zlib.compress(f"BT /F1 12 Tf 20 400 Td ({line}) Tj ET".encode("latin-1"))
+        objects[page_id] = f"<< /Type /Page /Parent 2 0 R /Contents {content_id} 0 R >>".encode()
+        objects[content_id] = f"<< /Length {len(body)} /Filter /FlateDecode >>\nstream\n".encode() + body + b"\nendstream"
+        kids.append(f"{page_id} 0 R")
+    objects[2] = (
+        f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} "
+        f"/Resources << /Font << /F1 3 0 R >> >> /MediaBox [0 0 420 595] >>"
+    ).encode()
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n".encode() + objects[obj_id] + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for obj_id in sorted(objects):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def install_text_renderer() -> None:
+    from app.services.receipts import pdf_generator
+
+    def from_file(inputs, output_path, options=None, configuration=None):
+        runs.append(len(inputs))
+        lines = []
+        for path in inputs:
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+            span = re.search(r"Receipts (\d+)–(\d+)", html)
+            lines.append(f"rows {span.group(1)}-{span.group(2)}" if span else "summary")
+        with open(output_path, "wb") as f:
+            f.write(text_pdf(lines))
+        return True
+
+    pdf_generator.from_file = from_file
+
+
+def seed(user_id: int) -> None:
+    from sqlalchemy import insert
+
+    from app.db.session import get_engine
+    from app.models.receipt import Receipt
+
+    start = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    with get_engine().begin() as conn:
+        conn.execute(insert(Receipt), [
+            {
+                "receipt_id": uuid.uuid4(),
+                "user_id": str(user_id),
+                "transaction_date": start + timedelta(minutes=10 * i),
+                "total": Decimal(i % 500) / 100,
+            }
+            for i in range(RECEIPTS)
+        ])
+
+
+def check_statement(real: bool) -> None:
+    from pypdf import PdfReader
+
+    from app.core.config import settings
+    from app.services.receipts.statements import StatementJob, build_statement
+
+    job = StatementJob(user="merchant1@bench.local", user_id=1, month=MONTH, tz="UTC")
+    path = build_statement(job)
+    files = -(-RECEIPTS // settings.STATEMENT_CHUNK_SIZE) + 1  # chunks + summary
+    if not real:
+        check(
+            max(runs) <= settings.STATEMENT_PAGES_PER_RENDER and sum(runs) == files,
+            f"{len(runs)} renderer runs of at most {settings.STATEMENT_PAGES_PER_RENDER} page files ({runs})",
+        )
+    reader = PdfReader(path, strict=True)
+    text = [page.extract_text().strip() for page in reader.pages]
+    if real:
+        check(len(reader.pages) >= files and "Total" in text[-1], f"statement has {len(reader.pages)} pages")
+        return
+    expected = [
+        f"rows {lo + 1}-{min(lo + settings.STATEMENT_CHUNK_SIZE, RECEIPTS)}"
+        for lo in range(0, RECEIPTS, settings.STATEMENT_CHUNK_SIZE)
+    ] + ["summary"]
+    check(text == expected, f"merged statement: {len(text)} pages in order, summary last")
+    check(all(page.mediabox.width == 420 for page in reader.pages), "inherited media box and fonts carried over")
+
+
+def check_shed_retry() -> None:
+    from app.core.config import settings
+    from app.services.receipts import pdf_generator
+    from app.services.receipts.admission import RenderOverloaded
+    from app.services.receipts.statements import StatementJob, build_statement
+
+    render, shed = pdf_generator.render_pdf_files, [2]
+
+    def overloaded_twice(*args, **kwargs):
+        if shed[0]:
+            shed[0] -= 1
+            raise RenderOverloaded(1, "deadline")
+        return render(*args, **kwargs)
+
+    timeout, settings.RENDER_QUEUE_TIMEOUT_SECONDS = settings.RENDER_QUEUE_TIMEOUT_SECONDS, 0.01
+    pdf_generator.render_pdf_files = overloaded_twice
+    try:
+        job = StatementJob(user="merchant1@bench.local", user_id=1, month=MONTH, tz="UTC")
+        if os.path.exists(job.path):
+            os.remove(job.path)  # left by the previous step
+        build_statement(job)
+        check(shed[0] == 0 and os.path.exists(job.path), "statement survives two shed batches (retried)")
+    finally:
+        pdf_generator.render_pdf_files = render
+        settings.RENDER_QUEUE_TIMEOUT_SECONDS = timeout
+
+
+async def wait_done(client, headers, job_id: str) -> dict:
+    for _ in range(500):
+        body = (await client.get(f"/api/v1/receipts/statements/{job_id}", headers=headers)).json()
+        if body["status"] not in ("queued", "running", "rendering"):
+            return body
+        await asyncio.sleep(0.02)
+    raise SystemExit("FAIL statement job never finished")
+
+
+async def check_jobs(harness: Harness) -> None:
+    from app.core.config import settings
+    from app.services.receipts.statements import StatementJobs, Superseded, load
+    from app.services.receipts.sweeper import SweepReport, sweep_temp_files
+
+    email = next(iter(harness.tokens))
+    headers = harness.auth(email)
+    other = StatementJobs()  # another worker: same temporary_files/, its own memory and pool
+    async with harness.client() as client:
+        r = await client.post("/api/v1/receipts/statements", json={"month": MONTH}, headers=headers)
+        job_id = r.json()["id"]
+        body = await wait_done(client, headers, job_id)
+        r = await client.get(f"/api/v1/receipts/statements/{job_id}/pdf", headers=headers)
+        check(body["status"] == "done" and r.content.startswith(b"%PDF"), "statement built through the API")
+
+        seen = other.get(job_id, email)
+        check(seen is not None and seen.status == "done", "other worker sees the finished job")
+        before, done_run = len(runs), load(job_id).run
+        again = other.submit(email, 1, MONTH, "UTC")
+        check(
+            again.id == job_id and again.run == done_run and len(runs) == before,
+            "repeat submit on the other worker returns the finished job",
+        )
+
+        # A live run on some worker: no duplicate. Then that worker dies: restart.
+        state = load(job_id)
+        state.status, state.run = "running", uuid.uuid4().hex
+        state.write()
+        check(other.submit(email, 1, MONTH, "UTC").run == state.run, "repeat submit while running joins that run")
+        state.updated = time.time() - settings.STATEMENT_JOB_STALE_SECONDS - 1
+        with open(state.state_path, "w") as f:
+            json.dump(vars(state), f)
+        check(other.get(job_id, email).status == "failed", "job with a dead worker reads failed")
+        restarted = other.submit(email, 1, MONTH, "UTC")
+        try:
+            state.save()
+            superseded = False
+        except Superseded:
+            superseded = True
+        check(restarted.run != state.run and superseded, "stale job restarted; the old run gives up")
+        check((await wait_done(client, headers, job_id))["status"] == "done", "restarted job finishes")
+
+        pdf = load(job_id).path
+        cached = os.path.join(os.path.dirname(pdf), f"{uuid.uuid4()}.pdf")
+        with open(cached, "wb") as f:
+            f.write(b"%PDF-1.4 cached receipt")
+        sweep_temp_files(SweepReport(dry_run=False), max_bytes=0, max_age_seconds=0)
+        check(
+            not os.path.exists(cached) and os.path.exists(pdf) and load(job_id) is not None,
+            "sweep evicts cached receipts but keeps the live statement and its state",
+        )
+
+        old = time.time() - settings.STATEMENT_JOB_TTL_SECONDS - 1
+        os.utime(pdf, (old, old))
+        sweep_temp_files(SweepReport(dry_run=False), max_bytes=0, max_age_seconds=3600)
+        body = (await client.get(f"/api/v1/receipts/statements/{job_id}", headers=headers)).json()
+        r = await client.get(f"/api/v1/receipts/statements/{job_id}/pdf", headers=headers)
+        check(
+            not os.path.exists(pdf) and body["status"] == "expired" and r.status_code == 410,
+            "statement past its TTL swept; job reads expired (410 for the PDF)",
+        )
+        await client.post("/api/v1/receipts/statements", json={"month": MONTH}, headers=headers)
+        body = await wait_done(client, headers, job_id)
+        check(body["status"] == "done" and os.path.exists(pdf), "expired statement rebuilt on a new POST")
+    other.shutdown()
+
+
+def merge_peak(parts: int, workdir: str) -> int:
+    from app.services.receipts.pdf_merge import concat_pdfs
+
+    paths = []
+    for p in range(parts):
+        path = os.path.join(workdir, f"m{p}.pdf")
+        with open(path, "wb") as f:
+            f.write(text_pdf([f"part {p} page {i} " + "x" * 200 for i in range(20)]))
+        paths.append(path)
+    tracemalloc.start()
+    concat_pdfs(paths, os.path.join(workdir, f"merged_{parts}.pdf"))
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> int:
+    real = shutil.which("wkhtmltopdf") is not None
+    harness = Harness.create(users=1, receipts_per_user=0, renderer="real" if real else "stub", render_ms=1)
+    workdir = tempfile.mkdtemp(prefix="qr-merge-")
+    try:
+        if not real:
+            install_text_renderer()
+        print(f"renderer: {'wkhtmltopdf' if real else 'text PDF stand-in'}")
+        seed(1)
+        check_statement(real)
+        check_shed_retry()
+        asyncio.run(check_jobs(harness))
+        merge_peak(1, workdir)  # imports
+        small, large = merge_peak(4, workdir), merge_peak(256, workdir)
+        per_page = (large - small) / ((256 - 4) * 20)
+        check(
+            per_page < 64,
+            f"merge peak memory: 80 pages {small / 1024:.0f} KiB, 5120 pages {large / 1024:.0f} KiB "
+            f"({per_page:.0f} B per extra page)",
+        )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+        harness.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Logo sweep against the seeded harness.
+
+    python -m benchmarks.check_sweeper
+
+Drops a few logos into app/static/logo/ next to the checkout's own, points the
+merchant's template at one of them and runs run_sweep(). Checks that:
+  1. the logo the template points at survives;
+  2. files shipped with the checkout (and anything not named like an upload) survive;
+  3. older uploads the template has replaced survive while a receipt's render
+     snapshot (hot or archived) still shows them;
+  4. an older upload the template has replaced and nothing shows is deleted.
+The files it creates are removed afterwards. Exits 1 on the first failure.
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, List
+
+os.environ["ARCHIVE_ENABLED"] = "true"
+
+from benchmarks.harness import Harness  # noqa: E402
+
+DAY = 24 * 3600
+
+
+def check(ok: bool, label: str) -> None:
+    print(f"{'ok  ' if ok else 'FAIL'} {label}")
+    if not ok:
+        raise SystemExit(1)
+
+
+def tracked_logos() -> List[str]:
+    out = subprocess.run(
+        ["git", "ls-files", "app/static/logo"], capture_output=True, text=True, check=False
+    ).stdout
+    return [line for line in out.splitlines() if line]
+
+
+def write_logo(name: str, age_days: float) -> str:
+    from app.services.receipts.sweeper import LOGO_DIR
+
+    LOGO_DIR.mkdir(parents=True, exist_ok=True)
+    path = str(LOGO_DIR / name)
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+    when = time.time() - age_days * DAY
+    os.utime(path, (when, when))
+    return path
+
+
+def set_template_logo(user_id: int, name: str) -> None:
+    from sqlalchemy import update
+
+    from app.db.session import SessionLocal
+    from app.models.receipt_template import ReceiptTemplate
+
+    with SessionLocal() as db:
+        db.execute(
+            update(ReceiptTemplate)
+            .where(ReceiptTemplate.user_id == user_id)
+            .values(logo=f"http://testserver/static/logo/{name}")
+        )
+        db.commit()
+
+
+def show_in_snapshots(hot_logo: str, archived_logo: str) -> None:
+    """One receipt whose snapshot shows `hot_logo`, one archived receipt showing `archived_logo`."""
+    from app.db.session import SessionLocal
+    from app.models.receipt import Receipt
+    from app.models.receipt_archive import ReceiptArchive
+
+    when = datetime.now(timezone.utc) - timedelta(days=200)
+    with SessionLocal() as db:
+        db.add(Receipt(
+            receipt_id=uuid.uuid4(), user_id="1", transaction_date=when, total=Decimal("1.00"),
+            render_snapshot={"v": 1, "logo": f"http://testserver/static/logo/{hot_logo}"},
+        ))
+        db.add(ReceiptArchive(
+            receipt_id=uuid.uuid4(), user_id="1", transaction_date=when, total=Decimal("1.00"),
+            logo=f"http://testserver/static/logo/{archived_logo}", payload=b"",
+        ))
+        db.commit()
+
+
+def sweep():
+    from app.db.session import SessionLocal
+    from app.services.receipts.sweeper import run_sweep
+
+    with SessionLocal() as db:
+        return run_sweep(db)
+
+
+def run(created: Dict[str, str]) -> None:
+    def upload(tag: str, age_days: float) -> str:
+        name = f"user_1_{uuid.uuid4().hex}.png"
+        created[tag] = write_logo(name, age_days)
+        return name
+
+    tracked = tracked_logos()
+    in_receipt = upload("in_receipt", age_days=20)
+    in_archive = upload("in_archive", age_days=15)
+    upload("replaced", age_days=10)
+    current = upload("current", age_days=5)
+    created["foreign"] = write_logo(f"brand-{uuid.uuid4().hex[:8]}.png", age_days=30)
+    show_in_snapshots(in_receipt, in_archive)
+    set_template_logo(1, current)
+
+    report = sweep()
+    check(os.path.exists(created["current"]), "referenced logo survives")
+    check(all(os.path.exists(p) for p in tracked), f"tracked logos survive ({len(tracked)})")
+    check(os.path.exists(created["foreign"]), "file not named like an upload survives")
+    check(os.path.exists(created["in_receipt"]), "replaced logo a receipt snapshot shows survives")
+    check(os.path.exists(created["in_archive"]), "replaced logo an archived snapshot shows survives")
+    check(not os.path.exists(created["replaced"]), f"replaced upload deleted ({report.files_deleted} files)")
+
+
+def main() -> int:
+    harness = Harness.create(users=1, receipts_per_user=1, render_ms=1)
+    created: Dict[str, str] = {}
+    try:
+        run(created)
+    finally:
+        for path in created.values():
+            if os.path.exists(path):
+                os.remove(path)
+        harness.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Boots the FastAPI app against a seeded SQLite stand-in.
+
+    harness = Harness.create(users=2, receipts_per_user=5000, renderer="stub")
+    async with harness.client() as client:
+        ...
+
+`renderer="stub"` replaces wkhtmltopdf with a fixed one-page PDF returned after
+`render_ms` (per input file for multi-file renders); `renderer="real"` keeps
+pdfkit (wkhtmltopdf must be installed).
+
+`replicas=N` adds N more SQLite files as DATABASE_REPLICA_URLS. They are copies
+of the seeded primary; call harness.replicate() to "ship" later writes to them.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import AsyncIterator, Dict, List
+
+import benchmarks  # noqa: F401  (env defaults + SQLite UUID DDL)
+
+STUB_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 226 400]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+def install_stub_renderer(render_ms: float) -> None:
+    from app.services.receipts import pdf_generator
+
+    def from_string(html, *args, **kwargs):
+        time.sleep(render_ms / 1000)
+        return STUB_PDF
+
+    def from_file(inputs, output_path, *args, **kwargs):
+        time.sleep(render_ms / 1000 * len(inputs))
+        with open(output_path, "wb") as f:
+            f.write(STUB_PDF)
+
+    pdf_generator.from_string = from_string
+    pdf_generator.from_file = from_file
+
+
+@dataclass
+class Harness:
+    workdir: str
+    replica_paths: List[str] = field(default_factory=list)
+    tokens: Dict[str, str] = field(default_factory=dict)  # email -> bearer token
+    receipt_ids: Dict[str, List[str]] = field(default_factory=dict)  # email -> receipt UUIDs
+
+    @classmethod
+    def create(
+        cls,
+        users: int = 2,
+        receipts_per_user: int = 1000,
+        renderer: str = "stub",
+        render_ms: float = 50.0,
+        replicas: int = 0,
+    ) -> "Harness":
+        workdir = tempfile.mkdtemp(prefix="qr-bench-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        replica_paths = [os.path.join(workdir, f"replica{i}.db") for i in range(1, replicas + 1)]
+        os.environ["DATABASE_REPLICA_URLS"] = json.dumps([f"sqlite:///{p}" for p in replica_paths])
+
+        from app.db.base import Base
+        from app.db.session import get_engine
+        from app.models.receipt import Receipt
+        from app.models.receipt_archive import ReceiptArchive  # noqa: F401  (cold tier tables)
+        from app.models.receipt_template import ReceiptTemplate
+        from app.models.user import User
+        from app.services.utils import create_access_token
+
+        from app.services.receipts import pdf_generator, sweeper
+
+        # Rendered artifacts go to the scratch dir, not the checkout's temporary_files/
+        # (and the sweeper sweeps that one).
+        pdf_generator.TEMP_DIR = sweeper.TEMP_DIR = os.path.join(workdir, "temporary_files")
+        os.makedirs(pdf_generator.TEMP_DIR, exist_ok=True)
+
+        if renderer == "stub":
+            install_stub_renderer(render_ms)
+        elif renderer != "real":
+            raise ValueError(f"unknown renderer {renderer!r}")
+
+        engine = get_engine()
+        Base.metadata.create_all(engine)
+        harness = cls(workdir=workdir, replica_paths=replica_paths)
+        start = datetime.now(timezone.utc) - timedelta(minutes=receipts_per_user)
+
+        with engine.begin() as conn:
+            for u in range(1, users + 1):
+                email = f"merchant{u}@bench.local"
+                conn.execute(User.__table__.insert(), [{
+                    "id": u, "email": email, "hashed_password": "x", "company_name": f"Merchant {u}",
+                }])
+                conn.execute(ReceiptTemplate.__table__.insert(), [{
+                    "user_id": u, "gst_hst_number": "123456789", "business_name": f"Merchant {u}",
+                    "contact_email": email,
+                }])
+                ids = [uuid.uuid4() for _ in range(receipts_per_user)]
+                if ids:
+                    conn.execute(Receipt.__table__.insert(), [
+                        {
+                            "receipt_id": rid,
+                            "user_id": str(u),
+                            "transaction_date": start + timedelta(minutes=i),
+                            "total": Decimal(i % 10000) / 100,
+                        }
+                        for i, rid in enumerate(ids)
+                    ])
+                harness.tokens[email] = create_access_token({"sub": email, "uid": u})
+                harness.receipt_ids[email] = [str(r) for r in ids]
+        harness.replicate()
+        return harness
+
+    def replicate(self) -> None:
+        """Bring every replica file up to date with the primary."""
+        primary = sqlite3.connect(os.path.join(self.workdir, "bench.db"))
+        try:
+            for path in self.replica_paths:
+                replica = sqlite3.connect(path)
+                try:
+                    primary.backup(replica)
+                finally:
+                    replica.close()
+        finally:
+            primary.close()
+
+    def auth(self, email: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.tokens[email]}"}
+
+    @asynccontextmanager
+    async def client(self) -> AsyncIterator["httpx.AsyncClient"]:
+        import httpx
+
+        from app.main import app
+
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                yield client
+
+    def close(self) -> None:
+        from app.db.session import get_engine, get_read_engines
+
+        for engine in [get_engine(), *get_read_engines()]:
+            engine.dispose()
+        shutil.rmtree(self.workdir, ignore_errors=True)
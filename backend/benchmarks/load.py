@@ -0,0 +1,235 @@
+"""
+Offline load benchmark for the receipt endpoints.
+
+    python -m benchmarks.load --concurrency 8 --requests 200 --receipts 5000 \
+        --out benchmarks/results/latest.json --baseline benchmarks/results/baseline.json
+
+Scenarios (select with --only):
+  create_receipt   POST /api/v1/receipts/
+  get_pdf_cold     GET  /api/v1/receipts/pdf/{id}   every request renders
+  get_pdf_hot      GET  /api/v1/receipts/pdf/{id}   served from the PDF cache
+  get_user_stats   GET  /api/v1/receipts/stats
+  get_receipts     GET  /api/v1/receipts/all
+  generate_qr      generate_qr() micro-benchmark (no HTTP)
+
+Results (throughput + p50/p95/p99 latency per scenario) are written as JSON.
+With --baseline, each scenario is compared to the stored run and regressions
+beyond --threshold are reported (exit code 1 with --fail-on-regression).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from benchmarks.harness import Harness
+
+SCENARIOS = ("create_receipt", "get_pdf_cold", "get_pdf_hot", "get_user_stats", "get_receipts", "generate_qr")
+# Lower is better for latencies, higher is better for throughput.
+COMPARED = {"throughput_rps": +1, "p50_ms": -1, "p95_ms": -1, "p99_ms": -1}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(latencies: List[float], errors: int, wall: float) -> Dict[str, float]:
+    ms = sorted(x * 1000 for x in latencies)
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "mean_ms": round(statistics.fmean(ms), 3) if ms else 0.0,
+        "p50_ms": round(percentile(ms, 50), 3),
+        "p95_ms": round(percentile(ms, 95), 3),
+        "p99_ms": round(percentile(ms, 99), 3),
+    }
+
+
+async def drive(call: Callable[[int], Awaitable[bool]], total: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker() -> None:
+        nonlocal errors
+        while (i := next(counter)) < total:
+            t0 = time.perf_counter()
+            ok = await call(i)
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_http(harness: Harness, scenarios: List[str], total: int, concurrency: int) -> Dict[str, dict]:
+    emails = list(harness.tokens)
+    results: Dict[str, dict] = {}
+
+    async with harness.client() as client:
+
+        def user(i: int) -> str:
+            return emails[i % len(emails)]
+
+        async def create_receipt(i: int) -> bool:
+            r = await client.post("/api/v1/receipts/", json={"total": "12.34"}, headers=harness.auth(user(i)))
+            return r.status_code == 201
+
+        cold_ids = iter(rid for ids in zip(*harness.receipt_ids.values()) for rid in ids)
+        hot_id = harness.receipt_ids[emails[0]][0]
+
+        async def get_pdf_cold(i: int) -> bool:
+            r = await client.get(f"/api/v1/receipts/pdf/{next(cold_ids)}")
+            return r.status_code == 200
+
+        async def get_pdf_hot(i: int) -> bool:
+            r = await client.get(f"/api/v1/receipts/pdf/{hot_id}")
+            return r.status_code == 200
+
+        async def get_user_stats(i: int) -> bool:
+            r = await client.get("/api/v1/receipts/stats", headers=harness.auth(user(i)))
+            return r.status_code == 200
+
+        async def get_receipts(i: int) -> bool:
+            r = await client.get("/api/v1/receipts/all", headers=harness.auth(user(i)))
+            return r.status_code == 200
+
+        calls = {
+            "create_receipt": create_receipt,
+            "get_pdf_cold": get_pdf_cold,
+            "get_pdf_hot": get_pdf_hot,
+            "get_user_stats": get_user_stats,
+            "get_receipts": get_receipts,
+        }
+        if "get_pdf_hot" in scenarios:
+            await get_pdf_hot(-1)  # prime the cache entry
+        for name in scenarios:
+            if name in calls:
+                results[name] = await drive(calls[name], total, concurrency)
+                print(_format(name, results[name]), flush=True)
+    return results
+
+
+def run_generate_qr(total: int) -> Dict[str, float]:
+    from app.services.receipts.qr_code import generate_qr
+
+    latencies = []
+    start = time.perf_counter()
+    for i in range(total):
+        t0 = time.perf_counter()
+        generate_qr(f"http://bench/api/v1/receipts/pdf/{i:032x}")
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, 0, time.perf_counter() - start)
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    regressions = []
+    print(f"\n{'scenario':<16}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric, direction in COMPARED.items():
+            b, c = base.get(metric), cur.get(metric)
+            if not b or c is None:
+                continue
+            change = (c - b) / b
+            flag = ""
+            if change * direction < -threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{name}.{metric}")
+            print(f"{name:<16}{metric:<16}{b:>12.2f}{c:>12.2f}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def _format(name: str, r: Dict[str, float]) -> str:
+    return (
+        f"{name:<16} {r['throughput_rps']:>9.1f} req/s  p50 {r['p50_ms']:>8.2f} ms  "
+        f"p95 {r['p95_ms']:>8.2f} ms  p99 {r['p99_ms']:>8.2f} ms  errors {r['errors']}"
+    )
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--users", type=int, default=2)
+    parser.add_argument("--receipts", type=int, default=1000, help="seeded receipts per user")
+    parser.add_argument("--renderer", choices=("stub", "real"), default="stub")
+    parser.add_argument("--render-ms", type=float, default=50.0, help="stub renderer latency")
+    parser.add_argument("--only", nargs="*", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--out", default="benchmarks/results/latest.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args(argv)
+
+    if "get_pdf_cold" in args.only and args.requests > args.users * args.receipts:
+        parser.error("get_pdf_cold needs --requests <= --users * --receipts (one render per request)")
+
+    harness = Harness.create(
+        users=args.users,
+        receipts_per_user=args.receipts,
+        renderer=args.renderer,
+        render_ms=args.render_ms,
+    )
+    try:
+        results = asyncio.run(run_http(harness, args.only, args.requests, args.concurrency))
+        if "generate_qr" in args.only:
+            results["generate_qr"] = run_generate_qr(args.requests)
+            print(_format("generate_qr", results["generate_qr"]))
+    finally:
+        harness.close()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_rev": _git_rev(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            **{k: v for k, v in vars(args).items() if k not in ("out", "baseline", "fail_on_regression")},
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nwrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            if args.fail_on_regression:
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())